@@ -12,7 +12,8 @@ import cvlib as cv
 from cvlib.object_detection import draw_bbox
 from gtts import gTTS
 from playsound import playsound
-from food_facts import food_facts
+from food_facts import knowledge_base
+from scene_summary import list_phrase
 
 
 
@@ -49,23 +50,11 @@ while True:
     if cv2.waitKey(1) & 0xFF == ord("q"):
         break
 
-i = 0
-new_sentence = []
-for label in labels:
-    if i == 0:
-        new_sentence.append(f"I found a {label}, and, ")
-    else:
-        new_sentence.append(f"a {label},")
-
-    i += 1
-
-speech(" ".join(new_sentence))
+# "I found a cup, an apple and a phone", from cached phrase templates
+speech(list_phrase(labels))
 speech("Here are the food facts i found for these items:")
 
+facts = knowledge_base.lookup_many(labels)
 for label in labels:
-    try:
-        print(f"\n\t{label.title()}")
-        food_facts(label)
-
-    except:
-        print("No food facts for this item")
\ No newline at end of file
+    print(f"\n\t{label.title()}")
+    print(f"\t{facts.get(label, 'No food facts for this item')}")
\ No newline at end of file
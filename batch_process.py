@@ -0,0 +1,371 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from inference_server import open_detector
+from detection_store import DetectionStore
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# e.g. VIDEO-2025-01-13-09-06-47.mp4 or PHOTO-2025-01-12-01-39-22.jpg
+NAME_TIMESTAMP = re.compile(r'(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})-(\d{2})')
+
+
+def source_start_time(path):
+    """Recording time from the file name if present, else its modification time"""
+    match = NAME_TIMESTAMP.search(os.path.basename(path))
+    if match:
+        return datetime(*map(int, match.groups()))
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+def expand_inputs(paths):
+    """Videos and images in `paths`, directories expanded in sorted order"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            sources.extend(os.path.join(path, name) for name in names
+                           if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS | IMAGE_EXTENSIONS)
+        elif os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS | IMAGE_EXTENSIONS:
+            sources.append(path)
+        else:
+            logging.warning(f"Skipping {path}: not a video, image or directory")
+    return sources
+
+
+def ocr_image(gray):
+    """Runs in a worker process; returns the recognised text"""
+    import pytesseract
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return pytesseract.image_to_string(thresh).strip()
+
+
+class Progress:
+    def __init__(self, path):
+        """
+        Resume point of a batch run, rewritten atomically after every batch
+
+        Stores the next frame to read per source, the byte length of each
+        output file and the row count of the detection store at that point,
+        so a restarted run truncates any rows written after the last commit
+        instead of duplicating them.
+        """
+        self.path = path
+        self.state = {'sources': {}, 'offsets': {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def next_frame(self, source):
+        return self.state['sources'].get(source, {}).get('next_frame', 0)
+
+    def is_done(self, source):
+        return self.state['sources'].get(source, {}).get('done', False)
+
+    def offset(self, output):
+        return self.state['offsets'].get(output)
+
+    def commit(self, positions, offsets):
+        for source, (next_frame, done) in positions.items():
+            self.state['sources'][source] = {'next_frame': next_frame, 'done': done}
+        self.state['offsets'].update(offsets)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class FrameReader(threading.Thread):
+    def __init__(self, sources, progress, stride=1, max_queued=32):
+        """
+        Decodes every source on its own thread into a bounded queue
+
+        Items are (source, frame_index, timestamp, frame, is_last); frames
+        skipped by `stride` are grabbed but never decoded to BGR.
+        """
+        super().__init__(daemon=True)
+        self.sources = sources
+        self.progress = progress
+        self.stride = max(1, stride)
+        self.frames = queue.Queue(maxsize=max_queued)
+        self.media_seconds = 0.0
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        try:
+            for source in self.sources:
+                if self._stopped.is_set():
+                    break
+                if self.progress.is_done(source):
+                    logging.info(f"{source}: already processed, skipping")
+                    continue
+                if os.path.splitext(source)[1].lower() in IMAGE_EXTENSIONS:
+                    self._read_image(source)
+                else:
+                    self._read_video(source)
+        finally:
+            self._put(None)
+
+    def _read_image(self, source):
+        frame = cv2.imread(source)
+        if frame is None:
+            logging.warning(f"{source}: unreadable image")
+            return
+        self._put((source, 0, source_start_time(source), frame, True))
+
+    def _read_video(self, source):
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            logging.warning(f"{source}: unable to open")
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        start_time = source_start_time(source)
+
+        index = first = self.progress.next_frame(source)
+        if index:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            logging.info(f"{source}: resuming at frame {index}")
+
+        pending = None
+        try:
+            while not self._stopped.is_set():
+                if index % self.stride:
+                    if not cap.grab():
+                        break
+                    index += 1
+                    continue
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                # Hold one frame back so the last one can be flagged
+                if pending is not None:
+                    self._put(pending)
+                pending = (source, index, start_time + timedelta(seconds=index / fps), frame, False)
+                index += 1
+            if pending is not None:
+                self._put(pending[:4] + (True,))
+            self.media_seconds += ((total or index) - first) / fps
+        finally:
+            cap.release()
+
+
+class BatchProcessor:
+    def __init__(self, detector, output='detections_log.csv', ocr_output=None, batch_size=8,
+                 conf=0.5, imgsz=640, ocr_every=2.0, ocr_workers=2, store=None):
+        """
+        Detection (and optional OCR) over recorded footage and photos
+
+        Args:
+            detector: LocalDetector or InferenceClient from inference_server
+            output (str): Detection log in the detections_log.csv format
+            ocr_output (str): CSV of recognised text, None disables OCR
+            batch_size (int): Frames per detector call
+            conf (float): Detection confidence threshold
+            imgsz (int): Detector input size
+            ocr_every (float): Seconds of media between OCR samples per source
+            ocr_workers (int): Tesseract worker processes
+            store (DetectionStore): Optional indexed history to append to
+        """
+        self.detector = detector
+        self.output = output
+        self.ocr_output = ocr_output
+        self.batch_size = batch_size
+        self.conf = conf
+        self.imgsz = imgsz
+        self.ocr_every = ocr_every
+        self.store = store
+        self.ocr_pool = ProcessPoolExecutor(max_workers=ocr_workers) if ocr_output else None
+
+        self.frames = 0
+        self.detections = 0
+        self._last_ocr = {}
+
+    def _open_output(self, path, header, progress):
+        """Open `path` for appending, truncated back to the last committed offset"""
+        offset = progress.offset(path)
+        if offset is not None and os.path.exists(path):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+            return open(path, 'a', newline='')
+        f = open(path, 'w', newline='')
+        csv.writer(f).writerow(header)
+        f.flush()
+        return f
+
+    def _wants_ocr(self, source, timestamp):
+        last = self._last_ocr.get(source)
+        if last is None or (timestamp - last).total_seconds() >= self.ocr_every:
+            self._last_ocr[source] = timestamp
+            return True
+        return False
+
+    def _infer(self, batch):
+        frames = [item[3] for item in batch]
+        detections = self.detector.detect_batch(frames, imgsz=self.imgsz, conf=self.conf)
+        ocr = []
+        if self.ocr_pool is not None:
+            for source, index, timestamp, frame, _ in batch:
+                if self._wants_ocr(source, timestamp):
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    ocr.append((source, index, timestamp, self.ocr_pool.submit(ocr_image, gray)))
+        # Frames are not needed once submitted, keep only what the commit writes
+        return [item[:3] + (item[4],) for item in batch], detections, ocr
+
+    def _commit(self, pending, writers, files, progress):
+        items, detections, ocr = pending
+        det_writer, ocr_writer = writers
+        for (source, index, timestamp, _), frame_detections in zip(items, detections):
+            for detection in frame_detections:
+                det_writer.writerow([timestamp, detection.name, f"{detection.confidence:.2f}", detection.box])
+                if self.store is not None:
+                    self.store.append(timestamp, detection.name, detection.confidence, detection.box)
+                self.detections += 1
+        for source, index, timestamp, future in ocr:
+            try:
+                text = future.result()
+            except Exception as e:
+                logging.error(f"{source} frame {index}: OCR failed: {e}")
+                continue
+            if text:
+                ocr_writer.writerow([timestamp, source, index, text])
+
+        positions = {}
+        for source, index, _, is_last in items:
+            positions[source] = (index + 1, is_last)
+        offsets = {}
+        for path, f in files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            offsets[path] = f.tell()
+        if self.store is not None:
+            self.store.flush()
+            offsets[self._store_key] = len(self.store)
+        progress.commit(positions, offsets)
+        self.frames += len(items)
+
+    @property
+    def _store_key(self):
+        return f"store:{os.path.abspath(self.store.path)}"
+
+    def run(self, reader, progress):
+        if self.store is not None and progress.offset(self._store_key) is not None:
+            # Rows flushed after the last progress commit are about to be processed again
+            self.store.truncate(progress.offset(self._store_key))
+        files = {self.output: self._open_output(self.output, ["Timestamp", "Object", "Confidence", "Bounding Box"],
+                                                progress)}
+        if self.ocr_output:
+            files[self.ocr_output] = self._open_output(self.ocr_output, ["Timestamp", "Source", "Frame", "Text"],
+                                                       progress)
+        writers = (csv.writer(files[self.output]),
+                   csv.writer(files[self.ocr_output]) if self.ocr_output else None)
+
+        reader.start()
+        pending = None
+        finished = False
+        try:
+            while not finished:
+                batch = []
+                while len(batch) < self.batch_size:
+                    item = reader.frames.get()
+                    if item is None:
+                        finished = True
+                        break
+                    batch.append(item)
+                if not batch:
+                    continue
+                current = self._infer(batch)
+                # Commit one batch behind, so OCR of the previous batch overlapped this inference
+                if pending is not None:
+                    self._commit(pending, writers, files, progress)
+                pending = current
+            if pending is not None:
+                self._commit(pending, writers, files, progress)
+        finally:
+            reader.stop()
+            # Let the decoder release its capture before the interpreter exits
+            while reader.is_alive():
+                try:
+                    reader.frames.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for f in files.values():
+                f.close()
+            if self.ocr_pool is not None:
+                self.ocr_pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run detection and OCR over recorded videos and photos")
+    parser.add_argument('inputs', nargs='+', help="Video files, images or directories")
+    parser.add_argument('--output', default='batch_detections.csv', help="Detection log (detections_log.csv format)")
+    parser.add_argument('--ocr', metavar='CSV', help="Also run OCR and write recognised text here")
+    parser.add_argument('--ocr-every', type=float, default=2.0, help="Seconds of video between OCR samples")
+    parser.add_argument('--ocr-workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--batch', type=int, default=8, help="Frames per detector call")
+    parser.add_argument('--stride', type=int, default=1, help="Process every Nth video frame")
+    parser.add_argument('--conf', type=float, default=0.5)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--store', help="Also append to this detection store directory")
+    parser.add_argument('--restart', action='store_true', help="Ignore saved progress and start over")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+    sources = expand_inputs(args.inputs)
+    if not sources:
+        print("Nothing to process")
+        return 1
+
+    progress_path = f"{args.output}.progress.json"
+    if args.restart and os.path.exists(progress_path):
+        os.remove(progress_path)
+    progress = Progress(progress_path)
+
+    detector = open_detector()
+    processor = BatchProcessor(detector, args.output, args.ocr, args.batch, args.conf, args.imgsz,
+                               args.ocr_every, args.ocr_workers,
+                               DetectionStore(args.store) if args.store else None)
+    reader = FrameReader(sources, progress, stride=args.stride, max_queued=args.batch * 4)
+
+    started = time.perf_counter()
+    try:
+        processor.run(reader, progress)
+    except KeyboardInterrupt:
+        print("Interrupted, rerun the same command to resume")
+        return 130
+    finally:
+        detector.close()
+
+    elapsed = time.perf_counter() - started
+    speed = reader.media_seconds / elapsed if elapsed and reader.media_seconds else 0.0
+    print(f"{processor.frames} frames, {processor.detections} detections in {elapsed:.1f} s "
+          f"({processor.frames / elapsed:.1f} fps, {speed:.1f}x real-time)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
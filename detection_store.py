@@ -0,0 +1,394 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import bisect
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+# Column name -> (file name, dtype, values per row)
+COLUMNS = {
+    'timestamp': ('timestamps.f64', np.float64, 1),
+    'class_id': ('class_ids.u16', np.uint16, 1),
+    'confidence': ('confidences.f32', np.float32, 1),
+    'box': ('boxes.i16', np.int16, 4),
+}
+META_FILE = 'meta.json'
+CLASS_INDEX_FILE = 'class_index.i64'
+# The index file is rewritten once this many rows (or 10%) were appended since it was saved
+CLASS_INDEX_REWRITE_ROWS = 100000
+
+_BOX_PATTERN = re.compile(r'-?\d+')
+
+
+def parse_box(text):
+    """Parse the '(x1, y1, x2, y2)' string written by ikshana1.py"""
+    values = [int(v) for v in _BOX_PATTERN.findall(text)]
+    if len(values) != 4:
+        raise ValueError(f"Bad bounding box: {text!r}")
+    return values
+
+
+class DetectionStore:
+    def __init__(self, path):
+        """
+        Append-only columnar detection history, memory-mapped for queries
+
+        Each column lives in its own raw binary file inside `path`; meta.json
+        holds the committed row count and the class-name table. Data is
+        written before the count, so a crash never exposes partial rows.
+        Rows are expected in time order, which lets time ranges be found by
+        binary search; a per-class row index answers class queries without
+        scanning other classes. The index is extended with each flushed tail
+        rather than rebuilt, and saved for the next session now and then.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self.meta = {'count': 0, 'classes': [], 'sorted': True}
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta.update(json.load(f))
+
+        self._class_lookup = {name: i for i, name in enumerate(self.meta['classes'])}
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._columns = None
+        self._class_index = None
+        self._stored_rows = 0
+
+    # ---- Writing ----
+
+    def class_id(self, name):
+        class_id = self._class_lookup.get(name)
+        if class_id is None:
+            class_id = len(self.meta['classes'])
+            self.meta['classes'].append(name)
+            self._class_lookup[name] = class_id
+        return class_id
+
+    def append(self, timestamp, class_name, confidence, box):
+        """
+        Queue one detection; call flush() (or maybe_flush()) to persist it
+
+        Args:
+            timestamp (float | datetime): Seconds since the epoch or a datetime
+            class_name (str): Detected object label
+            confidence (float): Detector confidence
+            box (tuple): (x1, y1, x2, y2) in pixels
+        """
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        self._pending.append((float(timestamp), self.class_id(class_name), float(confidence), box))
+
+    def maybe_flush(self, interval=1.0):
+        if self._pending and time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+
+        rows = self._pending
+        self._pending = []
+        timestamps = np.fromiter((r[0] for r in rows), dtype=np.float64, count=len(rows))
+        data = {
+            'timestamp': timestamps,
+            'class_id': np.fromiter((r[1] for r in rows), dtype=np.uint16, count=len(rows)),
+            'confidence': np.fromiter((r[2] for r in rows), dtype=np.float32, count=len(rows)),
+            'box': np.clip(np.array([r[3] for r in rows], dtype=np.int64), -32768, 32767).astype(np.int16),
+        }
+
+        count = self.meta['count']
+        if self.meta['sorted']:
+            previous = self._read_column('timestamp')[-1] if count else -np.inf
+            if timestamps[0] < previous or np.any(np.diff(timestamps) < 0):
+                self.meta['sorted'] = False
+
+        for name, (file_name, dtype, width) in COLUMNS.items():
+            with open(os.path.join(self.path, file_name), 'r+b' if count else 'wb') as f:
+                # Truncate anything left over from a crashed, uncommitted flush
+                f.truncate(count * width * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(data[name]).tobytes())
+
+        self.meta['count'] = count + len(rows)
+        self._write_meta()
+        self._columns = None
+
+    def truncate(self, count):
+        """Drop committed rows after the first `count`, e.g. ones a crashed batch run wrote twice"""
+        if count >= self.meta['count']:
+            return
+        # The next flush truncates the column files to the new count
+        self.meta['count'] = count
+        self._write_meta()
+        self._columns = None
+        # A saved index may cover rows that will now be replaced
+        self._class_index = None
+        index_path = os.path.join(self.path, CLASS_INDEX_FILE)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        with open(f'{meta_path}.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(f'{meta_path}.tmp', meta_path)
+
+    def import_csv(self, csv_path, batch_size=100000):
+        """Import a detections_log.csv file, returns the number of rows added"""
+        added = 0
+        with open(csv_path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header and header[0] != 'Timestamp':
+                f.seek(0)
+                reader = csv.reader(f)
+            for row in reader:
+                if len(row) < 4:
+                    continue
+                self.append(datetime.fromisoformat(row[0]), row[1], float(row[2]), parse_box(row[3]))
+                added += 1
+                if len(self._pending) >= batch_size:
+                    self.flush()
+        self.flush()
+        return added
+
+    # ---- Reading ----
+
+    def __len__(self):
+        return self.meta['count']
+
+    def _read_column(self, name):
+        file_name, dtype, width = COLUMNS[name]
+        count = self.meta['count']
+        if count == 0:
+            return np.empty((0, 4) if width > 1 else 0, dtype=dtype)
+        shape = (count, width) if width > 1 else (count,)
+        return np.memmap(os.path.join(self.path, file_name), dtype=dtype, mode='r', shape=shape)
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = {name: self._read_column(name) for name in COLUMNS}
+        return self._columns
+
+    def _class_rows(self):
+        """(row order grouped by class, start offset per class id)"""
+        count = self.meta['count']
+        if self._class_index is not None and self._class_index[0] == count:
+            return self._class_index[1:]
+
+        class_ids = self.columns['class_id']
+        num_classes = len(self.meta['classes'])
+        if self._class_index is not None:
+            indexed, order, offsets = self._class_index
+        else:
+            indexed, order, offsets = self._load_class_index(class_ids, num_classes)
+
+        # Rows only get appended, so an index of the first `indexed` rows stays
+        # valid; only the new tail is sorted and merged in
+        order, offsets = self._merge_class_rows(order, offsets, class_ids[indexed:], indexed, num_classes)
+        if count - self._stored_rows > max(CLASS_INDEX_REWRITE_ROWS, self._stored_rows // 10):
+            self._save_class_index(count, order)
+        self._class_index = (count, order, offsets)
+        return order, offsets
+
+    def _load_class_index(self, class_ids, num_classes):
+        """(rows covered, order, offsets) from the index file, or an empty index"""
+        # The index file starts with the row count it was built for
+        index_path = os.path.join(self.path, CLASS_INDEX_FILE)
+        self._stored_rows = 0
+        if os.path.exists(index_path):
+            stored = np.memmap(index_path, dtype=np.int64, mode='r')
+            if len(stored) and len(stored) == stored[0] + 1 and stored[0] <= len(class_ids):
+                indexed = int(stored[0])
+                self._stored_rows = indexed
+                counts = np.bincount(class_ids[:indexed], minlength=num_classes)
+                return indexed, np.asarray(stored[1:]), np.concatenate(([0], np.cumsum(counts)))
+        return 0, np.empty(0, dtype=np.int64), np.zeros(num_classes + 1, dtype=np.int64)
+
+    @staticmethod
+    def _merge_class_rows(order, offsets, tail_ids, first_row, num_classes):
+        """Append rows first_row.. with class ids `tail_ids` to a grouped row order"""
+        if len(tail_ids) == 0 and len(offsets) == num_classes + 1:
+            return order, offsets
+        old_counts = np.diff(offsets)
+        old_counts = np.concatenate((old_counts, np.zeros(num_classes - len(old_counts), dtype=np.int64)))
+        # A stable sort keeps each class's rows in time order, after its older rows
+        tail_order = np.argsort(tail_ids, kind='stable').astype(np.int64) + first_row
+        tail_counts = np.bincount(tail_ids, minlength=num_classes)
+        new_offsets = np.concatenate(([0], np.cumsum(old_counts + tail_counts)))
+
+        merged = np.empty(len(order) + len(tail_order), dtype=np.int64)
+        tail_offsets = np.concatenate(([0], np.cumsum(tail_counts)))
+        # One block copy per class: the old rows, then the class's new ones
+        for class_id in range(num_classes):
+            start, split = new_offsets[class_id], new_offsets[class_id] + old_counts[class_id]
+            if old_counts[class_id]:
+                merged[start:split] = order[offsets[class_id]:offsets[class_id] + old_counts[class_id]]
+            merged[split:new_offsets[class_id + 1]] = tail_order[tail_offsets[class_id]:tail_offsets[class_id + 1]]
+        return merged, new_offsets
+
+    def _save_class_index(self, count, order):
+        index_path = os.path.join(self.path, CLASS_INDEX_FILE)
+        tmp_path = f'{index_path}.{os.getpid()}.tmp'
+        np.concatenate(([count], order)).astype(np.int64).tofile(tmp_path)
+        os.replace(tmp_path, index_path)
+        self._stored_rows = count
+
+    def _time_slice(self, timestamps, start, end, rows=None):
+        """Binary search [start, end] in `timestamps`, or in timestamps[rows]"""
+        if rows is None:
+            lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+            hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+            return lo, hi
+
+        # Search through the class index without gathering the class's timestamps
+        key = timestamps.__getitem__
+        lo = 0 if start is None else bisect.bisect_left(rows, start, key=key)
+        hi = len(rows) if end is None else bisect.bisect_right(rows, end, key=key)
+        return lo, hi
+
+    def _class_slices(self, start, end, classes):
+        order, offsets = self._class_rows()
+        timestamps = self.columns['timestamp']
+        for name in classes:
+            class_id = self._class_lookup.get(name)
+            if class_id is None:
+                continue
+            class_rows = order[offsets[class_id]:offsets[class_id + 1]]
+            lo, hi = self._time_slice(timestamps, start, end, class_rows)
+            yield name, class_rows[lo:hi]
+
+    def rows(self, start=None, end=None, classes=None):
+        """Indices of rows within [start, end] and belonging to `classes`"""
+        timestamps = self.columns['timestamp']
+        if not self.meta['sorted']:
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps <= end
+            if classes is not None:
+                ids = [self._class_lookup[c] for c in classes if c in self._class_lookup]
+                mask &= np.isin(self.columns['class_id'], ids)
+            return np.flatnonzero(mask)
+
+        if classes is None:
+            lo, hi = self._time_slice(timestamps, start, end)
+            return np.arange(lo, hi)
+
+        selected = [rows for _, rows in self._class_slices(start, end, classes)]
+        if not selected:
+            return np.empty(0, dtype=np.int64)
+        if len(selected) == 1:
+            return selected[0]
+        return np.sort(np.concatenate(selected))
+
+    def query(self, start=None, end=None, classes=None, min_confidence=None):
+        """Detections in a time range as a dict of column arrays"""
+        index = self.rows(start, end, classes)
+        result = {name: np.asarray(column[index]) for name, column in self.columns.items()}
+        if min_confidence is not None:
+            keep = result['confidence'] >= min_confidence
+            result = {name: values[keep] for name, values in result.items()}
+        result['class_name'] = [self.meta['classes'][i] for i in result['class_id']]
+        return result
+
+    def counts(self, start=None, end=None, classes=None):
+        """Number of detections per class in a time range"""
+        if classes is not None and self.meta['sorted']:
+            return {name: len(rows) for name, rows in self._class_slices(start, end, classes) if len(rows)}
+        index = self.rows(start, end, classes)
+        totals = np.bincount(self.columns['class_id'][index], minlength=len(self.meta['classes']))
+        return {name: int(totals[i]) for i, name in enumerate(self.meta['classes']) if totals[i]}
+
+    def last_seen(self, class_name, before=None):
+        """Timestamp of the latest `class_name` detection, or None"""
+        index = self.rows(None, before, [class_name])
+        if len(index) == 0:
+            return None
+        if self.meta['sorted']:
+            return float(self.columns['timestamp'][index[-1]])
+        return float(self.columns['timestamp'][index].max())
+
+    def histogram(self, bucket_seconds, start=None, end=None, classes=None):
+        """Detections per time bucket as (bucket start times, counts)"""
+        timestamps = self.columns['timestamp'][self.rows(start, end, classes)]
+        if len(timestamps) == 0:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        origin = start if start is not None else np.floor(timestamps.min() / bucket_seconds) * bucket_seconds
+        buckets = ((timestamps - origin) // bucket_seconds).astype(np.int64)
+        counts = np.bincount(buckets)
+        return origin + np.arange(len(counts)) * bucket_seconds, counts
+
+
+def parse_time(text, now=None):
+    """Accept '10m', '2h', '1d', '30s' (ago) or an ISO date/time"""
+    if text is None:
+        return None
+    now = time.time() if now is None else now
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd])', text.strip())
+    if match:
+        scale = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+        return now - float(match.group(1)) * scale
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(sep=' ', timespec='seconds')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the Ikshana detection history")
+    parser.add_argument('--store', default='detections_store', help="Store directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_cmd = commands.add_parser('import', help="Import detections_log.csv files")
+    import_cmd.add_argument('csv_files', nargs='+')
+
+    last_cmd = commands.add_parser('last', help="When was an object last seen")
+    last_cmd.add_argument('label')
+
+    for name, help_text in (('count', "Detections per class"), ('range', "List detections")):
+        cmd = commands.add_parser(name, help=help_text)
+        cmd.add_argument('--since', help="e.g. 10m, 2h, 1d or an ISO timestamp")
+        cmd.add_argument('--until')
+        cmd.add_argument('--label', action='append', help="Restrict to a class (repeatable)")
+    commands.choices['range'].add_argument('--min-confidence', type=float)
+    commands.choices['range'].add_argument('--limit', type=int, default=50)
+
+    args = parser.parse_args(argv)
+    store = DetectionStore(args.store)
+    started = time.perf_counter()
+
+    if args.command == 'import':
+        for csv_file in args.csv_files:
+            print(f"{csv_file}: {store.import_csv(csv_file)} rows")
+    elif args.command == 'last':
+        seen = store.last_seen(args.label)
+        print(f"{args.label} last seen {_format_time(seen)}" if seen else f"{args.label} never seen")
+    elif args.command == 'count':
+        counts = store.counts(parse_time(args.since), parse_time(args.until), args.label)
+        for label, count in sorted(counts.items(), key=lambda c: -c[1]):
+            print(f"{label}: {count}")
+    elif args.command == 'range':
+        result = store.query(parse_time(args.since), parse_time(args.until), args.label,
+                             args.min_confidence)
+        for i in range(min(args.limit, len(result['class_name']))):
+            print(f"{_format_time(result['timestamp'][i])}, {result['class_name'][i]}, "
+                  f"{result['confidence'][i]:.2f}, {tuple(int(v) for v in result['box'][i])}")
+
+    print(f"({(time.perf_counter() - started) * 1000:.1f} ms)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import time
+import logging
+import threading
+from configparser import ConfigParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = 'ikshanaframe'
+
+
+class PreviewServer:
+    def __init__(self, port=8090, host='127.0.0.1', max_fps=5, quality=70):
+        """
+        Opt-in MJPEG preview of annotated frames for debugging headless runs
+
+        Frames are only JPEG-encoded while at least one client is connected,
+        and at most `max_fps` times per second.
+
+        Args:
+            port (int): Port to listen on, 0 picks a free one
+            host (str): Interface to bind, localhost by default
+            max_fps (float): Encode/stream rate cap
+            quality (int): JPEG quality 0-100
+        """
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / max_fps
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+        self._clients = 0
+        self._jpeg = None
+        self._sequence = 0
+        self._last_publish = 0.0
+        self._condition = threading.Condition()
+        self._server = None
+
+    @property
+    def has_clients(self):
+        return self._clients > 0
+
+    def wants_frame(self):
+        """True when a client is connected and the next frame would be sent"""
+        return self._clients > 0 and time.monotonic() - self._last_publish >= self.interval
+
+    def publish(self, frame):
+        """Encode and hand `frame` to connected clients; returns False if skipped"""
+        if not self.wants_frame():
+            return False
+
+        self._last_publish = time.monotonic()
+        ok, jpeg = cv2.imencode('.jpg', frame, self.encode_params)
+        if not ok:
+            return False
+
+        with self._condition:
+            self._jpeg = jpeg.tobytes()
+            self._sequence += 1
+            self._condition.notify_all()
+        return True
+
+    def _client_connected(self, delta):
+        with self._condition:
+            self._clients += delta
+            self._condition.notify_all()
+
+    def _next_jpeg(self, last_sequence, timeout=1.0):
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != last_sequence or self._server is None,
+                                     timeout=timeout)
+            return self._sequence, self._jpeg
+
+    def start(self):
+        preview = self
+
+        class StreamHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/stream'):
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+
+                preview._client_connected(1)
+                sequence = -1
+                try:
+                    while preview._server is not None:
+                        new_sequence, jpeg = preview._next_jpeg(sequence)
+                        if jpeg is None or new_sequence == sequence:
+                            continue
+                        sequence = new_sequence
+                        self.wfile.write(f'--{BOUNDARY}\r\n'.encode())
+                        self.wfile.write(b'Content-Type: image/jpeg\r\n')
+                        self.wfile.write(f'Content-Length: {len(jpeg)}\r\n\r\n'.encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b'\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    preview._client_connected(-1)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), StreamHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Preview stream on http://{self.host}:{self.port}/stream")
+        return self
+
+    def stop(self):
+        if self._server is None:
+            return
+        server, self._server = self._server, None
+        with self._condition:
+            self._condition.notify_all()
+        server.shutdown()
+        server.server_close()
+
+
+class Display:
+    def __init__(self, headless=False, preview=None):
+        """
+        Single place deciding whether frames are annotated, shown or streamed
+
+        Args:
+            headless (bool): Skip cv2.imshow/waitKey and all overlay drawing
+            preview (PreviewServer): Optional MJPEG preview, annotated frames
+                are produced for it only while a client is watching
+        """
+        self.headless = headless
+        self.preview = preview
+        self._annotating = not headless
+
+    @classmethod
+    def from_config(cls, path='config.ini'):
+        """Build a display from the [Display] section of config.ini"""
+        config = ConfigParser()
+        config.read(path)
+        if not config.has_section('Display'):
+            return cls()
+
+        section = config['Display']
+        preview = None
+        port = section.getint('preview_port', fallback=0)
+        if port:
+            preview = PreviewServer(port=port,
+                                    max_fps=section.getfloat('preview_fps', fallback=5)).start()
+        return cls(headless=section.getboolean('headless', fallback=False), preview=preview)
+
+    @property
+    def annotate(self):
+        """Whether this frame's boxes and text will be seen by anyone"""
+        if not self.headless:
+            return True
+        self._annotating = self.preview is not None and self.preview.wants_frame()
+        return self._annotating
+
+    def show(self, window_name, frame):
+        if not self.headless:
+            cv2.imshow(window_name, frame)
+        # Headless frames go to the preview only if they were annotated for it
+        if self.preview is not None and self._annotating:
+            self.preview.publish(frame)
+
+    def poll_key(self, delay=1):
+        """cv2.waitKey when a window exists, otherwise -1 without blocking"""
+        if self.headless:
+            return -1
+        return cv2.waitKey(delay) & 0xFF
+
+    def close(self):
+        if not self.headless:
+            cv2.destroyAllWindows()
+        if self.preview is not None:
+            self.preview.stop()
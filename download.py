@@ -1,23 +1,302 @@
-import os
-import urllib.request
-
-# Updated URLs for the model files
-model_url = "https://github.com/chuanqi305/MobileNet-SSD/blob/master/mobilenet_iter_73000.caffemodel"
-prototxt_url = "https://github.com/chuanqi305/MobileNet-SSD/blob/master/deploy.prototxt"
-
-# File names
-model_file = "MobileNetSSD_deploy.caffemodel"
-prototxt_file = "MobileNetSSD_deploy.prototxt"
-
-# Function to download a file if it doesn't exist
-def download_file(url, file_name):
-    if not os.path.exists(file_name):
-        print(f"Downloading {file_name}...")
-        urllib.request.urlretrieve(url, file_name)
-        print(f"Downloaded {file_name}.")
-    else:
-        print(f"{file_name} already exists.")
-
-# Download the model and prototxt files
-download_file(model_url, model_file)
-download_file(prototxt_url, prototxt_file)
+import os
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Manifest of model files with their source URL, sha256 and size
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models.json")
+
+# Content-addressed cache shared by every checkout on the device
+CACHE_DIR = os.environ.get("IKSHANA_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "ikshana"))
+
+CHUNK_SIZE = 1 << 20
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def looks_like_html(path):
+    """GitHub 'blob/' URLs and error pages return HTML instead of the file"""
+    with open(path, "rb") as f:
+        head = f.read(512).lstrip().lower()
+    return head.startswith(b"<!doctype html") or head.startswith(b"<html")
+
+
+class ArtifactManager:
+    def __init__(self, manifest_path=MANIFEST_FILE, dest_dir=".", cache_dir=CACHE_DIR,
+                 mirror=None, workers=4, retries=3, timeout=30, allow_unpinned=False):
+        """
+        Verified, resumable installs of the model files listed in models.json
+
+        Entries without a pinned sha256 are refused unless `allow_unpinned`
+        is set: without a checksum a truncated or swapped file cannot be told
+        from the real one. Even then, an unpinned download must come with a
+        Content-Length so that at least its completeness is checked.
+
+        Args:
+            manifest_path (str): JSON manifest of artifacts
+            dest_dir (str): Where artifacts are installed
+            cache_dir (str): Content-addressed cache (cache_dir/sha256/ab/abcd...)
+            mirror (str): Base URL replacing every upstream URL with mirror/<name>
+            workers (int): Parallel downloads
+            retries (int): Attempts per artifact; each attempt resumes the last
+            timeout (float): Socket timeout in seconds
+            allow_unpinned (bool): Install entries that have no sha256 in the manifest
+        """
+        self.manifest_path = manifest_path
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        self.artifacts = self.manifest["artifacts"]
+        self.dest_dir = dest_dir
+        self.cache_dir = cache_dir
+        self.mirror = mirror or os.environ.get("IKSHANA_MODEL_MIRROR")
+        self.workers = workers
+        self.retries = retries
+        self.timeout = timeout
+        self.allow_unpinned = allow_unpinned
+
+    def _spec(self, name):
+        if name not in self.artifacts:
+            raise ArtifactError(f"{name} is not in {self.manifest_path}")
+        return self.artifacts[name]
+
+    def url(self, name):
+        if self.mirror:
+            return f"{self.mirror.rstrip('/')}/{name}"
+        url = self._spec(name).get("url")
+        if not url:
+            raise ArtifactError(f"{name} has no upstream URL, use --mirror")
+        return url
+
+    def cache_path(self, sha256):
+        return os.path.join(self.cache_dir, "sha256", sha256[:2], sha256)
+
+    def check(self, path, name):
+        """Return None if `path` matches the manifest entry, else the reason"""
+        spec = self._spec(name)
+        if not os.path.exists(path):
+            return "missing"
+        if not spec.get("sha256") and not self.allow_unpinned:
+            return "no pinned sha256 in the manifest (run --pin, or pass --allow-unpinned)"
+        if spec.get("size") is not None and os.path.getsize(path) != spec["size"]:
+            return f"size {os.path.getsize(path)} != {spec['size']}"
+        if looks_like_html(path):
+            return "HTML page instead of model data"
+        if spec.get("sha256") and sha256_file(path) != spec["sha256"]:
+            return "checksum mismatch"
+        return None
+
+    def verify(self, names=None):
+        """{name: None or problem} for installed artifacts"""
+        names = names or list(self.artifacts)
+        return {name: self.check(os.path.join(self.dest_dir, name), name) for name in names}
+
+    def _download(self, name, part_path):
+        """Download into part_path, resuming from its current size"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request = urllib.request.Request(self.url(name), headers={"User-Agent": "ikshana-artifacts"})
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and offset:  # Already complete
+                return
+            raise
+
+        with response:
+            if "text/html" in response.headers.get("Content-Type", ""):
+                raise ArtifactError(f"{name}: server returned an HTML page")
+            # 200 means the server ignored the Range header, start over
+            mode = "ab" if offset and response.status == 206 else "wb"
+            expected = response.headers.get("Content-Length")
+            if expected is None and not self._spec(name).get("size"):
+                raise ArtifactError(f"{name}: no Content-Length and no pinned size, "
+                                    f"a truncated download would go unnoticed")
+            received = 0
+            with open(part_path, mode) as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                    f.write(chunk)
+                    received += len(chunk)
+
+        if expected is not None and received < int(expected):
+            # Keep the partial file so the next attempt resumes from here
+            raise ConnectionError(f"connection closed after {received} of {expected} bytes")
+
+    def fetch(self, name):
+        """Return a verified path in the cache for `name`, downloading if needed"""
+        spec = self._spec(name)
+        if not spec.get("sha256") and not self.allow_unpinned:
+            raise ArtifactError(f"{name} has no pinned sha256, run --pin or pass --allow-unpinned")
+        if spec.get("sha256") and os.path.exists(self.cache_path(spec["sha256"])):
+            return self.cache_path(spec["sha256"])
+
+        partial_dir = os.path.join(self.cache_dir, "partial")
+        os.makedirs(partial_dir, exist_ok=True)
+        # Keyed by what is being downloaded, so a new checksum or URL never resumes an old file
+        source_key = spec.get("sha256") or hashlib.sha256(self.url(name).encode()).hexdigest()
+        part_path = os.path.join(partial_dir, f"{name}.{source_key[:16]}.part")
+
+        last_error = None
+        for attempt in range(1, self.retries + 1):
+            try:
+                self._download(name, part_path)
+            except (OSError, urllib.error.URLError) as e:
+                last_error = e
+                logging.warning(f"{name}: attempt {attempt} failed ({e}), will resume")
+                continue
+
+            problem = self.check(part_path, name)
+            if problem is None:
+                break
+            # A complete but wrong file cannot be fixed by resuming
+            os.remove(part_path)
+            last_error = ArtifactError(f"{name}: {problem}")
+            logging.warning(f"{name}: attempt {attempt} rejected ({problem})")
+        else:
+            raise ArtifactError(f"{name}: download failed: {last_error}")
+
+        sha256 = sha256_file(part_path)
+        if not spec.get("sha256"):
+            logging.warning(f"{name} has no pinned checksum (got {sha256}), run with --pin to record it")
+        cached = self.cache_path(sha256)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        os.replace(part_path, cached)
+        return cached
+
+    def install(self, name):
+        """Install `name` into dest_dir; returns 'ok', 'cached' or 'downloaded'"""
+        dest = os.path.join(self.dest_dir, name)
+        if self.check(dest, name) is None:
+            return "ok"
+
+        spec = self._spec(name)
+        from_cache = bool(spec.get("sha256")) and os.path.exists(self.cache_path(spec["sha256"]))
+        source = self.fetch(name)
+
+        # Copy next to the destination, then rename: never a half-written model
+        tmp_path = f"{dest}.tmp-{os.getpid()}"
+        try:
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return "cached" if from_cache else "downloaded"
+
+    def provision(self, names=None):
+        """Install artifacts in parallel; raises ArtifactError listing any failures"""
+        names = names or self.manifest.get("default") or list(self.artifacts)
+        os.makedirs(self.dest_dir, exist_ok=True)
+
+        results, failures = {}, {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {name: executor.submit(self.install, name) for name in names}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                    print(f"{name}: {results[name]}")
+                except Exception as e:
+                    failures[name] = e
+                    print(f"{name}: FAILED ({e})")
+
+        if failures:
+            raise ArtifactError(f"{len(failures)} artifact(s) failed: {', '.join(failures)}")
+        return results
+
+    def pin(self, names=None):
+        """Record sha256 and size of the installed files in the manifest"""
+        names = names or list(self.artifacts)
+        for name in names:
+            path = os.path.join(self.dest_dir, name)
+            if not os.path.exists(path) or looks_like_html(path):
+                print(f"{name}: not installed or invalid, not pinned")
+                continue
+            self.artifacts[name]["sha256"] = sha256_file(path)
+            self.artifacts[name]["size"] = os.path.getsize(path)
+            print(f"{name}: pinned {self.artifacts[name]['sha256']}")
+
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+            f.write("\n")
+        os.replace(tmp_path, self.manifest_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download and verify Ikshana model files")
+    parser.add_argument("names", nargs="*", help="Artifacts to install (default: MobileNet-SSD)")
+    parser.add_argument("--all", action="store_true", help="Install every artifact in the manifest")
+    parser.add_argument("--mirror", help="Base URL serving <mirror>/<artifact name>")
+    parser.add_argument("--dest", default=".", help="Install directory")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Content-addressed cache directory")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--verify", action="store_true", help="Only check installed files")
+    parser.add_argument("--pin", action="store_true",
+                        help="Install (unverified) and record checksums and sizes of the artifacts")
+    parser.add_argument("--allow-unpinned", action="store_true",
+                        help="Install artifacts that have no pinned checksum")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    manager = ArtifactManager(dest_dir=args.dest, cache_dir=args.cache,
+                              mirror=args.mirror, workers=args.workers,
+                              allow_unpinned=args.allow_unpinned or args.pin)
+    names = list(manager.artifacts) if args.all else args.names
+
+    if args.verify:
+        problems = manager.verify(names or None)
+        for name, problem in problems.items():
+            print(f"{name}: {problem or 'ok'}")
+        return 1 if any(problems.values()) else 0
+    if args.pin:
+        # Trust on first use: fetch whatever is missing, then record what was received
+        downloadable = [name for name in (names or manager.artifacts)
+                        if manager.mirror or manager.artifacts[name].get("url")]
+        try:
+            manager.provision(downloadable)
+        except ArtifactError as e:
+            print(e)
+        manager.pin(names or None)
+        return 0
+
+    try:
+        if not names and not args.allow_unpinned:
+            # Default models without a published checksum are pinned on first download
+            # and verified against that from then on
+            first_use = [name for name in manager.manifest.get("default", [])
+                         if not manager.artifacts[name].get("sha256")]
+            if first_use:
+                logging.warning(f"Recording checksums of {', '.join(first_use)} on first download")
+                manager.allow_unpinned = True
+                manager.provision(first_use)
+                manager.pin(first_use)
+                manager.allow_unpinned = False
+        manager.provision(names or None)
+    except ArtifactError as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import cv2
+
+
+class DualStreamCamera:
+    def __init__(self, main_size=(2028, 1520), lores_size=(320, 240), camera_num=0):
+        """
+        Picamera2 configured once with two simultaneous streams
+
+        The small `lores` stream feeds continuous detection, while the
+        full-resolution `main` stream is read only on demand for OCR and
+        pictures. Both come from the same sensor configuration, so switching
+        between them never reconfigures or restarts the camera.
+
+        Args:
+            main_size (tuple): Full-detail stream size (width, height)
+            lores_size (tuple): Inference stream size (width, height); keep the
+                width a multiple of 64 so the YUV planes have no row padding
+            camera_num (int): Picamera2 camera index
+        """
+        from picamera2 import Picamera2
+
+        self.main_size = main_size
+        self.lores_size = lores_size
+        self.camera = Picamera2(camera_num)
+        # 'RGB888' in Picamera2 is BGR byte order, i.e. what OpenCV expects.
+        # The lores stream has to be YUV420 on the Pi 4 ISP.
+        config = self.camera.create_video_configuration(
+            main={'size': main_size, 'format': 'RGB888'},
+            lores={'size': lores_size, 'format': 'YUV420'},
+            buffer_count=4,
+        )
+        self.camera.configure(config)
+
+    def start(self):
+        self.camera.start()
+        return self
+
+    def capture_lores(self):
+        """Small BGR frame for detection"""
+        yuv = self.camera.capture_array('lores')
+        width, height = self.lores_size
+        return cv2.cvtColor(yuv[:height * 3 // 2, :width], cv2.COLOR_YUV420p2BGR)
+
+    def capture_lores_gray(self):
+        """Small grayscale frame; the Y plane needs no colour conversion"""
+        width, height = self.lores_size
+        return self.camera.capture_array('lores')[:height, :width]
+
+    def capture_main(self):
+        """Full-resolution BGR frame for OCR and pictures"""
+        return self.camera.capture_array('main')
+
+    def capture_main_gray(self):
+        return cv2.cvtColor(self.capture_main(), cv2.COLOR_BGR2GRAY)
+
+    def close(self):
+        self.camera.stop()
+        self.camera.close()
@@ -0,0 +1,391 @@
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from hazard import HazardDetector, LatencyTracker, PrioritySpeech
+
+# Topics used by the built-in drivers
+FRAME = 'frame'
+DISTANCE = 'distance'
+COMMAND = 'command'
+DETECTIONS = 'detections'
+SPEAK = 'speak'
+
+
+class Event:
+    __slots__ = ('topic', 'data', 'source', 'timestamp')
+
+    def __init__(self, topic, data, source=None, timestamp=None):
+        """One message on the bus; timestamp is time.perf_counter() at creation"""
+        self.topic = topic
+        self.data = data
+        self.source = source
+        self.timestamp = time.perf_counter() if timestamp is None else timestamp
+
+    def __repr__(self):
+        return f"Event({self.topic!r}, source={self.source!r})"
+
+
+class Subscription:
+    def __init__(self, hub, topic, maxsize):
+        """
+        Bounded queue of events for one consumer
+
+        When full the oldest event is dropped, so a slow consumer sees the
+        latest frame or reading instead of stalling the publisher.
+        """
+        self.hub = hub
+        self.topic = topic
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.hub.running and self.queue.empty():
+            raise StopAsyncIteration
+        return await self.queue.get()
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+
+class EventHub:
+    def __init__(self, max_workers=4, profiler=None):
+        """
+        Asyncio runtime where capture, sensors, voice, detections and speech
+        are all event streams on one bus
+
+        Drivers are objects with an `async run(hub)` method (or plain
+        coroutine functions) that publish events; handlers registered with
+        on() react to them. Blocking calls go through run_blocking() so the
+        loop itself never waits on hardware.
+
+        Args:
+            max_workers (int): Threads for blocking work
+            profiler (Profiler): Optional, records dispatch delay per topic
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.profiler = profiler
+        self.running = False
+        self.published = defaultdict(int)
+
+        self._subscriptions = defaultdict(list)
+        self._drivers = []
+        self._handlers = []
+        self._tasks = []
+        self._stopped = None
+        self._loop = None
+
+    # ---- Bus ----
+
+    def subscribe(self, topic, maxsize=8):
+        """Subscription to `topic`, or to every topic with '*'"""
+        subscription = Subscription(self, topic, maxsize)
+        self._subscriptions[topic].append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        subscribers = self._subscriptions.get(subscription.topic, [])
+        if subscription in subscribers:
+            subscribers.remove(subscription)
+
+    def publish(self, topic, data=None, source=None, timestamp=None):
+        """Deliver an event to every subscriber; call from the loop thread"""
+        event = Event(topic, data, source, timestamp)
+        self.published[topic] += 1
+        for subscription in [*self._subscriptions.get(topic, ()), *self._subscriptions.get('*', ())]:
+            subscription.put(event)
+        return event
+
+    def publish_threadsafe(self, topic, data=None, source=None):
+        """publish() from a worker thread, e.g. a hardware callback"""
+        timestamp = time.perf_counter()
+        self._loop.call_soon_threadsafe(self.publish, topic, data, source, timestamp)
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking call on the hub's executor"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    # ---- Runtime ----
+
+    def add(self, driver):
+        """Register a driver, started by run()"""
+        self._drivers.append(driver)
+        return driver
+
+    def on(self, topic, handler, maxsize=8):
+        """Call handler(event) for each event on `topic`; handler may be async"""
+        self._handlers.append((topic, handler, maxsize))
+        return handler
+
+    async def _dispatch(self, subscription, handler):
+        async for event in subscription:
+            if self.profiler is not None:
+                self.profiler.record(f'event_{event.topic}', time.perf_counter() - event.timestamp)
+            try:
+                result = handler(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logging.error(f"Handler for {event.topic} failed: {e}")
+
+    async def _run_driver(self, driver):
+        try:
+            run = driver.run if hasattr(driver, 'run') else driver
+            await run(self)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Driver {type(driver).__name__} stopped: {e}")
+
+    async def run(self):
+        """Run every driver and handler until stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self.running = True
+
+        for topic, handler, maxsize in self._handlers:
+            self._tasks.append(asyncio.create_task(self._dispatch(self.subscribe(topic, maxsize), handler)))
+        for driver in self._drivers:
+            self._tasks.append(asyncio.create_task(self._run_driver(driver)))
+
+        try:
+            await self._stopped.wait()
+        finally:
+            self.running = False
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+            self.executor.shutdown(wait=False)
+
+    def stop(self):
+        """Stop the runtime; safe to call from any thread"""
+        if self._loop is None or self._stopped is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopped.set)
+
+
+# ---- Drivers ----
+
+class CameraDriver:
+    def __init__(self, capture, fps=10, source='camera', gate=None):
+        """
+        Publishes FRAME events from a blocking capture callable
+
+        Args:
+            capture (callable): Returns a frame, e.g. DualStreamCamera.capture_lores
+            fps (float): Upper bound on the capture rate
+            source (str): Source name carried by each event
+            gate (idle_mode.MotionGate): Optional, while the scene is static
+                frames are captured at its idle rate and not published
+        """
+        self.capture = capture
+        self.interval = 1.0 / fps
+        self.source = source
+        self.gate = gate
+
+    async def run(self, hub):
+        while hub.running:
+            started = time.perf_counter()
+            frame = await hub.run_blocking(self.capture)
+            interval = self.interval
+            if frame is not None:
+                if self.gate is None or self.gate.check(frame):
+                    hub.publish(FRAME, frame, self.source)
+                else:
+                    interval = self.gate.idle_interval
+            # Idle waits are cut short by a wake-up
+            while hub.running:
+                remaining = interval - (time.perf_counter() - started)
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 0.05) if self.gate is not None else remaining)
+                if self.gate is not None and self.gate.wake_pending:
+                    break
+
+
+class DistanceSensorDriver:
+    def __init__(self, sensors, rate=10):
+        """
+        Samples every distance sensor concurrently and publishes one
+        DISTANCE event {direction: cm} per round
+
+        Args:
+            sensors (dict): direction name -> object with measure_distance() in cm
+            rate (float): Rounds per second
+        """
+        self.sensors = sensors
+        self.interval = 1.0 / rate
+
+    async def run(self, hub):
+        names = list(self.sensors)
+        while hub.running:
+            started = time.perf_counter()
+            readings = await asyncio.gather(*(hub.run_blocking(self.sensors[name].measure_distance)
+                                              for name in names), return_exceptions=True)
+            distances = {name: reading for name, reading in zip(names, readings)
+                         if not isinstance(reading, Exception) and reading is not None}
+            if distances:
+                hub.publish(DISTANCE, distances, 'sensors')
+            await asyncio.sleep(max(0.0, self.interval - (time.perf_counter() - started)))
+
+
+class VoiceDriver:
+    def __init__(self, listen):
+        """
+        Publishes COMMAND events
+
+        Args:
+            listen (callable): Blocks for at most about a second and returns
+                a command string or None, e.g. lambda: listener.get(timeout=0.5)
+        """
+        self.listen = listen
+
+    async def run(self, hub):
+        while hub.running:
+            command = await hub.run_blocking(self.listen)
+            if command:
+                hub.publish(COMMAND, command, 'voice')
+
+
+class DetectorDriver:
+    def __init__(self, detector, imgsz=320, conf=0.5):
+        """Runs detection on the newest FRAME and publishes DETECTIONS"""
+        self.detector = detector
+        self.imgsz = imgsz
+        self.conf = conf
+
+    async def run(self, hub):
+        # Depth one: while the detector is busy only the newest frame waits
+        frames = hub.subscribe(FRAME, maxsize=1)
+        async for event in frames:
+            detections = await hub.run_blocking(self.detector.detect, event.data, self.imgsz, self.conf)
+            hub.publish(DETECTIONS, detections, event.source, timestamp=event.timestamp)
+
+
+class SpeechDriver:
+    def __init__(self, speak):
+        """
+        Speaks SPEAK events one at a time on a dedicated thread
+
+        pyttsx3 engines must stay on the thread that created them, so
+        speech gets its own single-thread executor.
+        """
+        self.speak = speak
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def run(self, hub):
+        loop = asyncio.get_running_loop()
+        try:
+            async for event in hub.subscribe(SPEAK, maxsize=16):
+                await loop.run_in_executor(self.executor, self.speak, event.data)
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+# ---- Hardware and simulated devices ----
+
+class UltrasonicSensor:
+    def __init__(self, echo_pin, trigger_pin, max_distance_cm=400):
+        """HC-SR04 style sensor through gpiozero; measure_distance() returns cm"""
+        from gpiozero import DistanceSensor
+        self.sensor = DistanceSensor(echo=echo_pin, trigger=trigger_pin, max_distance=max_distance_cm / 100.0)
+
+    def measure_distance(self):
+        return self.sensor.distance * 100.0
+
+
+class SimulatedDistanceSensor:
+    def __init__(self, start_cm=250, speed_cm_s=-40, minimum_cm=30, maximum_cm=300):
+        """Obstacle moving at a constant speed, bouncing between the limits"""
+        self.distance = start_cm
+        self.speed = speed_cm_s
+        self.minimum = minimum_cm
+        self.maximum = maximum_cm
+        self._last = time.monotonic()
+
+    def measure_distance(self):
+        now = time.monotonic()
+        self.distance += self.speed * (now - self._last)
+        self._last = now
+        if not self.minimum <= self.distance <= self.maximum:
+            self.speed = -self.speed
+            self.distance = min(max(self.distance, self.minimum), self.maximum)
+        # Echo round trip at the speed of sound, about 58 us per cm
+        time.sleep(self.distance * 58e-6)
+        return self.distance
+
+
+class SimulatedCamera:
+    def __init__(self, size=(320, 240), fps=15):
+        """Frames with a box drifting across them, for running without a camera"""
+        self.width, self.height = size
+        self.fps = fps
+        self.index = 0
+
+    def capture_lores(self):
+        time.sleep(1.0 / self.fps)
+        frame = np.full((self.height, self.width, 3), 40, np.uint8)
+        x = (self.index * 4) % max(1, self.width - 40)
+        frame[self.height // 3:self.height // 3 + 40, x:x + 40] = 220
+        self.index += 1
+        return frame
+
+    read = capture_lores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the event hub with simulated devices")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+
+    hub = EventHub()
+    hub.add(CameraDriver(SimulatedCamera().capture_lores, fps=15))
+    hub.add(DistanceSensorDriver({'front': SimulatedDistanceSensor(),
+                                  'left': SimulatedDistanceSensor(180, -25),
+                                  'right': SimulatedDistanceSensor(300, 0)}))
+    # Close obstacles preempt anything else being said, see [Hazard] in config.ini
+    hazard_latency = LatencyTracker.from_config()
+    speech = PrioritySpeech(lambda text: print(f"[speech] {text}"), hazard_latency)
+    hub.on(SPEAK, lambda event: speech.say(event.data))
+    HazardDetector.from_config().attach(hub, speech)
+
+    delays = defaultdict(list)
+    hub.on('*', lambda event: delays[event.topic].append(time.perf_counter() - event.timestamp), maxsize=64)
+
+    async def stop_later():
+        await asyncio.sleep(args.seconds)
+        hub.stop()
+
+    async def run():
+        asyncio.create_task(stop_later())
+        await hub.run()
+
+    asyncio.run(run())
+    speech.close(wait=False)
+    print(hazard_latency.summary())
+    for topic, values in sorted(delays.items()):
+        values.sort()
+        print(f"{topic}: {hub.published[topic]} events, dispatch p50 {values[len(values) // 2] * 1000:.2f} ms, "
+              f"max {values[-1] * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
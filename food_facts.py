@@ -0,0 +1,154 @@
+# food_facts.py
+
+import os
+import re
+import gzip
+import bisect
+from collections import defaultdict
+
+# Tab separated: name, comma separated aliases, fact. May be gzip compressed.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'food_facts.tsv')
+
+
+def normalize(text):
+    """Lowercase and collapse punctuation/whitespace so OCR and labels compare equal"""
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodKnowledgeBase:
+    def __init__(self, path=DEFAULT_PATH, fuzzy_threshold=0.5):
+        """
+        Food facts loaded lazily from disk and indexed for fast lookups
+
+        Args:
+            path (str): .tsv or .tsv.gz knowledge base file
+            fuzzy_threshold (float): Minimum trigram similarity for fuzzy matches
+        """
+        self.path = path
+        self.fuzzy_threshold = fuzzy_threshold
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        opener = gzip.open if self.path.endswith('.gz') else open
+
+        self.facts = []  # fact id -> (name, fact)
+        self.exact = {}  # normalized name/alias -> fact id
+        with opener(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                name, aliases, fact = line.rstrip('\n').split('\t', 2)
+                fact_id = len(self.facts)
+                self.facts.append((name, fact))
+                for key in [name] + aliases.split(','):
+                    key = normalize(key)
+                    if key:
+                        self.exact.setdefault(key, fact_id)
+
+        # Sorted keys for prefix search, trigram postings for fuzzy search
+        self.keys = sorted(self.exact)
+        self.trigrams = defaultdict(list)
+        self.trigram_counts = []
+        for key_index, key in enumerate(self.keys):
+            grams = _trigrams(key)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.trigrams[gram].append(key_index)
+        self._loaded = True
+
+    def __len__(self):
+        self._load()
+        return len(self.facts)
+
+    def lookup(self, label):
+        """Exact match on a name or alias (e.g. a COCO label), fact text or None"""
+        self._load()
+        fact_id = self.exact.get(normalize(label))
+        return None if fact_id is None else self.facts[fact_id][1]
+
+    def lookup_many(self, labels):
+        """Facts for every label in a frame at once: {label: fact} for known labels"""
+        self._load()
+        results = {}
+        for label in dict.fromkeys(labels):
+            fact = self.lookup(label)
+            if fact is not None:
+                results[label] = fact
+        return results
+
+    def prefix(self, text, limit=5):
+        """Names whose name or alias starts with `text`"""
+        self._load()
+        text = normalize(text)
+        start = bisect.bisect_left(self.keys, text)
+        matches = []
+        for key in self.keys[start:]:
+            if not key.startswith(text) or len(matches) >= limit:
+                break
+            name = self.facts[self.exact[key]][0]
+            if name not in matches:
+                matches.append(name)
+        return matches
+
+    def _fuzzy_key(self, text):
+        grams = _trigrams(text)
+        scores = defaultdict(int)
+        for gram in grams:
+            for key_index in self.trigrams.get(gram, ()):
+                scores[key_index] += 1
+        best, best_score = None, 0.0
+        for key_index, shared in scores.items():
+            # Dice coefficient over trigram sets
+            score = 2 * shared / (len(grams) + self.trigram_counts[key_index])
+            if score > best_score:
+                best, best_score = key_index, score
+        return best, best_score
+
+    def search(self, text, limit=3):
+        """
+        Match free text such as OCR'd package labels
+
+        Every 1-3 word window of the text is tried as an exact key, then as a
+        fuzzy trigram match, so 'Amul Toned Mlk 500ml' still finds milk.
+        Returns [(name, fact, score)] best first.
+        """
+        self._load()
+        words = normalize(text).split()
+        found = {}
+        for size in (3, 2, 1):
+            for i in range(len(words) - size + 1):
+                window = ' '.join(words[i:i + size])
+                fact_id, score = self.exact.get(window), 1.0
+                if fact_id is None:
+                    if len(window) < 3:
+                        continue
+                    key_index, score = self._fuzzy_key(window)
+                    if key_index is None or score < self.fuzzy_threshold:
+                        continue
+                    fact_id = self.exact[self.keys[key_index]]
+                if score > found.get(fact_id, 0.0):
+                    found[fact_id] = score
+
+        ranked = sorted(found.items(), key=lambda item: -item[1])[:limit]
+        return [(self.facts[fact_id][0], self.facts[fact_id][1], score) for fact_id, score in ranked]
+
+
+knowledge_base = FoodKnowledgeBase()
+
+
+def food_facts(food_item):
+    """
+    Given a food item, return its nutritional facts.
+    If the food item isn't in the knowledge base, return a default message.
+    """
+    fact = knowledge_base.lookup(food_item)
+    if fact is None:
+        return f"Sorry, no food facts available for {food_item}."
+    return fact
@@ -0,0 +1,158 @@
+import threading
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+
+class BufferPool:
+    def __init__(self, max_per_shape=4):
+        """
+        Bounded free lists of numpy arrays, keyed by (shape, dtype)
+
+        Derived images have the same shapes frame after frame, so handing
+        the previous frame's arrays back avoids reallocating them each time.
+        """
+        self.max_per_shape = max_per_shape
+        self._free = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, array):
+        key = (array.shape, array.dtype.str)
+        with self._lock:
+            free = self._free[key]
+            if len(free) < self.max_per_shape:
+                free.append(array)
+
+
+# Shared by every FrameContext unless one is passed explicitly
+default_pool = BufferPool()
+
+
+class FrameContext:
+    def __init__(self, frame, pool=default_pool, sequence=None):
+        """
+        Lazily computed views of one BGR frame, shared by every consumer
+
+        The first consumer asking for e.g. `gray` pays for the conversion,
+        later ones get the cached array. Arrays come from `pool` and go back
+        to it on release(), so they are only valid until then.
+
+        Args:
+            frame (np.ndarray): BGR frame from the camera
+            pool (BufferPool): Where derived arrays are borrowed from
+            sequence (int): Optional frame number carried along with results
+        """
+        self.frame = frame
+        self.pool = pool
+        self.sequence = sequence
+        self._cache = {}
+        self._borrowed = []
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def _get(self, key, compute):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                value = self._cache[key] = compute()
+            return value
+
+    def _borrow(self, shape, dtype=np.uint8):
+        array = self.pool.acquire(shape, dtype)
+        self._borrowed.append(array)
+        return array
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    @property
+    def gray(self):
+        def compute():
+            dst = self._borrow(self.frame.shape[:2])
+            return cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY, dst=dst)
+        return self._get('gray', compute)
+
+    @property
+    def rgb(self):
+        def compute():
+            dst = self._borrow(self.frame.shape)
+            return cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB, dst=dst)
+        return self._get('rgb', compute)
+
+    def resized(self, size, color='bgr', interpolation=cv2.INTER_LINEAR):
+        """Frame resized to size=(width, height) in 'bgr', 'rgb' or 'gray'"""
+        def compute():
+            source = {'bgr': self.frame, 'rgb': self.rgb, 'gray': self.gray}[color]
+            shape = (size[1], size[0]) + source.shape[2:]
+            dst = self._borrow(shape, source.dtype)
+            return cv2.resize(source, size, dst=dst, interpolation=interpolation)
+        return self._get(('resized', size, color, interpolation), compute)
+
+    def pyramid(self, levels, color='gray'):
+        """[full, 1/2, 1/4, ...] images built with cv2.pyrDown"""
+        def compute():
+            images = [{'bgr': self.frame, 'rgb': self.rgb, 'gray': self.gray}[color]]
+            for _ in range(levels - 1):
+                images.append(cv2.pyrDown(images[-1]))
+            return images
+        return self._get(('pyramid', levels, color), compute)
+
+    def blob(self, size, scale=1 / 255.0, mean=(0, 0, 0), swap_rb=True):
+        """NCHW float32 blob as produced by cv2.dnn.blobFromImage"""
+        def compute():
+            resized = self.resized(size, 'bgr')
+            return cv2.dnn.blobFromImage(resized, scale, size, mean, swap_rb, crop=False)
+        return self._get(('blob', size, scale, tuple(mean), swap_rb), compute)
+
+    def batch(self, size, color='rgb', scale=1 / 255.0):
+        """NHWC float32 batch of one image, e.g. for Keras models"""
+        def compute():
+            resized = self.resized(size, color)
+            dst = self._borrow((1,) + resized.shape, np.float32)
+            # Divide rather than multiply by the reciprocal: same values as the usual x / 255
+            np.divide(resized, np.float32(1 / scale), out=dst[0], casting='unsafe')
+            return dst
+        return self._get(('batch', size, color, scale), compute)
+
+    def letterbox(self, size, fill=114):
+        """
+        Aspect-preserving resize padded to size=(width, height)
+
+        Returns (image, scale, (pad_x, pad_y)) for mapping boxes back.
+        """
+        def compute():
+            height, width = self.frame.shape[:2]
+            scale = min(size[0] / width, size[1] / height)
+            new_w, new_h = int(round(width * scale)), int(round(height * scale))
+            pad_x, pad_y = (size[0] - new_w) // 2, (size[1] - new_h) // 2
+
+            canvas = self._borrow((size[1], size[0], 3))
+            canvas[:] = fill
+            resized = self.resized((new_w, new_h), 'bgr')
+            canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+            return canvas, scale, (pad_x, pad_y)
+        return self._get(('letterbox', size, fill), compute)
+
+    def release(self):
+        """Return every borrowed array to the pool; cached views become invalid"""
+        with self._lock:
+            for array in self._borrowed:
+                self.pool.release(array)
+            self._borrowed = []
+            self._cache = {}
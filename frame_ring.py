@@ -0,0 +1,229 @@
+import os
+import time
+import queue
+import bisect
+import logging
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    def __init__(self, seconds=5.0, max_fps=10.0, scale=1.0, jpeg_quality=80):
+        """
+        The last `seconds` of frames, kept compact for pre-roll snapshots and clips
+
+        push() never blocks the capture loop: frames are rate limited to
+        max_fps and JPEG-encoded on a background thread. If the encoder
+        falls behind, new frames are dropped (and counted in `dropped`)
+        until it catches up; frames already queued are kept.
+
+        Args:
+            seconds (float): Pre-roll kept in memory
+            max_fps (float): Frames stored per second at most
+            scale (float): Downscale factor applied before storing
+            jpeg_quality (int): JPEG quality, None stores raw (downscaled) frames
+        """
+        self.seconds = seconds
+        self.max_fps = max_fps
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+        self.dropped = 0
+
+        self._frames = deque()
+        self._lock = threading.Lock()
+        self._last_push = 0.0
+        self._pending = queue.Queue(maxsize=4)
+        self._running = True
+        self._encoder = None
+        if jpeg_quality is not None:
+            self._encoder = threading.Thread(target=self._encode_loop, daemon=True)
+            self._encoder.start()
+
+    def push(self, frame, timestamp=None):
+        """Offer a frame; returns False if rate limiting or a full encoder dropped it"""
+        timestamp = time.time() if timestamp is None else timestamp
+        if timestamp - self._last_push < 1.0 / self.max_fps:
+            return False
+        self._last_push = timestamp
+
+        if self._encoder is None:
+            self._store(timestamp, frame.copy() if self.scale == 1.0 else self._shrink(frame))
+            return True
+        try:
+            self._pending.put_nowait((timestamp, frame))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _shrink(self, frame):
+        if self.scale == 1.0:
+            return frame
+        return cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def _store(self, timestamp, payload):
+        with self._lock:
+            self._frames.append((timestamp, payload))
+            while self._frames and timestamp - self._frames[0][0] > self.seconds:
+                self._frames.popleft()
+
+    def _encode_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while self._running:
+            try:
+                timestamp, frame = self._pending.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            ok, encoded = cv2.imencode('.jpg', self._shrink(frame), params)
+            if ok:
+                self._store(timestamp, encoded.tobytes())
+
+    def decode(self, payload):
+        """Stored payload to a BGR frame"""
+        if isinstance(payload, bytes):
+            return cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return payload
+
+    def frames(self, since=None, until=None):
+        """Stored (timestamp, payload) pairs within [since, until]"""
+        with self._lock:
+            frames = list(self._frames)
+        timestamps = [t for t, _ in frames]
+        start = 0 if since is None else bisect.bisect_left(timestamps, since)
+        end = len(frames) if until is None else bisect.bisect_right(timestamps, until)
+        return frames[start:end]
+
+    def nearest(self, timestamp):
+        """(timestamp, payload) closest to `timestamp`, or None when empty"""
+        with self._lock:
+            frames = list(self._frames)
+        if not frames:
+            return None
+        return min(frames, key=lambda item: abs(item[0] - timestamp))
+
+    def latest(self):
+        with self._lock:
+            return self._frames[-1] if self._frames else None
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(len(p) if isinstance(p, bytes) else p.nbytes for _, p in self._frames)
+
+    def close(self):
+        self._running = False
+        if self._encoder is not None:
+            self._encoder.join(timeout=1.0)
+
+
+class SnapshotWriter:
+    def __init__(self, ring=None, directory='.', prefix='capture'):
+        """
+        Writes snapshots and pre-roll clips on a background thread
+
+        snapshot() and clip() return the output path immediately; the
+        files appear once the writer thread gets to them.
+
+        Args:
+            ring (FrameRing): Source of pre-roll frames, None when only
+                explicit frames are saved
+            directory (str): Where files are written
+            prefix (str): File name prefix, followed by a timestamp
+        """
+        self.ring = ring
+        self.directory = directory
+        self.prefix = prefix
+        self.written = []
+
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _path(self, extension, path=None):
+        if path is not None:
+            return path
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.directory, f"{self.prefix}_{stamp}.{extension}")
+
+    def snapshot(self, frame=None, path=None, lookback=0.0):
+        """
+        Save `frame`, or the ring frame from `lookback` seconds ago; the
+        frame is not copied, so callers must not reuse its buffer
+        """
+        path = self._path('jpg', path)
+        self._jobs.put(('snapshot', path, frame, time.time() - lookback))
+        return path
+
+    def clip(self, seconds_before=3.0, seconds_after=0.0, path=None):
+        """Save the last `seconds_before` plus the next `seconds_after` seconds as an AVI"""
+        path = self._path('avi', path)
+        now = time.time()
+        self._jobs.put(('clip', path, (now - seconds_before, now + seconds_after), None))
+        return path
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            kind, path, argument, at = job
+            try:
+                if kind == 'snapshot':
+                    self._write_snapshot(path, argument, at)
+                else:
+                    self._write_clip(path, *argument)
+                self.written.append(path)
+                logging.info(f"Saved {path}")
+            except Exception as e:
+                logging.error(f"Could not write {path}: {e}")
+
+    def _write_snapshot(self, path, frame, at):
+        if frame is None:
+            item = self.ring.nearest(at) if self.ring is not None else None
+            if item is None:
+                raise RuntimeError("no frames buffered yet")
+            payload = item[1]
+            # Already JPEG-encoded: write the bytes as they are
+            if isinstance(payload, bytes) and path.lower().endswith(('.jpg', '.jpeg')):
+                with open(path, 'wb') as f:
+                    f.write(payload)
+                return
+            frame = self.ring.decode(payload)
+        if not cv2.imwrite(path, frame):
+            raise RuntimeError("cv2.imwrite failed")
+
+    def _write_clip(self, path, since, until):
+        # Post-roll: wait until those frames have been captured
+        delay = until - time.time()
+        if delay > 0:
+            time.sleep(delay + 1.0 / self.ring.max_fps)
+        frames = self.ring.frames(since, until)
+        if not frames:
+            raise RuntimeError("no frames buffered for the clip")
+
+        first = self.ring.decode(frames[0][1])
+        height, width = first.shape[:2]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), self.ring.max_fps, (width, height))
+        try:
+            writer.write(first)
+            for _, payload in frames[1:]:
+                writer.write(self.ring.decode(payload))
+        finally:
+            writer.release()
+
+    def close(self, wait=True):
+        """Finish (or with wait=False, abandon) queued writes"""
+        if not wait:
+            while True:
+                try:
+                    self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+        self._jobs.put(None)
+        self._thread.join()
@@ -0,0 +1,184 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class FrameResult:
+    def __init__(self, sequence):
+        """Merged output of every task run on one frame"""
+        self.sequence = sequence
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+    @property
+    def latency(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class _FrameRun:
+    """Book-keeping for one frame travelling through the graph"""
+
+    def __init__(self, graph, context):
+        self.graph = graph
+        self.context = context
+        self.result = FrameResult(getattr(context, 'sequence', None))
+        self.future = Future()
+        self.waiting = {name: set(task.after) for name, task in graph.tasks.items()}
+        self.remaining = len(graph.tasks)
+        self.lock = threading.Lock()
+
+    def start(self):
+        ready = [name for name, deps in self.waiting.items() if not deps]
+        if not ready:
+            self._finish()
+        for name in ready:
+            self._submit(name)
+
+    def _submit(self, name):
+        task = self.graph.tasks[name]
+        inputs = {dep: self.result.results.get(dep) for dep in task.after}
+        self.graph.executor.submit(self._run, name, task, inputs)
+
+    def _run(self, name, task, inputs):
+        started = time.perf_counter()
+        try:
+            value = task.func(self.context, inputs)
+            error = None
+        except Exception as e:
+            value, error = None, e
+            logging.error(f"Frame {self.result.sequence} task {name} failed: {e}")
+        self._complete(name, value, error, time.perf_counter() - started)
+
+    def _complete(self, name, value, error, seconds):
+        ready, skipped = [], []
+        with self.lock:
+            self.result.timings[name] = seconds
+            if error is None:
+                self.result.results[name] = value
+            else:
+                self.result.errors[name] = error
+            self.remaining -= 1
+            done = self.remaining == 0
+
+            for other, deps in self.waiting.items():
+                if name in deps:
+                    deps.discard(name)
+                    if deps:
+                        continue
+                    if error is None and not any(d in self.result.errors for d in self.graph.tasks[other].after):
+                        ready.append(other)
+                    else:
+                        skipped.append(other)
+
+        for other in skipped:
+            self._complete(other, None, RuntimeError("skipped, an upstream task failed"), 0.0)
+        for other in ready:
+            self._submit(other)
+        if done:
+            self._finish()
+
+    def _finish(self):
+        self.result.finished = time.perf_counter()
+        self.future.set_result(self.result)
+
+
+class _Task:
+    def __init__(self, func, after):
+        self.func = func
+        self.after = tuple(after)
+
+
+class FrameGraph:
+    def __init__(self, max_workers=4, executor=None, max_in_flight=2):
+        """
+        Per-frame task graph: independent analyses run in parallel
+
+        Tasks are called as func(context, inputs) where `inputs` maps each
+        dependency name to its result. OpenCV, TensorFlow and ONNX release
+        the GIL, so a thread pool gives real parallelism. For example:
+
+            graph.add('objects', detect_objects)
+            graph.add('faces', detect_faces)
+            graph.add('sign_text', ocr_inside_boxes, after=['objects'])
+
+        Args:
+            max_workers (int): Thread pool size when no executor is given
+            executor (Executor): Shared pool to run tasks on
+            max_in_flight (int): Frames allowed in the graph at once before
+                submit() starts dropping new frames
+        """
+        self.tasks = {}
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        self.max_in_flight = max_in_flight
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._delivery_lock = threading.Lock()
+        self._sequence = 0
+        self._active = set()
+        self._pending = {}
+        self._callbacks = []
+
+    def add(self, name, func, after=()):
+        """Register a task; dependencies must already be registered"""
+        if name in self.tasks:
+            raise ValueError(f"Task {name} already registered")
+        missing = [dep for dep in after if dep not in self.tasks]
+        if missing:
+            raise ValueError(f"Task {name} depends on unknown task(s) {missing}")
+        self.tasks[name] = _Task(func, after)
+        return func
+
+    def on_result(self, callback):
+        """Call callback(FrameResult) for every frame, in sequence order"""
+        self._callbacks.append(callback)
+
+    def submit(self, context):
+        """
+        Start all tasks for `context`; returns a Future of FrameResult, or
+        None if max_in_flight frames are already being processed
+        """
+        with self._lock:
+            if len(self._active) >= self.max_in_flight:
+                self.dropped += 1
+                return None
+            if getattr(context, 'sequence', None) is None:
+                context.sequence = self._sequence
+            self._sequence = max(self._sequence, context.sequence) + 1
+            self._active.add(context.sequence)
+
+        run = _FrameRun(self, context)
+        run.future.add_done_callback(self._frame_done)
+        run.start()
+        return run.future
+
+    def run(self, context):
+        """Process one frame and wait for its merged result"""
+        future = self.submit(context)
+        if future is None:
+            raise RuntimeError("Too many frames in flight")
+        return future.result()
+
+    def _frame_done(self, future):
+        result = future.result()
+        with self._delivery_lock:
+            with self._lock:
+                self._active.discard(result.sequence)
+                self._pending[result.sequence] = result
+                # Hold results back only while an earlier frame is still running
+                oldest_active = min(self._active, default=float('inf'))
+                deliver = [self._pending.pop(sequence) for sequence in sorted(self._pending)
+                           if sequence < oldest_active]
+            for ready in deliver:
+                for callback in self._callbacks:
+                    callback(ready)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,162 @@
+import time
+import logging
+from collections import deque
+from configparser import ConfigParser
+
+# Quality ladder, best first. The governor moves one step at a time.
+LEVELS = [
+    {'input_size': 640, 'detect_every': 1, 'ocr_interval': 3.0},
+    {'input_size': 480, 'detect_every': 1, 'ocr_interval': 4.0},
+    {'input_size': 416, 'detect_every': 2, 'ocr_interval': 5.0},
+    {'input_size': 320, 'detect_every': 2, 'ocr_interval': 6.0},
+    {'input_size': 256, 'detect_every': 3, 'ocr_interval': 8.0},
+]
+
+# Default latency targets (seconds): per camera frame, and per OCR pass, which
+# takes far longer than a frame and would otherwise pin the lowest level
+TARGET_DEFAULTS = {'target_latency': 0.3, 'ocr_target_latency': 2.0}
+
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+CPU_FREQ = '/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq'
+CPU_MAX_FREQ = '/sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq'
+
+
+def _read_sysfs_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_cpu_temperature():
+    """SoC temperature in degrees C, or None where it is not exposed"""
+    value = _read_sysfs_int(THERMAL_ZONE)
+    return None if value is None else value / 1000.0
+
+
+def read_cpu_frequency():
+    """(current MHz, max MHz), either may be None"""
+    current, maximum = _read_sysfs_int(CPU_FREQ), _read_sysfs_int(CPU_MAX_FREQ)
+    return (None if current is None else current / 1000.0,
+            None if maximum is None else maximum / 1000.0)
+
+
+class QualityGovernor:
+    def __init__(self, target_latency=0.3, levels=LEVELS, start_level=0, window=30,
+                 headroom=0.6, cooldown=3.0, max_temperature=75.0, profiler=None):
+        """
+        Steps detector input size, detection frequency and OCR cadence to
+        hold an end-to-end latency target
+
+        Args:
+            target_latency (float): Seconds per frame the loop should stay under
+            levels (list): Quality ladder, best first
+            start_level (int): Index into `levels` to start from
+            window (int): Number of recent latency samples considered
+            headroom (float): Step up only when p90 < target * headroom
+            cooldown (float): Minimum seconds between two decisions
+            max_temperature (float): Step down above this SoC temperature (C)
+            profiler (Profiler): Optional, per-stage timings are logged with decisions
+        """
+        self.target_latency = target_latency
+        self.levels = levels
+        self.level = start_level
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.max_temperature = max_temperature
+        self.profiler = profiler
+
+        self._latencies = deque(maxlen=window)
+        self._last_decision = time.monotonic()
+        self._frame_index = 0
+        self._last_ocr = 0.0
+
+    @classmethod
+    def from_config(cls, path='config.ini', profiler=None, target='target_latency'):
+        """
+        Build a governor from the [Governor] section of config.ini; `target`
+        names the latency key, e.g. 'ocr_target_latency' for an OCR loop
+        """
+        config = ConfigParser()
+        config.read(path)
+        if not config.has_section('Governor'):
+            return cls(target_latency=TARGET_DEFAULTS.get(target, 0.3), profiler=profiler)
+        section = config['Governor']
+        return cls(target_latency=section.getfloat(target, fallback=TARGET_DEFAULTS.get(target, 0.3)),
+                   start_level=section.getint('start_level', fallback=0),
+                   max_temperature=section.getfloat('max_temperature', fallback=75.0),
+                   cooldown=section.getfloat('cooldown', fallback=3.0),
+                   profiler=profiler)
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    @property
+    def input_size(self):
+        return self.settings['input_size']
+
+    @property
+    def detect_every(self):
+        return self.settings['detect_every']
+
+    @property
+    def ocr_interval(self):
+        return self.settings['ocr_interval']
+
+    def should_detect(self):
+        """Call once per frame; True on frames the detector should run"""
+        self._frame_index += 1
+        return self._frame_index % self.detect_every == 0
+
+    def should_ocr(self):
+        """True when OCR is due under the current cadence"""
+        now = time.monotonic()
+        if now - self._last_ocr >= self.ocr_interval:
+            self._last_ocr = now
+            return True
+        return False
+
+    def observe(self, latency):
+        """Record one end-to-end frame latency (seconds) and maybe change level"""
+        self._latencies.append(latency)
+        self.update()
+
+    def _p90(self):
+        ordered = sorted(self._latencies)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def update(self):
+        now = time.monotonic()
+        if now - self._last_decision < self.cooldown or len(self._latencies) < 5:
+            return
+
+        p90 = self._p90()
+        temperature = read_cpu_temperature()
+        hot = temperature is not None and temperature >= self.max_temperature
+
+        if (p90 > self.target_latency or hot) and self.level < len(self.levels) - 1:
+            reason = f"p90 {p90 * 1000:.0f} ms > {self.target_latency * 1000:.0f} ms" if not hot \
+                else f"temperature {temperature:.1f} C"
+            self._change(self.level + 1, reason, p90, temperature)
+        elif (p90 < self.target_latency * self.headroom and self.level > 0
+              and (temperature is None or temperature < self.max_temperature - 5)):
+            self._change(self.level - 1, f"p90 {p90 * 1000:.0f} ms has headroom", p90, temperature)
+
+    def _change(self, level, reason, p90, temperature):
+        previous = self.settings
+        self.level = level
+        self._last_decision = time.monotonic()
+        self._latencies.clear()
+
+        current_mhz, max_mhz = read_cpu_frequency()
+        stages = ''
+        if self.profiler is not None and self.profiler.enabled:
+            snapshot = self.profiler.snapshot()['stages']
+            stages = ', '.join(f"{name} {stats['p50_s'] * 1000:.0f} ms" for name, stats in snapshot.items())
+        logging.info(
+            f"Governor level {level} ({reason}): {previous} -> {self.settings}; "
+            f"p90={p90 * 1000:.0f} ms, temp={temperature} C, cpu={current_mhz}/{max_mhz} MHz"
+            + (f"; stages: {stages}" if stages else "")
+        )
@@ -0,0 +1,314 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import deque, namedtuple
+from configparser import ConfigParser
+
+# Classes whose boxes growing quickly means something is coming at the user
+APPROACH_CLASSES = ('person', 'bicycle', 'car', 'motorcycle', 'bus', 'truck')
+
+# Speech priorities, lower is more urgent
+ALERT = 0
+NORMAL = 1
+
+Hazard = namedtuple('Hazard', ['kind', 'label', 'direction', 'message', 'trace'])
+
+_trace_ids = itertools.count(1)
+
+
+class Trace:
+    __slots__ = ('trace_id', 'stamps')
+
+    def __init__(self, capture=None):
+        """
+        Timestamps (time.perf_counter) of one frame or sensor reading on its
+        way to the user's ear: capture, inference, alert, audio_start
+        """
+        self.trace_id = next(_trace_ids)
+        self.stamps = {'capture': time.perf_counter() if capture is None else capture}
+
+    def stamp(self, name):
+        self.stamps[name] = time.perf_counter()
+        return self
+
+    def elapsed(self, until='audio_start'):
+        """Seconds from capture to stamp `until`, None if not reached"""
+        end = self.stamps.get(until)
+        return None if end is None else end - self.stamps['capture']
+
+    def __repr__(self):
+        capture = self.stamps['capture']
+        steps = ', '.join(f"{name}=+{(t - capture) * 1000:.1f}ms" for name, t in self.stamps.items()
+                          if name != 'capture')
+        return f"Trace({self.trace_id}: {steps})"
+
+
+class LatencyTracker:
+    def __init__(self, deadline=0.25, window=500, profiler=None):
+        """
+        Capture-to-audio latency of hazard alerts against a deadline
+
+        Args:
+            deadline (float): Seconds an alert may take from capture to audio start
+            window (int): Number of recent alerts the percentiles cover
+            profiler (Profiler): Optional, alerts are recorded as stage 'hazard_alert'
+        """
+        self.deadline = deadline
+        self.profiler = profiler
+        self.latencies = deque(maxlen=window)
+        self.alerts = 0
+        self.missed = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path='config.ini', profiler=None):
+        """Deadline from the [Hazard] section of config.ini"""
+        config = ConfigParser()
+        config.read(path)
+        return cls(deadline=config.getfloat('Hazard', 'deadline', fallback=0.25), profiler=profiler)
+
+    def record(self, trace):
+        latency = trace.elapsed('audio_start')
+        if latency is None:
+            return
+        with self._lock:
+            self.latencies.append(latency)
+            self.alerts += 1
+            if latency > self.deadline:
+                self.missed += 1
+                logging.warning(f"Hazard alert over deadline: {trace}")
+        if self.profiler is not None:
+            self.profiler.record('hazard_alert', latency)
+
+    def percentile(self, fraction):
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        p50, p99 = self.percentile(0.5), self.percentile(0.99)
+        if p50 is None:
+            return "no hazard alerts"
+        return (f"hazard alerts: {self.alerts}, p50 {p50 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, "
+                f"{self.missed} over the {self.deadline * 1000:.0f} ms deadline")
+
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def direction_of(box, frame_width):
+    """'left', 'ahead' or 'right' from the box centre"""
+    centre = (box[0] + box[2]) / 2 / frame_width
+    return 'left' if centre < 1 / 3 else 'right' if centre > 2 / 3 else 'ahead'
+
+
+class HazardDetector:
+    def __init__(self, distance_cm=100, growth=1.4, growth_window=0.6, min_area=0.04,
+                 classes=APPROACH_CLASSES, cooldown=2.0):
+        """
+        Turns sensor readings and detections into hazards, kept cheap so it
+        can run on every frame ahead of everything else
+
+        Args:
+            distance_cm (float): Ultrasonic readings below this are hazards
+            growth (float): Box area ratio over growth_window that counts as approaching
+            growth_window (float): Seconds over which box growth is measured
+            min_area (float): Ignore boxes smaller than this fraction of the frame
+            classes (tuple): Classes checked for approach
+            cooldown (float): Seconds before the same hazard is announced again
+        """
+        self.distance_cm = distance_cm
+        self.growth = growth
+        self.growth_window = growth_window
+        self.min_area = min_area
+        self.classes = set(classes)
+        self.cooldown = cooldown
+
+        self._tracks = {}
+        self._last_alert = {}
+
+    @classmethod
+    def from_config(cls, path='config.ini'):
+        """Build a detector from the [Hazard] section of config.ini"""
+        config = ConfigParser()
+        config.read(path)
+        if not config.has_section('Hazard'):
+            return cls()
+        section = config['Hazard']
+        classes = section.get('classes', fallback=None)
+        return cls(distance_cm=section.getfloat('distance_cm', fallback=100),
+                   growth=section.getfloat('growth', fallback=1.4),
+                   classes=tuple(c.strip() for c in classes.split(',')) if classes else APPROACH_CLASSES)
+
+    def _due(self, key):
+        now = time.monotonic()
+        if now - self._last_alert.get(key, 0.0) < self.cooldown:
+            return False
+        self._last_alert[key] = now
+        return True
+
+    def check_distances(self, distances, trace):
+        """Hazards for {direction: cm} readings closer than distance_cm"""
+        hazards = []
+        for direction, distance in distances.items():
+            if distance < self.distance_cm and self._due(('distance', direction)):
+                hazards.append(Hazard('distance', None, direction,
+                                      f"Stop, obstacle {distance:.0f} centimetres {direction}", trace))
+        return hazards
+
+    def check_detections(self, detections, frame_shape, trace):
+        """
+        Hazards for boxes of APPROACH_CLASSES that grew by `growth` within
+        growth_window seconds; detections are inference_server.Detection
+        """
+        height, width = frame_shape[:2]
+        frame_area = float(width * height)
+        now = trace.stamps['capture']
+        hazards = []
+        tracks = {}
+
+        for detection in detections:
+            if detection.name not in self.classes:
+                continue
+            box = detection.box
+            area = (box[2] - box[0]) * (box[3] - box[1]) / frame_area
+
+            # Follow the best overlapping box of the same class from earlier frames
+            history = None
+            best = 0.3
+            for previous_box, previous_history in self._tracks.get(detection.name, ()):
+                overlap = _iou(box, previous_box)
+                if overlap > best:
+                    best, history = overlap, previous_history
+            history = deque(history or (), maxlen=16)
+            while history and now - history[0][0] > self.growth_window:
+                history.popleft()
+            history.append((now, area))
+            tracks.setdefault(detection.name, []).append((box, history))
+
+            oldest_area = history[0][1]
+            if area >= self.min_area and oldest_area > 0 and area / oldest_area >= self.growth:
+                direction = direction_of(box, width)
+                if self._due(('approach', detection.name, direction)):
+                    where = 'ahead' if direction == 'ahead' else f"on your {direction}"
+                    hazards.append(Hazard('approach', detection.name, direction,
+                                          f"Careful, {detection.name} approaching {where}", trace))
+
+        self._tracks = tracks
+        return hazards
+
+    def attach(self, hub, speech):
+        """Handle DISTANCE and DETECTIONS events of an event_hub.EventHub"""
+        from event_hub import DISTANCE, DETECTIONS, FRAME
+
+        frame_shapes = {}
+
+        def on_frame(event):
+            frame_shapes[event.source] = event.data.shape
+
+        def on_distance(event):
+            trace = Trace(capture=event.timestamp).stamp('inference')
+            for hazard in self.check_distances(event.data, trace):
+                speech.alert(hazard.message, trace)
+
+        def on_detections(event):
+            shape = frame_shapes.get(event.source)
+            if shape is None:
+                return
+            trace = Trace(capture=event.timestamp).stamp('inference')
+            for hazard in self.check_detections(event.data, shape, trace):
+                speech.alert(hazard.message, trace)
+
+        hub.on(FRAME, on_frame, maxsize=1)
+        hub.on(DISTANCE, on_distance, maxsize=1)
+        hub.on(DETECTIONS, on_detections, maxsize=1)
+
+
+class PrioritySpeech:
+    def __init__(self, speak, tracker=None):
+        """
+        One speech thread with a hazard lane
+
+        say() queues normal speech. alert() drops all queued normal speech
+        and is spoken next, stamping its trace at audio start. The utterance
+        in progress is never stopped from the alerting thread: speak() may
+        poll preempted() on the speech thread and return early, as
+        streaming_tts.Pyttsx3Backend.play does between words.
+
+        Args:
+            speak (callable): Blocking speak(text)
+            tracker (LatencyTracker): Records capture-to-audio latency of alerts
+        """
+        self.speak = speak
+        self.tracker = tracker
+
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._current = None
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def say(self, text):
+        with self._condition:
+            heapq.heappush(self._queue, (NORMAL, next(self._sequence), text, None))
+            self._condition.notify()
+
+    def alert(self, text, trace=None):
+        if trace is not None:
+            trace.stamp('alert')
+        with self._condition:
+            self._queue = [item for item in self._queue if item[0] == ALERT]
+            heapq.heapify(self._queue)
+            heapq.heappush(self._queue, (ALERT, next(self._sequence), text, trace))
+            self._condition.notify()
+
+    def preempted(self):
+        """True while normal speech is playing and an alert waits behind it"""
+        with self._condition:
+            return self._current == NORMAL and bool(self._queue) and self._queue[0][0] == ALERT
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._closing)
+                if not self._queue:
+                    return
+                priority, _, text, trace = heapq.heappop(self._queue)
+                self._current = priority
+            if trace is not None:
+                trace.stamp('audio_start')
+                if self.tracker is not None:
+                    self.tracker.record(trace)
+            try:
+                self.speak(text)
+            except Exception as e:
+                logging.error(f"Speech failed: {e}")
+            finally:
+                with self._condition:
+                    self._current = None
+                    self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until everything queued has been spoken"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and self._current is None, timeout)
+
+    def close(self, wait=True):
+        if wait:
+            self.wait()
+        with self._condition:
+            self._closing = True
+            self._queue = []
+            self._condition.notify_all()
+        self._thread.join(timeout=5)
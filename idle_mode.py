@@ -0,0 +1,203 @@
+import time
+import logging
+import threading
+from collections import Counter, deque
+from configparser import ConfigParser
+
+import cv2
+import numpy as np
+
+ACTIVE = 'active'
+IDLE = 'idle'
+
+
+class MotionGate:
+    def __init__(self, enabled=True, idle_after=15.0, motion_threshold=0.01, pixel_delta=25,
+                 size=(64, 48), idle_fps=2.0, wake_distance_cm=150, profiler=None):
+        """
+        Low-power idle mode for a capture loop
+
+        While the scene changes, check() returns True and the loop runs its
+        full pipeline. After `idle_after` seconds without motion it returns
+        False; the loop then calls pause() and captures at `idle_fps`, with
+        only a tiny frame difference computed per frame. Motion, wake()
+        (voice commands, sensors) or a close distance reading end idling.
+
+        Args:
+            enabled (bool): False makes check() always return True
+            idle_after (float): Seconds of a static scene before idling
+            motion_threshold (float): Fraction of changed pixels that counts as motion
+            pixel_delta (int): Grey level change for a pixel to count as changed
+            size (tuple): Size the frames are shrunk to for differencing
+            idle_fps (float): Capture rate while idle
+            wake_distance_cm (float): DISTANCE readings below this wake the pipeline
+            profiler (Profiler): Optional, records 'wake_latency' and an 'idle' gauge
+        """
+        self.enabled = enabled
+        self.idle_after = idle_after
+        self.motion_threshold = motion_threshold
+        self.pixel_delta = pixel_delta
+        self.size = size
+        self.idle_interval = 1.0 / idle_fps
+        self.wake_distance_cm = wake_distance_cm
+        self.profiler = profiler
+
+        self.state = ACTIVE
+        self.wakes = Counter()
+        self.wake_latencies = deque(maxlen=200)
+
+        self._reference = None
+        self._last_motion = time.perf_counter()
+        self._last_sample = self._last_motion
+        self._woken = threading.Event()
+        self._wake_request = None
+        self._lock = threading.Lock()
+        # Seconds of wall and CPU time spent in each state, the idle power proxy
+        self._wall = Counter()
+        self._cpu = Counter()
+        self._clock = (time.perf_counter(), time.process_time())
+
+    @classmethod
+    def from_config(cls, path='config.ini', profiler=None):
+        """Idle settings from the [Idle] section of config.ini"""
+        config = ConfigParser()
+        config.read(path)
+        if not config.has_section('Idle'):
+            return cls(enabled=False, profiler=profiler)
+        section = config['Idle']
+        return cls(enabled=section.getboolean('enabled', fallback=False),
+                   idle_after=section.getfloat('idle_after', fallback=15.0),
+                   motion_threshold=section.getfloat('motion_threshold', fallback=0.01),
+                   idle_fps=section.getfloat('idle_fps', fallback=2.0),
+                   wake_distance_cm=section.getfloat('wake_distance_cm', fallback=150),
+                   profiler=profiler)
+
+    @property
+    def idle(self):
+        return self.state == IDLE
+
+    def _account(self):
+        now, cpu = time.perf_counter(), time.process_time()
+        self._wall[self.state] += now - self._clock[0]
+        self._cpu[self.state] += cpu - self._clock[1]
+        self._clock = (now, cpu)
+
+    def _set_state(self, state):
+        self._account()
+        if state != self.state:
+            logging.info(f"Capture loop {state}")
+        previous, self.state = self.state, state
+        if self.profiler is not None:
+            self.profiler.gauge('idle', 1 if state == IDLE else 0)
+            cpu = self.cpu_per_minute(previous)
+            if cpu is not None:
+                self.profiler.gauge(f'{previous}_cpu_seconds_per_minute', cpu)
+
+    def _motion(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        reference, self._reference = self._reference, small
+        if reference is None:
+            return 1.0
+        changed = cv2.absdiff(small, reference) > self.pixel_delta
+        return np.count_nonzero(changed) / changed.size
+
+    def wake(self, reason='command', timestamp=None):
+        """Leave idle mode at the next frame; safe to call from any thread"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._wake_request is None:
+                self._wake_request = (reason, time.perf_counter() if timestamp is None else timestamp)
+        self._woken.set()
+
+    @property
+    def wake_pending(self):
+        return self._woken.is_set()
+
+    def _record_wake(self, reason, since):
+        latency = time.perf_counter() - since
+        self.wakes[reason] += 1
+        self.wake_latencies.append(latency)
+        if self.profiler is not None:
+            self.profiler.record('wake_latency', latency)
+        logging.info(f"Woken by {reason} after {latency * 1000:.0f} ms")
+
+    def check(self, frame):
+        """True when this frame should go through the full pipeline"""
+        if not self.enabled:
+            return True
+        now = time.perf_counter()
+        motion = self._motion(frame) >= self.motion_threshold
+
+        with self._lock:
+            request, self._wake_request = self._wake_request, None
+        self._woken.clear()
+
+        if self.state == IDLE:
+            if request is not None:
+                self._set_state(ACTIVE)
+                self._record_wake(*request)
+                self._last_motion = now
+            elif motion:
+                self._set_state(ACTIVE)
+                # The motion started at some point since the previous idle sample
+                self._record_wake('motion', self._last_sample)
+                self._last_motion = now
+            else:
+                self._last_sample = now
+                self._account()
+                return False
+            return True
+
+        if motion or request is not None:
+            self._last_motion = now
+        elif now - self._last_motion > self.idle_after:
+            self._set_state(IDLE)
+            self._last_sample = now
+            return False
+        self._account()
+        return True
+
+    def pause(self):
+        """Wait out the idle capture interval; returns early on wake()"""
+        if self.state == IDLE:
+            self._woken.wait(self.idle_interval)
+
+    def attach(self, hub):
+        """Wake on COMMAND events and close DISTANCE readings of an event_hub.EventHub"""
+        from event_hub import COMMAND, DISTANCE
+
+        def on_command(event):
+            self.wake('command', event.timestamp)
+
+        def on_distance(event):
+            if self.idle and min(event.data.values()) < self.wake_distance_cm:
+                self.wake('sensor', event.timestamp)
+
+        hub.on(COMMAND, on_command)
+        hub.on(DISTANCE, on_distance, maxsize=1)
+
+    def cpu_per_minute(self, state):
+        """CPU seconds used per wall-clock minute in `state`, None if never in it"""
+        wall = self._wall[state]
+        return self._cpu[state] / wall * 60.0 if wall > 0 else None
+
+    def summary(self):
+        self._account()
+        if not self.enabled:
+            return "idle mode disabled"
+        total = sum(self._wall.values()) or 1.0
+        parts = [f"idle {self._wall[IDLE] / total:.0%} of the time"]
+        for state in (ACTIVE, IDLE):
+            cpu = self.cpu_per_minute(state)
+            if cpu is not None:
+                parts.append(f"{state} CPU {cpu:.1f} s/min")
+        if self.wake_latencies:
+            ordered = sorted(self.wake_latencies)
+            reasons = ', '.join(f"{reason} {count}" for reason, count in self.wakes.items())
+            parts.append(f"wakes: {reasons}, latency p50 {ordered[len(ordered) // 2] * 1000:.0f} ms, "
+                         f"max {ordered[-1] * 1000:.0f} ms")
+        return ', '.join(parts)
@@ -1,26 +1,60 @@
 import cv2
 import time
-from ultralytics import YOLO
-import pyttsx3
 import csv
 from datetime import datetime
+from profiler import Profiler
+from display import Display
+from detection_store import DetectionStore
+from governor import QualityGovernor
+from inference_server import open_detector
+from tiled_detection import tiled_detector
+from hazard import HazardDetector, LatencyTracker, PrioritySpeech, Trace
+from idle_mode import MotionGate
+from scene_summary import SceneSummarizer
+from streaming_tts import Pyttsx3Backend
 
-# Initialize YOLO model
-model = YOLO("yolov8n.pt")
+# YOLO detector, shared through the inference daemon when it is running, see [Inference] in config.ini
+# With [Tiling] enabled, the gaze region is also detected at higher resolution
+detector = tiled_detector(open_detector())
 
-# Initialize text-to-speech engine
-engine = pyttsx3.init()
+# Text-to-speech; the pyttsx3 engine is created on the speech thread on first use
+tts = Pyttsx3Backend()
+
+# Per-stage timings, see [Profiling] in config.ini
+profiler = Profiler.from_config()
+
+# Window, headless mode and MJPEG preview, see [Display] in config.ini
+display = Display.from_config()
+
+# Adapts input size and detection rate to a latency target, see [Governor] in config.ini
+governor = QualityGovernor.from_config(profiler=profiler)
+
+# Hazard lane: approaching objects preempt normal speech, see [Hazard] in config.ini
+hazards = HazardDetector.from_config()
+hazard_latency = LatencyTracker.from_config(profiler=profiler)
+
+# Static scene: drop to a low capture rate and skip detection, see [Idle] in config.ini
+idle = MotionGate.from_config(profiler=profiler)
+
+@profiler.timed('speech')
+def say(text):
+    # A hazard alert cuts the announcement short from the speech thread itself
+    tts.play(text, interrupted=speech.preempted)
+
+# Speech runs on its own thread so announcements never stall the loop
+speech = PrioritySpeech(say, hazard_latency)
 
 # Function to provide voice feedback
 def speak(text):
-    engine.say(text)
-    engine.runAndWait()
+    speech.say(text)
 
 # Parameters
-last_announcement_time = 0
-announcement_interval = 5  # Time interval for announcements in seconds
+announcement_interval = 5  # Minimum seconds between two scene announcements
 detection_threshold = 0.5  # Confidence threshold
+# Speaks only what changed in the scene: new objects, counts, positions, approach
+scene = SceneSummarizer(min_confidence=detection_threshold, min_interval=announcement_interval)
 log_file = "detections_log.csv"
+history = DetectionStore("detections_store")  # Indexed history, see detection_store.py
 
 # Initialize detection log
 with open(log_file, mode='w', newline='') as file:
@@ -37,55 +71,91 @@ speak("Webcam initialized. Starting object detection.")
 
 try:
     while True:
-        ret, frame = cap.read()
+        loop_start = time.perf_counter()
+        with profiler.stage('capture'):
+            ret, frame = cap.read()
+        trace = Trace()
         if not ret:
+            profiler.count('dropped_frames')
             speak("Unable to capture the frame.")
             break
 
-        # Perform object detection
-        results = model(frame, show=False)
-        detections = results[0].boxes
+        if not idle.check(frame):
+            idle.pause()
+            if display.poll_key(1) == ord('q'):
+                break
+            continue
+
+        # Perform object detection, on every Nth frame when the governor says so
+        detections = []
+        confident = None
+        if governor.should_detect():
+            with profiler.stage('inference'):
+                detections = detector.detect(frame, imgsz=governor.input_size)
+            trace.stamp('inference')
+            # Hazards go out before drawing, logging and announcements
+            confident = [d for d in detections if d.confidence > detection_threshold]
+            for hazard in hazards.check_detections(confident, frame.shape, trace):
+                speech.alert(hazard.message, trace)
         detected_objects = []
         object_count = {}
+        annotate = display.annotate
 
-        for box in detections:
-            confidence = box.conf[0]
+        for detection in detections:
+            confidence = detection.confidence
             if confidence > detection_threshold:
-                class_id = int(box.cls[0])
-                class_name = model.names[class_id]
+                class_name = detection.name
                 detected_objects.append(class_name)
 
                 # Count objects
                 object_count[class_name] = object_count.get(class_name, 0) + 1
 
                 # Draw bounding box and label
-                (x1, y1, x2, y2) = map(int, box.xyxy[0])
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(frame, f"{class_name} {confidence:.2f}", (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                (x1, y1, x2, y2) = detection.box
+                if annotate:
+                    with profiler.stage('draw'):
+                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                        cv2.putText(frame, f"{class_name} {confidence:.2f}", (x1, y1 - 10),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
                 # Log detection
-                with open(log_file, mode='a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([datetime.now(), class_name, f"{confidence:.2f}", (x1, y1, x2, y2)])
+                with profiler.stage('log'):
+                    with open(log_file, mode='a', newline='') as file:
+                        writer = csv.writer(file)
+                        writer.writerow([datetime.now(), class_name, f"{confidence:.2f}", (x1, y1, x2, y2)])
+                    history.append(time.time(), class_name, float(confidence), (x1, y1, x2, y2))
 
         # Display object count
-        count_text = ", ".join([f"{obj}: {count}" for obj, count in object_count.items()])
-        cv2.putText(frame, f"Detected: {count_text}", (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-        # Voice announcements every interval
-        current_time = time.time()
-        if current_time - last_announcement_time > announcement_interval and object_count:
-            speak(f"I see {count_text}")
-            last_announcement_time = current_time
+        if annotate:
+            with profiler.stage('draw'):
+                count_text = ", ".join(f"{obj}: {count}" for obj, count in object_count.items())
+                cv2.putText(frame, f"Detected: {count_text}", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+                profiler.draw_overlay(frame)
+
+        # Latency up to here is what the governor holds to its target
+        governor.observe(time.perf_counter() - loop_start)
+
+        # Voice announcements for scene changes, only on frames that went through the detector
+        if confident is not None:
+            announcement = scene.update(confident, frame.shape)
+            if announcement:
+                speak(announcement)
 
         # Display frame with updated title
-        cv2.imshow("ikshanaOB", frame)
+        with profiler.stage('imshow'):
+            display.show("ikshanaOB", frame)
+            key = display.poll_key(1)
+
+        profiler.record('loop', time.perf_counter() - loop_start)
+        profiler.maybe_export()
+        history.maybe_flush()
 
-        # Break the loop on 'q'
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        # Break the loop on 'q', 'd' describes everything in view
+        if key == ord('q'):
             break
+        if key == ord('d'):
+            speak(scene.describe())
 
 except KeyboardInterrupt:
     print("Object detection stopped.")
@@ -93,5 +163,12 @@ except KeyboardInterrupt:
 finally:
     # Release resources
     cap.release()
-    cv2.destroyAllWindows()
-    speak("Object detection stopped.")
\ No newline at end of file
+    display.close()
+    history.flush()
+    detector.close()
+    speak("Object detection stopped.")
+    speech.close()
+    print(hazard_latency.summary())
+    print(idle.summary())
+    print(scene.summary())
+    profiler.close()
\ No newline at end of file
@@ -1,10 +1,15 @@
 import cv2
-import pytesseract
-from PIL import Image
 import threading
+import time
 import logging
 import queue
 from typing import Optional, List, Dict
+from profiler import Profiler
+from governor import QualityGovernor
+from ocr_layout import read_layout
+
+# Width of the queued frames at the best governor level; lower levels scale it down
+OCR_FRAME_WIDTH = 320
 
 class SmartGlasses:
     def __init__(self, camera_index: int = 0, 
@@ -28,6 +33,12 @@ class SmartGlasses:
         # Thread-safe frame queue
         self.frame_queue = queue.Queue(maxsize=5)
         
+        # Per-stage timings, see [Profiling] in config.ini
+        self.profiler = Profiler.from_config()
+        
+        # Adapts the queued frame size to the OCR latency target, see [Governor] in config.ini
+        self.governor = QualityGovernor.from_config(profiler=self.profiler, target='ocr_target_latency')
+        
         # Model and resource management
         self._load_models()
         
@@ -71,34 +82,44 @@ class SmartGlasses:
     def capture_frames(self):
         """Enhanced frame capture with queue management"""
         while self.running:
-            ret, frame = self.camera.read()
+            with self.profiler.stage('capture'):
+                ret, frame = self.camera.read()
             if ret:
                 try:
                     # Non-blocking queue put with timeout
-                    resized_frame = cv2.resize(frame, (320, 240))
+                    with self.profiler.stage('resize'):
+                        # Level 0 keeps the original 320x240, lower levels shrink with the ladder
+                        scale = self.governor.input_size / self.governor.levels[0]['input_size']
+                        width = min(int(OCR_FRAME_WIDTH * scale), frame.shape[1])
+                        resized_frame = cv2.resize(frame, (width, width * 3 // 4))
                     if not self.frame_queue.full():
                         self.frame_queue.put_nowait(resized_frame)
+                    else:
+                        self.profiler.count('dropped_frames')
+                    self.profiler.gauge('frame_queue_depth', self.frame_queue.qsize())
                 except queue.Full:
+                    self.profiler.count('dropped_frames')
                     # Discard oldest frame if queue is full
                     try:
                         self.frame_queue.get_nowait()
                     except queue.Empty:
                         pass
-            
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                self.running = False
+            # No window is ever shown here, so no cv2.waitKey; quit with 'q' in run()
 
     def read_text(self) -> Optional[str]:
         """Enhanced OCR with better error handling"""
         try:
             frame = self.frame_queue.get(timeout=2)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            _, thresh = cv2.threshold(gray, 0, 255, 
-                                      cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            with self.profiler.stage('preprocess_ocr'):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                _, thresh = cv2.threshold(gray, 0, 255, 
+                                          cv2.THRESH_BINARY + cv2.THRESH_OTSU)
             
-            text = pytesseract.image_to_string(
-                Image.fromarray(thresh)
-            ).strip()
+            started = time.perf_counter()
+            with self.profiler.stage('ocr'):
+                # Largest, most central lines first; low-confidence words are dropped
+                text = '\n'.join(read_layout(thresh).ranked_texts())
+            self.governor.observe(time.perf_counter() - started)
             
             return text if text else "No text detected"
         
@@ -143,6 +164,7 @@ class SmartGlasses:
             self.running = False
             self.camera.release()
             cv2.destroyAllWindows()
+            self.profiler.close()
 
 if __name__ == "__main__":
     glasses = SmartGlasses()
@@ -5,19 +5,31 @@ import time
 import numpy as np
 import pyttsx3
 import tensorflow as tf
-from tensorflow.keras.preprocessing import image
 
 # Add src directory to the path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.picamera_utils import is_raspberry_camera, get_picamera
+from utils.picamera_utils import is_raspberry_camera
+from dual_stream_camera import DualStreamCamera
+from frame_context import FrameContext
+from frame_scheduler import FrameGraph
+from profiler import Profiler
+from display import Display
+from idle_mode import MotionGate
 
 CAMERA_DEVICE_ID = 0
 IMAGE_WIDTH = 320
 IMAGE_HEIGHT = 240
 IS_RASPI_CAMERA = is_raspberry_camera()
+# Failed reads in a row before giving up on a disconnected webcam
+MAX_READ_FAILURES = 50
+READ_RETRY_DELAY = 0.1
 fps = 0
 base_dir = os.path.dirname(os.path.abspath(__file__))
+profiler = Profiler.from_config(os.path.join(base_dir, 'config.ini'))
+display = Display.from_config(os.path.join(base_dir, 'config.ini'))
+# Static scene: low capture rate and no models, see [Idle] in config.ini
+idle = MotionGate.from_config(os.path.join(base_dir, 'config.ini'), profiler=profiler)
 
 # Load the cascade
 face_cascade = cv2.CascadeClassifier(os.path.join(base_dir, 'haarcascade_frontalface_default.xml'))
@@ -25,8 +37,14 @@ face_cascade = cv2.CascadeClassifier(os.path.join(base_dir, 'haarcascade_frontal
 # Load pre-trained currency recognition model
 currency_model = tf.keras.models.load_model('currency_model.h5')
 
+# One engine for the whole session; pyttsx3.init() per utterance leaks driver resources
+engine = None
+
+@profiler.timed('speech')
 def text_to_speech(text):
-    engine = pyttsx3.init()
+    global engine
+    if engine is None:
+        engine = pyttsx3.init()
     engine.say(text)
     engine.runAndWait()
 
@@ -48,69 +66,102 @@ def visualize_fps(image, fps: int):
 
     return image
 
-def detect_faces_and_speak(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+# Assuming class 0 = 10 INR, class 1 = 20 INR, class 2 = 50 INR, etc.
+CURRENCY_NAMES = {0: "10 INR", 1: "20 INR", 2: "50 INR"}
+
+def detect_faces(context, inputs):
+    with profiler.stage('preprocess_faces'):
+        gray = context.gray
+    with profiler.stage('inference_faces'):
+        return face_cascade.detectMultiScale(gray, 1.1, 4)
+
+def recognize_currency(context, inputs):
+    # Preprocess the image for the model: RGB, 224x224, scaled to [0, 1]
+    with profiler.stage('preprocess_currency'):
+        img = context.batch((224, 224), 'rgb')
     
+    with profiler.stage('inference_currency'):
+        prediction = currency_model.predict(img, verbose=0)
+    return int(np.argmax(prediction, axis=1)[0])
+
+def announce_and_draw(frame, result, annotate=True):
+    faces = result.get('faces', ())
     if len(faces) > 0:
         text_to_speech("Face detected!")
     
+    currency = CURRENCY_NAMES.get(result.get('currency'))
+    if currency:
+        text_to_speech(f"Detected {currency}")
+    
     # Draw rectangle around faces
-    for (x, y, w, h) in faces:
-        cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
+    if annotate:
+        for (x, y, w, h) in faces:
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
     
     return frame
 
-def recognize_currency(frame):
-    # Preprocess the image for the model
-    img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    img = cv2.resize(img, (224, 224))
-    img = image.img_to_array(img)
-    img = np.expand_dims(img, axis=0) / 255.0
-    
-    prediction = currency_model.predict(img)
-    predicted_class = np.argmax(prediction, axis=1)
-    
-    # Assuming class 0 = 10 INR, class 1 = 20 INR, class 2 = 50 INR, etc.
-    if predicted_class == 0:
-        text_to_speech("Detected 10 INR")
-    elif predicted_class == 1:
-        text_to_speech("Detected 20 INR")
-    elif predicted_class == 2:
-        text_to_speech("Detected 50 INR")
-    
-    return frame
+# Independent analyses run in parallel on each frame
+analysis_graph = FrameGraph(max_workers=2)
+analysis_graph.add('faces', detect_faces)
+analysis_graph.add('currency', recognize_currency)
 
 # To capture video from webcam.
 if IS_RASPI_CAMERA:
-    cap = get_picamera(IMAGE_WIDTH, IMAGE_HEIGHT)
+    # Detection runs on the small stream; the full-res stream stays available
+    cap = DualStreamCamera(lores_size=(IMAGE_WIDTH, IMAGE_HEIGHT))
     cap.start()
 else:
     cap = cv2.VideoCapture(CAMERA_DEVICE_ID)
     cap.set(3, IMAGE_WIDTH)
     cap.set(4, IMAGE_HEIGHT)
 
+read_failures = 0
 while True:
     start_time = time.time()
-    if IS_RASPI_CAMERA:
-        frame = cap.capture_array()
-    else:
-        _, frame = cap.read()
+    with profiler.stage('capture'):
+        if IS_RASPI_CAMERA:
+            frame = cap.capture_lores()
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                profiler.count('dropped_frames')
+                read_failures += 1
+                if read_failures >= MAX_READ_FAILURES:
+                    print("Camera stopped delivering frames, exiting")
+                    break
+                time.sleep(READ_RETRY_DELAY)
+                continue
+            read_failures = 0
+    
+    if not idle.check(frame):
+        idle.pause()
+        continue
     
-    # Detect faces and currency
-    frame = detect_faces_and_speak(frame)
-    frame = recognize_currency(frame)
+    # Detect faces and currency in parallel; derived images are computed once per frame
+    annotate = display.annotate
+    with FrameContext(frame) as context:
+        result = analysis_graph.run(context)
+    frame = announce_and_draw(frame, result, annotate)
     
-    cv2.imshow('Live Feed', visualize_fps(frame, fps))
+    if annotate:
+        with profiler.stage('draw'):
+            frame = profiler.draw_overlay(visualize_fps(frame, fps))
+    with profiler.stage('imshow'):
+        display.show('Live Feed', frame)
     
     end_time = time.time()
     seconds = end_time - start_time
     fps = 1.0 / seconds
+    profiler.record('loop', seconds)
+    profiler.maybe_export()
     print("Estimated fps:{0:0.1f}".format(fps))
     
-    k = cv2.waitKey(30) & 0xff
+    with profiler.stage('waitkey'):
+        k = display.poll_key(30)
     if k == 27:
         break
 
 cap.close() if IS_RASPI_CAMERA else cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+analysis_graph.shutdown()
+display.close()
+profiler.close()
\ No newline at end of file
@@ -11,8 +11,11 @@ from PyQt5 import QtGui
 import pytesseract
 from PIL import Image
 from pytesseract import image_to_string
-from gtts import gTTS
 import os
+from qt_video import FrameView, capture_interval_ms
+from streaming_tts import gtts_speaker
+from frame_ring import FrameRing, SnapshotWriter
+from ocr_layout import read_layout
 
 #pytesseract.pytesseract.TesseractNotFoundError: tesseract is not installed or it's not in your path
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
@@ -28,11 +31,19 @@ class RecordVideo(QtCore.QObject):
     def __init__(self, camera_port=0, parent=None):
         super().__init__(parent)
         self.camera = cv2.VideoCapture(camera_port)
+        # Plays the first sentence while later ones are still being synthesized
+        self.speaker = gtts_speaker(lang='es')
+        # The last seconds of video, so a screenshot shows the moment of the click
+        self.ring = FrameRing(seconds=2.0)
+        # Screenshots are encoded and written off the GUI thread
+        self.snapshots = SnapshotWriter(self.ring)
+        self.last_frame = None
 
         self.timer = QtCore.QBasicTimer()
 
     def start_recording(self):
-        self.timer.start(0, self)
+        # Poll at the camera's frame rate; read() would otherwise block the event loop
+        self.timer.start(capture_interval_ms(self.camera), self)
 
     
     def timerEvent(self, event):
@@ -41,62 +52,37 @@ class RecordVideo(QtCore.QObject):
 
         read, data = self.camera.read()
         if read:
+            self.last_frame = data
+            self.ring.push(data)
             self.image_data.emit(data)
     def framesave(self):
         
-        read, data = self.camera.read()
-        if read:
-            cv2.imwrite('a.png',data)
+        # The frame on screen when the button was pressed, not the next one from the camera
+        data = self.last_frame
+        if data is not None:
+            self.snapshots.snapshot(path='a.png')
             img=Image.fromarray(data)
             img.load()
             
-            text=pytesseract.image_to_string(img, lang='spa', config=tessdata_dir_config)
+            # Largest, most central lines first; low-confidence words are dropped
+            text='\n'.join(read_layout(img, lang='spa', config=tessdata_dir_config).ranked_texts())
             print ('Text_Found: ',text,len(text))
             if len(text)>0:
-                tts = gTTS(text=text, lang='ES')# for english language use (lang='en')
-                tts.save("pcvoice.mp3")
-                os.system("start pcvoice.mp3")
+                # A new capture replaces whatever is still being read out
+                self.speaker.cancel()
+                self.speaker.speak(text)
 
 
-class FaceDetectionWidget(QtWidgets.QWidget):
+class FaceDetectionWidget(FrameView):
     def __init__(self, parent=None):
-        super().__init__(parent)
-        self.image = QtGui.QImage()
+        super().__init__(parent=parent)
         self._red = (0, 0, 255)
         self._width = 2
         self._min_size = (30, 30)
 
-
-    def image_data_slot(self, image_data):
-
-
-        
-        self.image = self.get_qimage(image_data)
-        if self.image.size() != self.size():
-            self.setFixedSize(self.image.size())
-
-        self.update()
-    
-        
-        
-    def get_qimage(self, image: np.ndarray):
-        height, width, colors = image.shape
-        bytesPerLine = 3 * width
-        QImage = QtGui.QImage
-
-        image = QImage(image.data,
-                       width,
-                       height,
-                       bytesPerLine,
-                       QImage.Format_RGB888)
-
-        image = image.rgbSwapped()
-        return image
-
-    def paintEvent(self, event):
-        painter = QtGui.QPainter(self)
-        painter.drawImage(0, 0, self.image)
-        self.image = QtGui.QImage()
+    def on_new_image(self, image):
+        if image.size() != self.size():
+            self.setFixedSize(image.size())
 
 
 class MainWidget(QtWidgets.QWidget):
@@ -0,0 +1,417 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import secrets
+import struct
+import logging
+import argparse
+import threading
+import socketserver
+from collections import namedtuple
+from configparser import ConfigParser
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_SOCKET = '/tmp/ikshana-inference.sock'
+DEFAULT_MODEL = 'yolov8n'
+
+# Weights for every model the daemon can serve, loaded on first use
+MODEL_WEIGHTS = {
+    'yolov8n': 'yolov8n.pt',
+}
+
+# Shared memory segments created by Ikshana processes are named SHM_PREFIX<pid>-<random>
+SHM_PREFIX = 'ikshana-'
+
+Detection = namedtuple('Detection', ['class_id', 'name', 'confidence', 'box'])
+
+_HEADER = struct.Struct('!I')
+
+
+def _send_message(sock, message):
+    payload = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Inference socket closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _recv_message(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+def segment_name():
+    """Name for a new shared memory segment, telling soak.py which process created it"""
+    return f"{SHM_PREFIX}{os.getpid()}-{secrets.token_hex(4)}"
+
+
+def _attach_shared_memory(name):
+    """Attach to a client's segment without letting this process unlink it on exit"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    except Exception:
+        pass
+    return segment
+
+
+class YoloBackend:
+    def __init__(self, weights):
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.names = self.model.names
+
+    def predict(self, frames, imgsz=640, conf=0.25):
+        """Run one batched forward pass, returns a list of Detection lists"""
+        results = self.model(frames, imgsz=imgsz, conf=conf, verbose=False)
+        batch = []
+        for result in results:
+            boxes = result.boxes
+            xyxy = boxes.xyxy.cpu().numpy().astype(int)
+            confidences = boxes.conf.cpu().numpy()
+            class_ids = boxes.cls.cpu().numpy().astype(int)
+            batch.append([Detection(int(c), self.names[int(c)], float(p), tuple(int(v) for v in b))
+                          for b, p, c in zip(xyxy, confidences, class_ids)])
+        return batch
+
+
+class LocalDetector:
+    def __init__(self, model=DEFAULT_MODEL):
+        """In-process fallback with the same interface as InferenceClient"""
+        self.backend = YoloBackend(MODEL_WEIGHTS.get(model, model))
+        self.names = self.backend.names
+
+    def detect(self, frame, imgsz=640, conf=0.25):
+        return self.backend.predict([frame], imgsz=imgsz, conf=conf)[0]
+
+    def detect_batch(self, frames, imgsz=640, conf=0.25):
+        return self.backend.predict(frames, imgsz=imgsz, conf=conf)
+
+    def close(self):
+        pass
+
+
+class InferenceClient:
+    def __init__(self, socket_path=DEFAULT_SOCKET, model=DEFAULT_MODEL, timeout=10.0, fallback=None):
+        """
+        Client for the local inference daemon
+
+        Frames are written into a shared-memory segment owned by this
+        client; only their shapes, offsets and the segment name cross the
+        socket, one request per batch. A timed-out or broken request drops
+        the connection, so a late reply can never be read as the answer to
+        the next frame. A broken connection is retried once on a new one
+        (the daemon may have restarted); after that, or after a timeout,
+        requests go to fallback() for the rest of the session.
+
+        Args:
+            socket_path (str): Unix socket of the daemon
+            model (str): Model the daemon runs for this client
+            timeout (float): Seconds to wait for a reply
+            fallback (callable): Returns a detector to use once the daemon is
+                gone, e.g. lambda: LocalDetector(model); without it the error is raised
+        """
+        self.model = model
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.fallback = fallback
+        self.sock = self._connect()
+        self._segment = None
+        self._local = None
+        self._lock = threading.Lock()
+        self.names = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        # The daemon may still be reading the old frame, the next one gets a fresh segment
+        self._release_segment()
+
+    def _segment_for(self, nbytes):
+        if self._segment is None or self._segment.size < nbytes:
+            self._release_segment()
+            self._segment = shared_memory.SharedMemory(create=True, size=nbytes, name=segment_name())
+        return self._segment
+
+    def _release_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
+
+    def _request(self, frames, imgsz, conf):
+        if self.sock is None:
+            self.sock = self._connect()
+        layout, offset = [], 0
+        for frame in frames:
+            layout.append({'offset': offset, 'shape': list(frame.shape), 'dtype': frame.dtype.str})
+            offset += frame.nbytes
+        # One request in flight per connection: the segment is reused for every batch
+        segment = self._segment_for(offset)
+        for frame, entry in zip(frames, layout):
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=segment.buf, offset=entry['offset'])[:] = frame
+
+        try:
+            _send_message(self.sock, {
+                'op': 'detect', 'model': self.model, 'shm': segment.name,
+                'frames': layout, 'imgsz': imgsz, 'conf': conf,
+            })
+            reply = _recv_message(self.sock)
+        except OSError:
+            # Includes socket.timeout: the reply may still arrive, on a connection nobody reads
+            self._disconnect()
+            raise
+        if not reply.get('ok'):
+            raise RuntimeError(f"Inference failed: {reply.get('error')}")
+        return [[Detection(d['class_id'], d['name'], d['confidence'], tuple(d['box'])) for d in detections]
+                for detections in reply['batch']]
+
+    def detect(self, frame, imgsz=640, conf=0.25):
+        """Typed detections for one BGR frame"""
+        return self.detect_batch([frame], imgsz=imgsz, conf=conf)[0]
+
+    def detect_batch(self, frames, imgsz=640, conf=0.25):
+        """Typed detections for each of `frames`, sent to the daemon as one request"""
+        frames = [np.ascontiguousarray(frame) for frame in frames]
+        if not frames:
+            return []
+        with self._lock:
+            if self._local is None:
+                try:
+                    return self._request(frames, imgsz, conf)
+                except socket.timeout as e:
+                    # Stuck or overloaded, waiting once more would only double the stall
+                    error = e
+                except OSError:
+                    try:
+                        return self._request(frames, imgsz, conf)
+                    except OSError as e:
+                        error = e
+                if self.fallback is None:
+                    raise error
+                logging.warning(f"Inference daemon lost ({error}), loading the model locally")
+                self._local = self.fallback()
+                self.names = self._local.names
+            return self._local.detect_batch(frames, imgsz=imgsz, conf=conf)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+            if self._local is not None:
+                self._local.close()
+
+
+def open_detector(config_path='config.ini'):
+    """
+    Connect to the inference daemon if it is running, otherwise load the
+    model in this process. Settings come from [Inference] in config.ini.
+    """
+    config = ConfigParser()
+    config.read(config_path)
+    socket_path = config.get('Inference', 'socket', fallback=DEFAULT_SOCKET)
+    model = config.get('Inference', 'model', fallback=DEFAULT_MODEL)
+
+    if os.path.exists(socket_path):
+        try:
+            client = InferenceClient(socket_path, model, fallback=lambda: LocalDetector(model))
+            logging.info(f"Using shared inference daemon at {socket_path}")
+            return client
+        except OSError as e:
+            logging.warning(f"Inference daemon unavailable ({e}), loading model locally")
+    return LocalDetector(model)
+
+
+class _Request:
+    def __init__(self, frame, model, imgsz, conf):
+        self.frame = frame
+        self.model = model
+        self.imgsz = imgsz
+        self.conf = conf
+        self.done = threading.Event()
+        self.detections = None
+        self.error = None
+
+
+class InferenceServer:
+    def __init__(self, socket_path=DEFAULT_SOCKET, max_batch=8, batch_timeout=0.005,
+                 backend_factory=None):
+        """
+        Daemon holding each model once and batching requests from all clients
+
+        Args:
+            socket_path (str): Unix socket to listen on
+            max_batch (int): Largest batch sent to a model
+            batch_timeout (float): Seconds to wait for more requests to batch
+            backend_factory (callable): model name -> backend, for tests
+        """
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.batch_timeout = batch_timeout
+        self.backend_factory = backend_factory or (lambda name: YoloBackend(MODEL_WEIGHTS.get(name, name)))
+
+        self._backends = {}
+        self._requests = queue.Queue()
+        self._running = False
+        self._server = None
+        self.batches = 0
+        self.requests_served = 0
+
+    def _backend(self, name):
+        if name not in self._backends:
+            logging.info(f"Loading model {name}")
+            self._backends[name] = self.backend_factory(name)
+        return self._backends[name]
+
+    def infer(self, frame, model, imgsz, conf):
+        """Queue a frame for the batcher and wait for its detections"""
+        return self.infer_batch([frame], model, imgsz, conf)[0]
+
+    def infer_batch(self, frames, model, imgsz, conf):
+        """Queue frames together, so they share passes with each other, and wait for all of them"""
+        requests = [_Request(frame, model, imgsz, conf) for frame in frames]
+        for request in requests:
+            self._requests.put(request)
+        for request in requests:
+            request.done.wait()
+        for request in requests:
+            if request.error is not None:
+                raise request.error
+        return [request.detections for request in requests]
+
+    def _batch_loop(self):
+        while self._running:
+            try:
+                first = self._requests.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.batch_timeout
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Requests for different models or input sizes cannot share a pass
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.model, request.imgsz), []).append(request)
+            for (model, imgsz), requests in groups.items():
+                try:
+                    conf = min(r.conf for r in requests)
+                    outputs = self._backend(model).predict([r.frame for r in requests],
+                                                           imgsz=imgsz, conf=conf)
+                    for request, detections in zip(requests, outputs):
+                        request.detections = [d for d in detections if d.confidence >= request.conf]
+                except Exception as e:
+                    for request in requests:
+                        request.error = e
+                self.batches += 1
+                self.requests_served += len(requests)
+                for request in requests:
+                    request.done.set()
+
+    def serve_forever(self):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                segments = {}
+                try:
+                    while True:
+                        try:
+                            message = _recv_message(self.request)
+                        except ConnectionError:
+                            return
+                        try:
+                            name = message['shm']
+                            if name not in segments:
+                                segments[name] = _attach_shared_memory(name)
+                            frames = [np.ndarray(tuple(entry['shape']), dtype=np.dtype(entry['dtype']),
+                                                 buffer=segments[name].buf, offset=entry['offset'])
+                                      for entry in message['frames']]
+                            batch = server.infer_batch(frames, message.get('model', DEFAULT_MODEL),
+                                                       message.get('imgsz', 640), message.get('conf', 0.25))
+                            del frames
+                            reply = {'ok': True, 'batch': [[d._asdict() for d in detections]
+                                                           for detections in batch]}
+                        except Exception as e:
+                            reply = {'ok': False, 'error': str(e)}
+                        try:
+                            _send_message(self.request, reply)
+                        except ConnectionError:
+                            # The client timed out and dropped this connection
+                            return
+                finally:
+                    for segment in segments.values():
+                        segment.close()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._running = True
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        logging.info(f"Inference daemon listening on {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        self._running = False
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared local inference daemon")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--model', action='append', help="Models to preload (default: yolov8n)")
+    parser.add_argument('--max-batch', type=int, default=8)
+    parser.add_argument('--batch-timeout-ms', type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+    server = InferenceServer(args.socket, args.max_batch, args.batch_timeout_ms / 1000.0)
+    for model in args.model or [DEFAULT_MODEL]:
+        server._backend(model)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
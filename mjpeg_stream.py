@@ -0,0 +1,289 @@
+import time
+import logging
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+# cv2.imdecode flags for decoding straight to a reduced size and/or grayscale
+_DECODE_FLAGS = {
+    (1, False): cv2.IMREAD_COLOR,
+    (2, False): cv2.IMREAD_REDUCED_COLOR_2,
+    (4, False): cv2.IMREAD_REDUCED_COLOR_4,
+    (8, False): cv2.IMREAD_REDUCED_COLOR_8,
+    (1, True): cv2.IMREAD_GRAYSCALE,
+    (2, True): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (4, True): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (8, True): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+class MJPEGStream:
+    def __init__(self, url, timeout=5.0, reconnect_delay=0.5, max_reconnect_delay=5.0, read_timeout=10.0):
+        """
+        Persistent reader for multipart MJPEG streams such as IP Webcam's /video
+
+        A background thread keeps the HTTP connection open, reconnecting
+        with backoff, and keeps only the newest JPEG. Nothing is decoded
+        until a consumer calls read() or retrieve(), which can decode at 1/2,
+        1/4 or 1/8 scale or straight to grayscale. read(), grab(), retrieve(),
+        isOpened(), get() and release() mirror cv2.VideoCapture so it can
+        stand in for one.
+
+        Args:
+            url (str): Stream URL, e.g. http://192.168.1.5:8080/video
+            timeout (float): Socket timeout while connecting and reading
+            reconnect_delay (float): First delay before reconnecting, doubled per failure
+            max_reconnect_delay (float): Upper bound for the reconnect delay
+            read_timeout (float): How long read() waits for a new frame
+        """
+        self.url = url
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.read_timeout = read_timeout
+
+        self.connected = False
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self.reconnects = 0
+
+        self._jpeg = None
+        self._sequence = 0
+        self._received_at = 0.0
+        self._decoded = {}
+        self._last_read = 0
+        self._shape = None
+        self._running = True
+        self._condition = threading.Condition()
+        self._connection = None
+        self._boundary_consumed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def probe(cls, url, timeout=3.0):
+        """True if `url` serves at least one JPEG within `timeout` seconds"""
+        stream = cls(url, timeout=timeout)
+        try:
+            return stream.wait_for_frame(timeout=timeout) is not None
+        finally:
+            stream.release()
+
+    # ---- Network side ----
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while self._running:
+            received_before = self.frames_received
+            try:
+                self._stream()
+            except Exception as e:
+                if not self._running:
+                    break
+                logging.warning(f"MJPEG stream {self.url} lost ({e}), reconnecting in {delay:.1f} s")
+            finally:
+                self.connected = False
+                self._close_connection()
+            if not self._running:
+                break
+            with self._condition:
+                self._condition.wait_for(lambda: not self._running, timeout=delay)
+            # Back off while the phone is unreachable, reset once frames flow again
+            if self.frames_received > received_before:
+                delay = self.reconnect_delay
+            else:
+                delay = min(delay * 2, self.max_reconnect_delay)
+            self.reconnects += 1
+
+    def _close_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.close()
+
+    def _stream(self):
+        parts = urlsplit(self.url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._connection = connection_class(parts.hostname, parts.port, timeout=self.timeout)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        self._connection.request('GET', path, headers={'User-Agent': 'ikshana-mjpeg'})
+        response = self._connection.getresponse()
+        if response.status != 200:
+            raise ConnectionError(f"HTTP {response.status}")
+
+        content_type = response.getheader('Content-Type', '')
+        boundary = None
+        for param in content_type.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'boundary':
+                boundary = value.strip('"')
+                if not boundary.startswith('--'):
+                    boundary = '--' + boundary
+        boundary = boundary.encode() if boundary else None
+
+        self._boundary_consumed = False
+        self.connected = True
+        logging.info(f"Connected to MJPEG stream {self.url}")
+        while self._running:
+            self._publish(self._read_part(response, boundary))
+
+    def _is_boundary(self, line, boundary):
+        line = line.strip()
+        if boundary is None:
+            return line.startswith(b'--')
+        return line == boundary or line == boundary + b'--'
+
+    def _read_part(self, response, boundary):
+        """Return the JPEG bytes of the next multipart part"""
+        while not self._boundary_consumed:
+            line = response.readline()
+            if not line:
+                raise ConnectionError("stream ended")
+            if self._is_boundary(line, boundary):
+                break
+        self._boundary_consumed = False
+
+        headers = {}
+        while True:
+            line = response.readline()
+            if not line:
+                raise ConnectionError("stream ended")
+            if not line.strip():
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        length = headers.get('content-length')
+        if length:
+            data = response.read(int(length))
+            if len(data) < int(length):
+                raise ConnectionError("stream ended inside a frame")
+            return data
+
+        # No Content-Length: collect lines up to the next boundary, which
+        # then starts the following part
+        chunks = []
+        while True:
+            line = response.readline()
+            if not line:
+                raise ConnectionError("stream ended inside a frame")
+            if self._is_boundary(line, boundary):
+                self._boundary_consumed = True
+                break
+            chunks.append(line)
+        return b''.join(chunks).rstrip(b'\r\n')
+
+    def _publish(self, jpeg):
+        with self._condition:
+            self._jpeg = jpeg
+            self._sequence += 1
+            self._received_at = time.monotonic()
+            self._decoded = {}
+            self.frames_received += 1
+            self._condition.notify_all()
+
+    # ---- Consumer side ----
+
+    @property
+    def sequence(self):
+        """Number of the newest JPEG received so far"""
+        return self._sequence
+
+    @property
+    def age(self):
+        """Seconds since the newest JPEG arrived"""
+        return time.monotonic() - self._received_at if self._jpeg is not None else None
+
+    def latest_jpeg(self):
+        """(sequence, bytes) of the newest JPEG without decoding it"""
+        with self._condition:
+            return self._sequence, self._jpeg
+
+    def wait_for_frame(self, after=0, timeout=None):
+        """Block until a JPEG newer than sequence `after` exists; returns its sequence or None"""
+        with self._condition:
+            if self._condition.wait_for(lambda: self._sequence > after or not self._running,
+                                        timeout=timeout) and self._sequence > after:
+                return self._sequence
+        return None
+
+    def decode(self, scale=1, gray=False):
+        """Decode the newest JPEG; repeated calls for the same frame are cached"""
+        if (scale, gray) not in _DECODE_FLAGS:
+            raise ValueError(f"scale must be 1, 2, 4 or 8, got {scale}")
+        with self._condition:
+            sequence, jpeg = self._sequence, self._jpeg
+            cached = self._decoded.get((scale, gray))
+        if jpeg is None:
+            return None
+        if cached is not None:
+            return cached
+
+        image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), _DECODE_FLAGS[(scale, gray)])
+        if image is None:
+            return None
+        self.frames_decoded += 1
+        with self._condition:
+            if self._sequence == sequence:
+                self._decoded[(scale, gray)] = image
+        if scale == 1 and self._shape is None:
+            self._shape = image.shape[:2]
+        return image
+
+    def grab(self):
+        """
+        Like cv2.VideoCapture.grab(): waits for a frame newer than the last
+        one grabbed, without decoding it. False after read_timeout.
+        """
+        sequence = self.wait_for_frame(after=self._last_read, timeout=self.read_timeout)
+        if sequence is None:
+            return False
+        self._last_read = sequence
+        return True
+
+    def retrieve(self, scale=1, gray=False):
+        """Like cv2.VideoCapture.retrieve(): decodes the newest frame"""
+        image = self.decode(scale, gray)
+        return image is not None, image
+
+    def read(self, scale=1, gray=False):
+        """
+        Like cv2.VideoCapture.read(): grab() then retrieve().
+        Returns (False, None) after read_timeout.
+        """
+        if not self.grab():
+            return False, None
+        return self.retrieve(scale, gray)
+
+    def isOpened(self):
+        return self._running and (self.connected or self._jpeg is not None or
+                                  self.wait_for_frame(timeout=self.timeout) is not None)
+
+    def get(self, prop):
+        """Frame width and height, taken from the first decoded frame"""
+        if prop not in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            return 0.0
+        if self._shape is None:
+            if self.wait_for_frame(timeout=self.timeout) is None or self.decode() is None:
+                return 0.0
+        height, width = self._shape
+        return float(width if prop == cv2.CAP_PROP_FRAME_WIDTH else height)
+
+    def release(self):
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        # Closing the socket unblocks the reader thread
+        self._close_connection()
+        self._thread.join(timeout=self.timeout)
+
+
+def open_capture(source):
+    """MJPEGStream for http(s) URLs, cv2.VideoCapture for anything else"""
+    if isinstance(source, str) and source.startswith(('http://', 'https://')):
+        return MJPEGStream(source)
+    return cv2.VideoCapture(source)
@@ -0,0 +1,371 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from collections import namedtuple
+from configparser import ConfigParser
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Event, Lock, Process, Value, shared_memory
+
+import cv2
+import numpy as np
+
+from mjpeg_stream import open_capture
+from inference_server import segment_name
+
+CameraSpec = namedtuple('CameraSpec', ['name', 'source', 'role', 'width', 'height'])
+
+# A result of the per-frame work for one source, tagged with where it came from
+SourceResult = namedtuple('SourceResult', ['source', 'role', 'sequence', 'timestamp', 'value', 'latency'])
+
+# Inference share per role relative to 1.0; obstacle cameras are served first when both wait
+ROLE_WEIGHTS = {'obstacles': 2.0, 'reading': 1.0}
+
+
+def parse_source(text):
+    """Device numbers as int, anything else (URL, file) as given"""
+    text = text.strip()
+    return int(text) if text.isdigit() else text
+
+
+def parse_camera(name, value, width=640, height=480):
+    """'0, obstacles' or 'http://phone:8080/video, reading, 1280x720' to a CameraSpec"""
+    parts = [p.strip() for p in value.split(',')]
+    role = parts[1] if len(parts) > 1 and parts[1] else 'obstacles'
+    if len(parts) > 2 and parts[2]:
+        width, height = (int(v) for v in parts[2].lower().split('x'))
+    return CameraSpec(name, parse_source(parts[0]), role, width, height)
+
+
+class CameraSlot:
+    def __init__(self, spec):
+        """
+        Double-buffered shared-memory slot holding the newest frame of one camera
+
+        The capture worker writes into the back buffer and flips under the
+        lock; readers copy the front buffer under the same lock, so a frame
+        is never torn and the writer never waits for a slow consumer.
+        Frames of another size are resized to the spec's size.
+
+        Args:
+            spec (CameraSpec): Camera whose frames the slot holds
+        """
+        self.spec = spec
+        self.shape = (spec.height, spec.width, 3)
+        self.owner = True
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)) * 2, name=segment_name())
+        self.lock = Lock()
+        self.front = Value('i', 0, lock=False)
+        self.sequence = Value('q', 0, lock=False)
+        self.timestamp = Value('d', 0.0, lock=False)
+        self._map_buffers()
+
+    def _map_buffers(self):
+        size = int(np.prod(self.shape))
+        self._buffers = [np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=i * size)
+                         for i in range(2)]
+
+    def __getstate__(self):
+        # Sent to a spawned worker: the segment is re-attached by name there
+        state = self.__dict__.copy()
+        del state['_buffers']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.owner = False
+        self._map_buffers()
+
+    def write(self, frame):
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.spec.width, self.spec.height), interpolation=cv2.INTER_AREA)
+        back = 1 - self.front.value
+        self._buffers[back][:] = frame
+        with self.lock:
+            self.front.value = back
+            self.sequence.value += 1
+            self.timestamp.value = time.time()
+
+    def read(self, after=0):
+        """(sequence, timestamp, frame copy), or None until a frame newer than `after` arrives"""
+        with self.lock:
+            sequence = self.sequence.value
+            if sequence <= after:
+                return None
+            return sequence, self.timestamp.value, self._buffers[self.front.value].copy()
+
+    def close(self):
+        self._buffers = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _capture_worker(slot, running, retry_delay=2.0):
+    """Body of one camera's capture process: keep the slot filled with the newest frame"""
+    spec = slot.spec
+    capture = None
+    try:
+        while running.is_set():
+            if capture is None or not capture.isOpened():
+                capture = open_capture(spec.source)
+                if not capture.isOpened():
+                    logging.warning(f"Camera {spec.name} ({spec.source}) unavailable, retrying")
+                    capture.release()
+                    capture = None
+                    running.wait(retry_delay)
+                    continue
+                if isinstance(spec.source, int):
+                    capture.set(cv2.CAP_PROP_FRAME_WIDTH, spec.width)
+                    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, spec.height)
+            ret, frame = capture.read()
+            if not ret:
+                if isinstance(spec.source, str) and os.path.isfile(spec.source):
+                    # Recorded video: loop it, handy for testing several sources
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                capture.release()
+                capture = None
+                continue
+            slot.write(frame)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if capture is not None:
+            capture.release()
+
+
+class MultiCamera:
+    def __init__(self, specs):
+        """
+        One capture process and shared-memory slot per camera
+
+        Decoding happens in the workers, so capture scales with cores
+        instead of every camera sharing one interpreter.
+
+        Args:
+            specs (list): CameraSpec per camera
+        """
+        self.specs = list(specs)
+        self.slots = {}
+        self.workers = {}
+        self._running = Event()
+
+    @classmethod
+    def from_config(cls, path='config.ini'):
+        """Cameras listed in the [Cameras] section of config.ini, name = source, role[, WxH]"""
+        config = ConfigParser()
+        config.read(path)
+        if not config.has_section('Cameras'):
+            return cls([])
+        return cls([parse_camera(name, value) for name, value in config.items('Cameras')])
+
+    def __len__(self):
+        return len(self.specs)
+
+    def start(self):
+        self._running.set()
+        try:
+            for spec in self.specs:
+                slot = CameraSlot(spec)
+                self.slots[spec.name] = slot
+                worker = Process(target=_capture_worker, args=(slot, self._running),
+                                 name=f"capture-{spec.name}", daemon=True)
+                worker.start()
+                self.workers[spec.name] = worker
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def latest(self, name, after=0):
+        """Newest (sequence, timestamp, frame) of camera `name`, see CameraSlot.read"""
+        return self.slots[name].read(after)
+
+    def close(self):
+        self._running.clear()
+        for worker in self.workers.values():
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        for slot in self.slots.values():
+            slot.close()
+        self.workers = {}
+        self.slots = {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class FairScheduler:
+    def __init__(self, cameras, process, max_workers=None, weights=ROLE_WEIGHTS, on_result=None,
+                 poll_interval=0.005, profiler=None):
+        """
+        Shares inference workers fairly between cameras
+
+        Each camera has at most one frame in flight, so a fast source cannot
+        starve a slow one. Free workers go to the camera with a new frame and
+        the least weighted service so far; a camera that produced nothing
+        new is skipped rather than reprocessed.
+
+        Args:
+            cameras (MultiCamera): Started cameras
+            process (callable): process(frame, spec) -> value, e.g. detection
+                for 'obstacles' cameras and OCR for 'reading' ones
+            max_workers (int): Parallel jobs, default one per core
+            weights (dict): Service share per role, 1.0 when missing
+            on_result (callable): Called with each SourceResult from a worker thread
+            poll_interval (float): Sleep when no camera has a new frame
+            profiler (Profiler): Optional, records 'inference_<camera>' per job
+        """
+        self.cameras = cameras
+        self.process = process
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.weights = weights
+        self.on_result = on_result
+        self.poll_interval = poll_interval
+        self.profiler = profiler
+
+        self.processed = {spec.name: 0 for spec in cameras.specs}
+        self.errors = 0
+        self._service = {spec.name: 0.0 for spec in cameras.specs}
+        self._last_sequence = {spec.name: 0 for spec in cameras.specs}
+        self._in_flight = set()
+        self._slots = threading.Semaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self._running = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _pick(self):
+        """Camera with a new frame and the least weighted service, or None"""
+        with self._lock:
+            idle = [spec for spec in self.cameras.specs if spec.name not in self._in_flight]
+        for spec in sorted(idle, key=lambda s: self._service[s.name]):
+            item = self.cameras.latest(spec.name, self._last_sequence[spec.name])
+            if item is not None:
+                return spec, item
+        return None
+
+    def _run(self):
+        while self._running:
+            self._slots.acquire()
+            picked = self._pick() if self._running else None
+            if picked is None:
+                self._slots.release()
+                time.sleep(self.poll_interval)
+                continue
+            spec, (sequence, timestamp, frame) = picked
+            self._last_sequence[spec.name] = sequence
+            with self._lock:
+                self._in_flight.add(spec.name)
+            self._executor.submit(self._job, spec, sequence, timestamp, frame)
+
+    def _job(self, spec, sequence, timestamp, frame):
+        started = time.perf_counter()
+        try:
+            value = self.process(frame, spec)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Processing a frame from {spec.name} failed: {e}")
+            value = None
+        seconds = time.perf_counter() - started
+        if self.profiler is not None:
+            self.profiler.record(f'inference_{spec.name}', seconds)
+        with self._lock:
+            self._in_flight.discard(spec.name)
+            self._service[spec.name] += seconds / self.weights.get(spec.role, 1.0)
+            self.processed[spec.name] += 1
+        self._slots.release()
+        if self.on_result is not None and value is not None:
+            try:
+                self.on_result(SourceResult(spec.name, spec.role, sequence, timestamp, value,
+                                            time.time() - timestamp))
+            except Exception as e:
+                logging.error(f"Result handler failed for {spec.name}: {e}")
+
+    def close(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._executor.shutdown(wait=True)
+
+
+def default_process(detector, imgsz=320):
+    """Detection for 'obstacles' cameras, OCR for 'reading' cameras"""
+    def process(frame, spec):
+        if spec.role == 'reading':
+            from ocr_layout import read_layout
+            return '\n'.join(read_layout(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)).ranked_texts()) or None
+        return detector.detect(frame, imgsz=imgsz)
+    return process
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture and process several cameras concurrently")
+    parser.add_argument('--camera', action='append', default=[], metavar='NAME=SOURCE[,ROLE[,WxH]]',
+                        help="Camera to use, repeatable; default is [Cameras] in config.ini")
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--workers', type=int, default=None, help="Parallel jobs, default one per core")
+    parser.add_argument('--capture-only', action='store_true', help="Measure capture rates without inference")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+    if args.camera:
+        cameras = MultiCamera([parse_camera(*item.split('=', 1)) for item in args.camera])
+    else:
+        cameras = MultiCamera.from_config()
+    if not len(cameras):
+        print("No cameras configured, use --camera or [Cameras] in config.ini")
+        return 1
+
+    detector = None
+    if args.capture_only:
+        process = lambda frame, spec: frame.shape
+    else:
+        from inference_server import open_detector
+        detector = open_detector()
+        process = default_process(detector)
+
+    def report(result):
+        if result.role == 'reading':
+            print(f"[{result.source}] text: {result.value}")
+        elif not args.capture_only:
+            names = ', '.join(d.name for d in result.value) or 'nothing'
+            print(f"[{result.source}] #{result.sequence} {names} ({result.latency * 1000:.0f} ms)")
+
+    started = time.perf_counter()
+    with cameras:
+        scheduler = FairScheduler(cameras, process, max_workers=args.workers, on_result=report).start()
+        try:
+            time.sleep(args.seconds)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.close()
+            captured = {name: slot.sequence.value for name, slot in cameras.slots.items()}
+            if detector is not None:
+                detector.close()
+
+    elapsed = time.perf_counter() - started
+    for spec in cameras.specs:
+        print(f"{spec.name} ({spec.role}): captured {captured[spec.name] / elapsed:.1f} fps, "
+              f"processed {scheduler.processed[spec.name] / elapsed:.1f} fps")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
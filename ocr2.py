@@ -1,13 +1,16 @@
 import cv2
 import numpy as np
-import pytesseract
-import pyttsx3
 from deskew import determine_skew
 
 import time
-import requests
 from multiprocessing import Process, shared_memory, Value
 from configparser import ConfigParser
+from mjpeg_stream import MJPEGStream, open_capture
+from reading_session import ReadingSession
+from ocr_layout import read_layout
+from streaming_tts import pyttsx3_speaker
+from idle_mode import MotionGate
+from inference_server import segment_name
 
 # Converts RGB image to grayscale
 def grayscale(img):
@@ -50,15 +53,16 @@ def preprocessing(img):
     return img
 
 class CameraClass():
-    def __init__(self, camera_id, seconds_between_ocr=3, display_regular_video=False, display_processed_video=True, perform_tts=True):
+    def __init__(self, camera_id, seconds_between_ocr=3, display_regular_video=False, display_processed_video=True, perform_tts=True, min_word_confidence=60):
         self.camera_id = camera_id
         self.seconds_between_ocr = seconds_between_ocr
+        self.min_word_confidence = min_word_confidence
         self.display_regular_video = display_regular_video
         self.display_processed_video = display_processed_video
         self.perform_tts = perform_tts
 
         # Temporary camera object to get height and width of the video
-        temp_camera = cv2.VideoCapture(camera_id)
+        temp_camera = open_capture(camera_id)
         if temp_camera.isOpened():
             self.height = int(temp_camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
             self.width = int(temp_camera.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -71,34 +75,58 @@ class CameraClass():
         # 1: All processes will continue running
         # 0: All processes will stop running
         self.run = Value('i', 1)
+        # 1 while the scene is static: the reader samples slowly, display and OCR pause
+        self.idle = Value('i', 0)
+        # 1 once the display process has taken the shared frame and wants the next one
+        self.frame_wanted = Value('i', 1)
 
         # Allocating shared memory where latest frame will be stored
-        self.shm_frame = shared_memory.SharedMemory(create=True, size=self.height*self.width*3)
+        self.shm_frame = shared_memory.SharedMemory(create=True, size=self.height*self.width*3, name=segment_name())
         # Allocating shared memory where latest processed frame will be stored
-        self.shm_processed = shared_memory.SharedMemory(create=True, size=self.height*self.width)
+        self.shm_processed = shared_memory.SharedMemory(create=True, size=self.height*self.width, name=segment_name())
 
     # Process to continuously read frames from the camera stream
-    def read(self):
+    def read(self, retry_delay=0.5):
         frame = np.ndarray((self.height, self.width, 3), dtype=np.uint8, buffer=self.shm_frame.buf)
-        camera = cv2.VideoCapture(self.camera_id)
+        # IP Webcam URLs get a persistent MJPEG reader that decodes only on retrieve()
+        camera = open_capture(self.camera_id)
         create_process = True
+        gate = MotionGate.from_config()
 
         while bool(self.run.value):
-            if camera.isOpened():
-                ret, frame_read = camera.read()
-                if not ret:
-                    self.run.value = 0
-                    break
-                
-                frame[:] = frame_read[:]
-                if create_process:
-                    Process(target=self.display).start()
-                    create_process = False
-            else:
-                print("Error opening camera. Exiting program.")
-                self.run.value = 0
+            if not camera.isOpened():
+                print("Camera unavailable, retrying...")
+                camera.release()
+                time.sleep(retry_delay)
+                camera = open_capture(self.camera_id)
+                continue
+
+            # grab() keeps up with the camera; frames are only decoded when the
+            # display wants one, or for the motion check while idle
+            if not camera.grab():
+                # The MJPEG reader reconnects by itself; wait for it instead of quitting
+                time.sleep(retry_delay)
+                continue
+            if not (create_process or self.frame_wanted.value or gate.idle):
+                continue
+            ret, frame_read = camera.retrieve()
+            if not ret:
+                continue
+
+            active = gate.check(frame_read)
+            self.idle.value = 0 if active else 1
+            if not active and not create_process:
+                gate.pause()
+                continue
+
+            frame[:] = frame_read[:]
+            self.frame_wanted.value = 0
+            if create_process:
+                Process(target=self.display).start()
+                create_process = False
 
         camera.release()
+        print(gate.summary())
 
     # Process to preprocess latest frame from the camera stream, and display that processed frame
     def display(self):
@@ -106,8 +134,29 @@ class CameraClass():
         processed = np.ndarray((self.height, self.width), dtype=np.uint8, buffer=self.shm_processed.buf)
         create_process = True
 
+        # Headless runs never open a window, so they also skip cv2.waitKey
+        show_windows = self.display_regular_video or self.display_processed_video
+
         while bool(self.run.value):
+            if self.idle.value:
+                # Nothing new to preprocess; keep the windows responsive
+                if show_windows and cv2.waitKey(100) == ord('q'):
+                    cv2.destroyAllWindows()
+                    self.run.value = 0
+                elif not show_windows:
+                    time.sleep(0.1)
+                continue
+            if self.frame_wanted.value:
+                # No new frame since the last one was processed
+                if show_windows and cv2.waitKey(5) == ord('q'):
+                    cv2.destroyAllWindows()
+                    self.run.value = 0
+                elif not show_windows:
+                    time.sleep(0.005)
+                continue
             processed[:] = preprocessing(frame)
+            # The reader only overwrites the shared frame after this
+            self.frame_wanted.value = 1
             if create_process:
                 Process(target=self.ocr).start()
                 create_process = False
@@ -118,39 +167,49 @@ class CameraClass():
             if self.display_processed_video:
                 cv2.imshow('Processed', processed)
             
-            if cv2.waitKey(1) == ord('q'):
+            if show_windows and cv2.waitKey(1) == ord('q'):
                 cv2.destroyAllWindows()
                 self.run.value = 0
 
-    # Process to perform OCR every N seconds on latest processed frame
+    # Process to perform OCR every N seconds on latest processed frame, speaking only lines not read yet
     def ocr(self):
         processed = np.ndarray((self.height, self.width), dtype=np.uint8, buffer=self.shm_processed.buf)
+        session = ReadingSession()
+        # Speaks sentence by sentence while the rest is still being synthesized
+        speaker = pyttsx3_speaker() if self.perform_tts else None
 
         while bool(self.run.value):
             time.sleep(self.seconds_between_ocr)
-            text = pytesseract.image_to_string(processed, lang='eng').strip()
-            if text:
-                print(text)
-                if self.perform_tts:
-                    proc = Process(target=self.tts, args=(text,))
-                    proc.start()
-                    while proc.is_alive():
-                        if not bool(self.run.value):
-                            proc.terminate()
-                            proc.join()
-
-    # Process to perform Text to Speech on given text
-    def tts(self, text):
-        engine = pyttsx3.init()
-        engine.say(text)
-        engine.runAndWait()
+            if self.idle.value:
+                continue
+            # Copy first, the display process keeps overwriting the shared frame
+            layout = read_layout(processed.copy(), min_confidence=self.min_word_confidence)
+            # Stitch in scan order, but speak the largest, most central new lines first
+            new_lines = layout.ranked_texts(session.merge(layout.texts()))
+            if new_lines:
+                print('\n'.join(new_lines))
+                # Keep reading while speaking; passages queue up in order
+                if speaker is not None:
+                    speaker.speak('. '.join(new_lines))
+
+        if speaker is not None:
+            speaker.close()
 
     def start(self):
         proc = Process(target=self.read)
         proc.start()
-        proc.join()
-        self.shm_frame.unlink()
-        self.shm_processed.unlink()
+        try:
+            proc.join()
+        finally:
+            # Ctrl+C or a crash here must not leave the segments in /dev/shm
+            self.run.value = 0
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+            for shm in (self.shm_frame, self.shm_processed):
+                shm.close()
+                shm.unlink()
                 
 if __name__ == '__main__':
     config = ConfigParser()
@@ -160,20 +219,16 @@ if __name__ == '__main__':
     url = f'http://{ip_port}/video'
 
     webcam_id = int(config['Settings']['webcam_id'])
+    headless = config.getboolean('Display', 'headless', fallback=False)
 
-    try:
-        print("Trying to connect to IP Webcam server...")
-        response = requests.head(url, timeout=3)
-        if response.status_code == 200:
-            print("Connection established.")
-            id = url
-        else:
-            print('Error connecting to server. Make sure the server is online, and the server address is correct. Defaulting to web cam.')
-            id = webcam_id
-    except:
+    print("Trying to connect to IP Webcam server...")
+    if MJPEGStream.probe(url, timeout=3):
+        print("Connection established.")
+        id = url
+    else:
         print('Error connecting to server. Make sure the server is online, and the server address is correct. Defaulting to web cam.')
         id = webcam_id
 
     # camera = CameraClass(camera_id=id, seconds_between_ocr=3, display_regular_video=True, display_processed_video=True, perform_tts=True)
-    camera = CameraClass(camera_id=id)
+    camera = CameraClass(camera_id=id, display_processed_video=not headless)
     camera.start()
\ No newline at end of file
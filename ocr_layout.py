@@ -0,0 +1,110 @@
+import math
+from collections import namedtuple
+
+import pytesseract
+
+# Ranking weights: how large the text is (large usually means near), how
+# close it is to where the wearer is looking, and how sure Tesseract is
+RANK_WEIGHTS = {'size': 0.45, 'centrality': 0.35, 'confidence': 0.2}
+
+Word = namedtuple('Word', ['text', 'confidence', 'box'])
+
+
+class Line:
+    __slots__ = ('words', 'key', 'box', 'text', 'confidence', 'height', 'score')
+
+    def __init__(self, words, key):
+        """
+        One Tesseract text line; boxes are (x1, y1, x2, y2) in image pixels
+
+        Args:
+            words (list): Word tuples in reading order
+            key (tuple): (block, paragraph, line) numbers, the scan order
+        """
+        self.words = words
+        self.key = key
+        self.box = (min(w.box[0] for w in words), min(w.box[1] for w in words),
+                    max(w.box[2] for w in words), max(w.box[3] for w in words))
+        self.text = ' '.join(w.text for w in words)
+        self.confidence = sum(w.confidence for w in words) / len(words)
+        # Median word height: one tall capital does not make a line large
+        heights = sorted(w.box[3] - w.box[1] for w in words)
+        self.height = heights[len(heights) // 2]
+        self.score = 0.0
+
+    def __repr__(self):
+        return f"Line({self.text!r}, score={self.score:.2f})"
+
+
+class Layout:
+    def __init__(self, lines, shape):
+        """
+        OCR result with positions: `lines` in scan order, `shape` of the image
+
+        rank() orders the lines by relevance so the sign in front of the
+        wearer is spoken before the small print around it.
+        """
+        self.lines = lines
+        self.shape = shape
+
+    @property
+    def text(self):
+        return '\n'.join(line.text for line in self.lines)
+
+    def texts(self):
+        """Line texts in scan order"""
+        return [line.text for line in self.lines]
+
+    def rank(self, weights=RANK_WEIGHTS, gaze=(0.5, 0.5)):
+        """Lines sorted by size, centrality and confidence, best first"""
+        if not self.lines:
+            return []
+        height, width = self.shape[:2]
+        tallest = max(line.height for line in self.lines) or 1
+        gx, gy = gaze[0] * width, gaze[1] * height
+        farthest = math.hypot(max(gx, width - gx), max(gy, height - gy)) or 1.0
+        for line in self.lines:
+            cx, cy = (line.box[0] + line.box[2]) / 2, (line.box[1] + line.box[3]) / 2
+            line.score = (weights['size'] * line.height / tallest +
+                          weights['centrality'] * (1.0 - math.hypot(cx - gx, cy - gy) / farthest) +
+                          weights['confidence'] * line.confidence / 100.0)
+        return sorted(self.lines, key=lambda line: line.score, reverse=True)
+
+    def ranked_texts(self, texts=None, **kwargs):
+        """
+        Line texts best first. `texts` replaces them with one entry per line
+        in scan order, e.g. ReadingSession.merge(self.texts()), where a line
+        may have gained just a few words; None entries are left out.
+        """
+        ranked = self.rank(**kwargs)
+        if texts is None:
+            return [line.text for line in ranked]
+        position = {id(line): i for i, line in enumerate(self.lines)}
+        return [texts[position[id(line)]] for line in ranked if texts[position[id(line)]]]
+
+    def __len__(self):
+        return len(self.lines)
+
+
+def read_layout(image, min_confidence=60, lang='eng', config=''):
+    """
+    Words and lines with boxes and confidences from one Tesseract pass
+
+    Words below `min_confidence` (0-100) are dropped here, before they can
+    reach speech; lines left without words disappear with them.
+    """
+    data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+    words = {}
+    for i, text in enumerate(data['text']):
+        text = text.strip()
+        if not text:
+            continue
+        confidence = float(data['conf'][i])
+        if confidence < min_confidence:
+            continue
+        x, y = data['left'][i], data['top'][i]
+        box = (x, y, x + data['width'][i], y + data['height'][i])
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        words.setdefault(key, []).append(Word(text, confidence, box))
+    shape = getattr(image, 'shape', None) or (image.size[1], image.size[0])
+    return Layout([Line(line_words, key) for key, line_words in sorted(words.items())], shape)
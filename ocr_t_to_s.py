@@ -2,17 +2,24 @@ import sys
 import cv2
 import time
 import numpy as np
-from ultralytics import YOLO
 import pyttsx3
 import csv
 from datetime import datetime
 from PyQt5 import QtCore, QtWidgets, QtGui
-from PIL import Image
 import pytesseract
 from gtts import gTTS
 import os
 from concurrent.futures import ThreadPoolExecutor
+import threading
 import logging
+from profiler import Profiler
+from qt_video import FrameView
+from governor import QualityGovernor
+from inference_server import open_detector
+from tiled_detection import tiled_detector
+from multi_camera import MultiCamera, FairScheduler
+from ocr_layout import read_layout
+from scene_summary import SceneSummarizer
 
 # Configure Logging
 logging.basicConfig(
@@ -20,9 +27,9 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s: %(message)s'
 )
 
-# Initialize YOLO model
+# Initialize YOLO detector, shared through the inference daemon when it is running
 try:
-    model = YOLO("yolov8n.pt")
+    base_detector = open_detector()
 except Exception as e:
     logging.error(f"YOLO Model Loading Error: {e}")
     sys.exit(1)
@@ -56,6 +63,12 @@ class SpeechEngine:
 # Global Speech Engine
 speech_engine = SpeechEngine()
 
+# Per-stage timings, see [Profiling] in config.ini
+profiler = Profiler.from_config()
+
+# Adapts YOLO input size, detection rate and OCR cadence, see [Governor] in config.ini
+governor = QualityGovernor.from_config(profiler=profiler)
+
 # Pytesseract Configuration
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 tessdata_dir_config = r'--tessdata-dir "C:\Program Files\Tesseract-OCR\tessdata"'
@@ -63,7 +76,7 @@ tessdata_dir_config = r'--tessdata-dir "C:\Program Files\Tesseract-OCR\tessdata"
 # Detection Parameters
 DETECTION_CONFIG = {
     'threshold': 0.5,
-    'announcement_interval': 5
+    'announcement_interval': 5  # Minimum seconds between two scene announcements
 }
 
 class EnhancedRecordVideo(QtCore.QObject):
@@ -71,10 +84,20 @@ class EnhancedRecordVideo(QtCore.QObject):
 
     def __init__(self, camera_port=0):
         super().__init__()
-        self.camera = self._initialize_camera(camera_port)
+        # Cameras listed in [Cameras] of config.ini run concurrently, otherwise one webcam
+        self.cameras = MultiCamera.from_config()
+        self.scheduler = None
+        self.shown_sequence = 0
+        self.camera = None if len(self.cameras) else self._initialize_camera(camera_port)
         self.timer = QtCore.QBasicTimer()
         self.executor = ThreadPoolExecutor(max_workers=2)
-        self.last_announcement_time = 0
+        # One frame per worker at most; at 30 FPS an unbounded queue grows without limit
+        self.slots = threading.BoundedSemaphore(2)
+        # One scene and one detector wrapper per camera: each announces only its own
+        # changes, and tiling follows only that camera's objects from frame to frame
+        self.scenes = {}
+        self.detectors = {}
+        self.state_lock = threading.Lock()
 
     def _initialize_camera(self, port):
         camera = cv2.VideoCapture(port)
@@ -83,75 +106,109 @@ class EnhancedRecordVideo(QtCore.QObject):
         return camera
 
     def start_recording(self):
-        self.timer.start(33, self)  # ~30 FPS
+        if self.camera is None and self.scheduler is None:
+            # Capture workers per camera; inference is shared fairly between them
+            self.cameras.start()
+            self.scheduler = FairScheduler(self.cameras, self.process_frame, max_workers=2,
+                                           profiler=profiler).start()
+        self.timer.start(33, self)  # ~30 FPS capture, display refreshes independently
+
+    def stop_recording(self):
+        self.timer.stop()
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.cameras.close()
+            self.scheduler = None
 
     def timerEvent(self, event):
         if event.timerId() != self.timer.timerId():
             return
+
+        if self.camera is None:
+            # The first camera is shown; all of them are processed by the scheduler
+            latest = self.cameras.latest(self.cameras.specs[0].name, self.shown_sequence)
+            if latest is not None:
+                self.shown_sequence, _, frame = latest
+                self.image_data.emit(frame)
+            profiler.maybe_export()
+            return
         
-        ret, frame = self.camera.read()
+        with profiler.stage('capture'):
+            ret, frame = self.camera.read()
         if ret:
             self.image_data.emit(frame)
-            self.executor.submit(self.process_frame, frame)
-
-    def process_frame(self, frame):
+            if self.slots.acquire(blocking=False):
+                future = self.executor.submit(self.process_frame, frame)
+                future.add_done_callback(lambda _: self.slots.release())
+            else:
+                profiler.count('dropped_frames')
+        else:
+            profiler.count('dropped_frames')
+        profiler.maybe_export()
+
+    def _scene(self, spec):
+        name = spec.name if spec is not None else None
+        with self.state_lock:
+            if name not in self.scenes:
+                self.scenes[name] = SceneSummarizer(min_confidence=DETECTION_CONFIG['threshold'],
+                                                    min_interval=DETECTION_CONFIG['announcement_interval'])
+            return self.scenes[name]
+
+    def _detector(self, spec):
+        # With [Tiling] enabled, previous-frame crops must come from the same camera
+        name = spec.name if spec is not None else None
+        with self.state_lock:
+            if name not in self.detectors:
+                self.detectors[name] = tiled_detector(base_detector)
+            return self.detectors[name]
+
+    def process_frame(self, frame, spec=None):
+        """Detection and OCR for one frame; `spec` is the multi_camera.CameraSpec it came from"""
+        role = spec.role if spec is not None else None
+        source = f"[{spec.name}] " if spec is not None else ""
+        started = time.perf_counter()
         try:
-            # Object Detection
-            results = model(frame, show=False)
-            detections = results[0].boxes
-            object_count = {}
-
-            for box in detections:
-                confidence = box.conf[0]
-                if confidence > DETECTION_CONFIG['threshold']:
-                    class_id = int(box.cls[0])
-                    class_name = model.names[class_id]
-                    object_count[class_name] = object_count.get(class_name, 0) + 1
-
-            # Periodic Announcements
-            current_time = time.time()
-            if (current_time - self.last_announcement_time > 
-                DETECTION_CONFIG['announcement_interval'] and object_count):
-                
-                count_text = ", ".join([f"{obj}: {count}" for obj, count in object_count.items()])
-                speech_text = f"I detected {count_text}"
-                
-                speech_engine.speak(speech_text)
-                self.last_announcement_time = current_time
-
-            # OCR Processing
-            img = Image.fromarray(frame)
-            text = pytesseract.image_to_string(img, config=tessdata_dir_config)
+            # Object Detection, skipped on cameras set up for reading
+            detections = None
+            if role != 'reading' and governor.should_detect():
+                with profiler.stage('inference'):
+                    detections = self._detector(spec).detect(frame, imgsz=governor.input_size)
+
+            # Announce scene changes only, and only from frames that went through the detector
+            speech_text = ''
+            if detections is not None:
+                confident = [d for d in detections if d.confidence > DETECTION_CONFIG['threshold']]
+                speech_text = self._scene(spec).update(confident, frame.shape)
+            if speech_text:
+                if spec is not None and len(self.cameras) > 1:
+                    speech_text = f"{spec.name} camera: {speech_text}"
+                speech_started = time.perf_counter()
+                with profiler.stage('speech'):
+                    speech_engine.speak(speech_text)
+                # Speaking is not frame latency, keep it out of the governor's measure
+                started += time.perf_counter() - speech_started
+
+            # OCR Processing, skipped on cameras set up for obstacles
+            text = ''
+            if role != 'obstacles' and governor.should_ocr():
+                with profiler.stage('ocr'):
+                    # Most relevant line first, unreliable words already dropped
+                    layout = read_layout(frame, config=tessdata_dir_config)
+                    text = '\n'.join(layout.ranked_texts())
+            governor.observe(time.perf_counter() - started)
             
             if text.strip():
-                speech_engine.speak(text)
+                with profiler.stage('speech'):
+                    speech_engine.speak(text)
 
         except Exception as e:
-            logging.error(f"Frame Processing Error: {e}")
+            logging.error(f"{source}Frame Processing Error: {e}")
 
-class VideoDisplayWidget(QtWidgets.QWidget):
+class VideoDisplayWidget(FrameView):
     def __init__(self):
-        super().__init__()
-        self.image = QtGui.QImage()
+        super().__init__(display_fps=20)
         self.setFixedSize(640, 480)
 
-    def image_data_slot(self, image_data):
-        self.image = self._convert_to_qimage(image_data)
-        self.update()
-
-    def _convert_to_qimage(self, image):
-        height, width, _ = image.shape
-        return QtGui.QImage(
-            image.data, 
-            width, 
-            height, 
-            QtGui.QImage.Format_RGB888
-        ).rgbSwapped()
-
-    def paintEvent(self, event):
-        painter = QtGui.QPainter(self)
-        painter.drawImage(0, 0, self.image)
-
 class MainApplicationWindow(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
@@ -170,6 +227,11 @@ class MainApplicationWindow(QtWidgets.QWidget):
         self.setLayout(layout)
         self.setWindowTitle('Enhanced Object Detection')
 
+    def closeEvent(self, event):
+        # Stops capture workers and frees their shared memory
+        self.record_video.stop_recording()
+        super().closeEvent(event)
+
 def main():
     app = QtWidgets.QApplication(sys.argv)
     window = MainApplicationWindow()
@@ -0,0 +1,303 @@
+import os
+import time
+import json
+import bisect
+import logging
+import threading
+from collections import deque
+from configparser import ConfigParser
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the cumulative histogram buckets exported to Prometheus
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _NullTimer:
+    """Shared no-op timer handed out while profiling is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ('_profiler', '_name', '_start')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profiler.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class StageStats:
+    """Lifetime histogram plus a rolling window of recent durations for one stage"""
+
+    def __init__(self, window, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        index = bisect.bisect_left(self.buckets, seconds)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+
+    def quantile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'last_s': self.recent[-1] if self.recent else 0.0,
+            'p50_s': self.quantile(0.5),
+            'p95_s': self.quantile(0.95),
+            'max_s': max(self.recent) if self.recent else 0.0,
+        }
+
+
+class Profiler:
+    def __init__(self, enabled=False, window=300, buckets=DEFAULT_BUCKETS,
+                 metrics_file=None, export_interval=5.0, overlay=False):
+        """
+        Per-stage timing, counters and gauges for the capture/inference loops
+
+        Args:
+            enabled (bool): When False every hook is a near free no-op
+            window (int): Number of recent samples kept per stage for quantiles
+            buckets (tuple): Histogram bucket upper bounds in seconds
+            metrics_file (str): Path written by maybe_export(); '.prom' gives
+                Prometheus text, anything else JSON
+            export_interval (float): Minimum seconds between metric file writes
+            overlay (bool): Whether draw_overlay() should draw anything
+        """
+        self.enabled = enabled
+        self.window = window
+        self.buckets = tuple(buckets)
+        self.metrics_file = metrics_file
+        self.export_interval = export_interval
+        self.overlay = overlay
+
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._gauges = {}
+        self._last_export = 0.0
+        self._server = None
+
+    @classmethod
+    def from_config(cls, path='config.ini'):
+        """Build a profiler from the [Profiling] section of config.ini"""
+        config = ConfigParser()
+        config.read(path)
+        if not config.has_section('Profiling'):
+            return cls()
+
+        section = config['Profiling']
+        profiler = cls(
+            enabled=section.getboolean('enabled', fallback=False),
+            window=section.getint('window', fallback=300),
+            metrics_file=section.get('metrics_file', fallback='') or None,
+            export_interval=section.getfloat('export_interval', fallback=5.0),
+            overlay=section.getboolean('overlay', fallback=False),
+        )
+        port = section.getint('metrics_port', fallback=0)
+        if profiler.enabled and port:
+            profiler.serve(port)
+        return profiler
+
+    # ---- Recording ----
+
+    def stage(self, name):
+        """Context manager timing the enclosed block as stage `name`"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def timed(self, name=None):
+        """Decorator timing every call of the wrapped function"""
+        def decorator(func):
+            stage_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage_name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = StageStats(self.window, self.buckets)
+            stats.add(seconds)
+
+    def count(self, name, amount=1):
+        """Increment a monotonic counter such as dropped frames"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name, value):
+        """Set a point-in-time value such as a queue depth"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def stage_summary(self, name):
+        with self._lock:
+            stats = self._stages.get(name)
+            return stats.summary() if stats else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'stages': {name: stats.summary() for name, stats in self._stages.items()},
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+            }
+
+    # ---- Export ----
+
+    def prometheus_text(self):
+        lines = [
+            '# HELP ikshana_stage_seconds Time spent per pipeline stage',
+            '# TYPE ikshana_stage_seconds histogram',
+        ]
+        with self._lock:
+            for name, stats in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(stats.buckets, stats.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'ikshana_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'ikshana_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stats.count}')
+                lines.append(f'ikshana_stage_seconds_sum{{stage="{name}"}} {stats.total}')
+                lines.append(f'ikshana_stage_seconds_count{{stage="{name}"}} {stats.count}')
+
+            lines.append('# HELP ikshana_stage_window_seconds Rolling quantiles over recent samples')
+            lines.append('# TYPE ikshana_stage_window_seconds gauge')
+            for name, stats in sorted(self._stages.items()):
+                for q in (0.5, 0.95):
+                    lines.append(f'ikshana_stage_window_seconds{{stage="{name}",quantile="{q}"}} {stats.quantile(q)}')
+
+            for name, value in sorted(self._counters.items()):
+                lines.append(f'# TYPE ikshana_{name}_total counter')
+                lines.append(f'ikshana_{name}_total {value}')
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f'# TYPE ikshana_{name} gauge')
+                lines.append(f'ikshana_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self, path=None):
+        """Atomically write the current metrics to `path` (JSON or .prom)"""
+        path = path or self.metrics_file
+        if not path:
+            return
+        if path.endswith('.prom'):
+            content = self.prometheus_text()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def maybe_export(self):
+        """Write the metrics file if export_interval has elapsed; call once per loop"""
+        if not self.enabled or not self.metrics_file:
+            return
+        now = time.monotonic()
+        if now - self._last_export >= self.export_interval:
+            self._last_export = now
+            try:
+                self.write_metrics()
+            except OSError as e:
+                logging.warning(f"Metrics export failed: {e}")
+
+    def serve(self, port, host='127.0.0.1'):
+        """Expose Prometheus text on http://host:port/metrics from a daemon thread"""
+        profiler = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = profiler.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Metrics endpoint on http://{host}:{self._server.server_port}/metrics")
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.enabled and self.metrics_file:
+            self.write_metrics()
+
+    # ---- On-screen overlay ----
+
+    def draw_overlay(self, image, origin=(10, 50), row_size=18):
+        """Draw recent per-stage p50/p95 timings onto `image` in place"""
+        if not (self.enabled and self.overlay):
+            return image
+        import cv2
+
+        x, y = origin
+        with self._lock:
+            rows = [(name, stats.quantile(0.5), stats.quantile(0.95))
+                    for name, stats in sorted(self._stages.items())]
+            dropped = self._counters.get('dropped_frames', 0)
+
+        for name, p50, p95 in rows:
+            text = f'{name}: {p50 * 1000:.1f} / {p95 * 1000:.1f} ms'
+            cv2.putText(image, text, (x, y), cv2.FONT_HERSHEY_PLAIN, 1, (0, 255, 255), 1)
+            y += row_size
+        if dropped:
+            cv2.putText(image, f'dropped: {dropped}', (x, y), cv2.FONT_HERSHEY_PLAIN, 1, (0, 0, 255), 1)
+        return image
@@ -0,0 +1,99 @@
+import numpy as np
+
+from PyQt5 import QtCore
+from PyQt5 import QtGui
+from PyQt5 import QtWidgets
+
+# Qt >= 5.14 can draw BGR buffers directly, older builds need a channel swap
+_BGR_FORMAT = getattr(QtGui.QImage, 'Format_BGR888', None)
+
+
+def bgr_to_qimage(image: np.ndarray):
+    """
+    Wrap a BGR (or grayscale) frame in a QImage without copying pixels
+
+    The returned QImage borrows the array's memory, so the caller must keep
+    `image` alive for as long as the QImage is used. A non-contiguous view
+    (e.g. a crop) is the exception: it is made contiguous in a temporary
+    array, so the QImage gets its own copy of the pixels.
+    """
+    temporary = not image.flags['C_CONTIGUOUS']
+    if temporary:
+        image = np.ascontiguousarray(image)
+
+    height, width = image.shape[:2]
+    bytes_per_line = image.strides[0]
+
+    if image.ndim == 2:
+        qimage = QtGui.QImage(image.data, width, height, bytes_per_line,
+                              QtGui.QImage.Format_Grayscale8)
+    elif _BGR_FORMAT is not None:
+        qimage = QtGui.QImage(image.data, width, height, bytes_per_line, _BGR_FORMAT)
+    else:
+        # Fallback for old Qt: one swap into a new image, still no extra numpy copy
+        return QtGui.QImage(image.data, width, height, bytes_per_line,
+                            QtGui.QImage.Format_RGB888).rgbSwapped()
+
+    # The temporary array dies with this call, the QImage must not outlive its pixels
+    return qimage.copy() if temporary else qimage
+
+
+def capture_interval_ms(camera, default_fps=30):
+    """Timer interval matching the camera's frame rate instead of busy polling"""
+    fps = camera.get(5)  # cv2.CAP_PROP_FPS
+    if not fps or fps <= 0 or fps > 120:
+        fps = default_fps
+    return int(1000 / fps)
+
+
+class FrameView(QtWidgets.QWidget):
+    def __init__(self, display_fps=30, parent=None):
+        """
+        Widget showing the most recent BGR frame at its own refresh rate
+
+        Frames arriving through image_data_slot are only stored; conversion
+        and repainting happen on the refresh timer, at most once per new
+        frame, and stop entirely while the widget is hidden.
+
+        Args:
+            display_fps (int): Maximum repaint rate, independent of capture rate
+        """
+        super().__init__(parent)
+        self.image = QtGui.QImage()
+        self._pending = None
+        self._displayed = None
+
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setInterval(int(1000 / display_fps))
+        self._refresh_timer.timeout.connect(self._refresh)
+
+    def image_data_slot(self, image_data):
+        # Only keep a reference, the capture side can run faster than we draw
+        self._pending = image_data
+
+    def _refresh(self):
+        frame = self._pending
+        if frame is None or frame is self._displayed or not self.isVisible():
+            return
+
+        self.image = bgr_to_qimage(frame)
+        self._displayed = frame
+        self.on_new_image(self.image)
+        self.update()  # Qt coalesces multiple update() calls into one paint
+
+    def on_new_image(self, image):
+        """Hook for subclasses reacting to a new frame, e.g. resizing"""
+
+    def showEvent(self, event):
+        self._refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._refresh_timer.stop()
+        super().hideEvent(event)
+
+    def paintEvent(self, event):
+        if self.image.isNull():
+            return
+        painter = QtGui.QPainter(self)
+        painter.drawImage(0, 0, self.image)
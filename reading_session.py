@@ -0,0 +1,218 @@
+import re
+import time
+from difflib import SequenceMatcher
+
+_NON_WORD = re.compile(r'[^a-z0-9 ]+')
+_SPACES = re.compile(r'\s+')
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def normalize_line(text):
+    """Lower-case alphanumerics with single spaces, for comparing OCR lines"""
+    return _SPACES.sub(' ', _NON_WORD.sub(' ', text.lower())).strip()
+
+
+def added_text(text, key, spans):
+    """
+    The words of `text` (normalized: `key`) outside the (start, end) word
+    spans of known lines, e.g. 'when it was checked' for a line that grew
+    past the frame edge
+    """
+    words = [(m.start(), m.end()) for m in _WORD.finditer(text.lower())]
+    if len(words) != len(key.split()):
+        return text
+    covered = set()
+    for start, end in spans:
+        covered.update(range(start, end))
+    parts, run = [], None
+    for i in range(len(words) + 1):
+        if i < len(words) and i not in covered:
+            run = i if run is None else run
+        elif run is not None:
+            parts.append(text[words[run][0]:words[i - 1][1]].strip(' \t,;:-'))
+            run = None
+    return ' '.join(part for part in parts if part)
+
+
+class _Line:
+    __slots__ = ('text', 'key')
+
+    def __init__(self, text, key):
+        self.text = text
+        self.key = key
+
+
+class ReadingSession:
+    def __init__(self, similarity=0.8, min_length=3, new_page_lines=4, idle_reset=30.0):
+        """
+        Running document stitched from successive OCR passes over a page
+
+        Each pass is aligned against what was already read: exact matches
+        are found by hashing the normalized line, lines cut off at the frame
+        edge by word-wise containment, and OCR noise with difflib. Only
+        unseen lines are returned, and they are placed after the line they
+        followed. A line that now reads further, or that OCR merged with
+        other known lines, only returns the words that were not read before.
+
+        Args:
+            similarity (float): SequenceMatcher ratio above which two lines are the same
+            min_length (int): Shorter normalized lines are treated as noise
+            new_page_lines (int): A pass with this many lines and no overlap starts a new page
+            idle_reset (float): Seconds without any text after which the page is forgotten
+        """
+        self.similarity = similarity
+        self.min_length = min_length
+        self.new_page_lines = new_page_lines
+        self.idle_reset = idle_reset
+
+        self._document = []
+        self._seen = {}
+        self._last_update = time.monotonic()
+
+    @property
+    def lines(self):
+        return [line.text for line in self._document]
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    def reset(self):
+        self._document = []
+        self._seen = {}
+
+    def _containing(self, key):
+        """A known line containing `key`, i.e. a truncated reading of it, or None"""
+        padded = f' {key} '
+        for line in self._document:
+            if padded in f' {line.key} ':
+                return line
+        return None
+
+    def _covering(self, key):
+        """
+        Known lines read again inside the longer line `key`, as (start, end,
+        line) word spans of `key` in reading order. Characters are aligned
+        with difflib, so a known line still counts when OCR misread some of it.
+        """
+        spans = []
+        # seq2 is the side SequenceMatcher caches, keep the new line there
+        matcher = SequenceMatcher(None, '', key, autojunk=False)
+        for line in self._document:
+            if len(line.key) >= len(key):
+                continue
+            matcher.set_seq1(line.key)
+            needed = self.similarity * len(line.key)
+            # Upper bound on the aligned characters, most lines are rejected here
+            if matcher.quick_ratio() * (len(line.key) + len(key)) / 2 < needed:
+                continue
+            # Runs shorter than a few characters are coincidences, not the same words
+            blocks = [block for block in matcher.get_matching_blocks() if block.size >= 3]
+            if sum(block.size for block in blocks) < needed:
+                continue
+            start, end = blocks[0].b, blocks[-1].b + blocks[-1].size
+            if end - start > len(line.key) / self.similarity:
+                continue
+            start, end = end - len(key[start:end].lstrip()), len(key[:end].rstrip())
+            spans.append((key.count(' ', 0, start), key.count(' ', 0, end) + 1, line))
+
+        # Where two known lines claim the same words, the longer one wins
+        kept = []
+        for span in sorted(spans, key=lambda span: span[0] - span[1]):
+            if all(span[1] <= other[0] or span[0] >= other[1] for other in kept):
+                kept.append(span)
+        return sorted(kept, key=lambda span: span[0])
+
+    def _similar(self, key):
+        """The known line closest to `key` by difflib ratio, if above similarity"""
+        best, best_ratio = None, self.similarity
+        # seq2 is the side SequenceMatcher caches, keep the new line there
+        matcher = SequenceMatcher(None, '', key)
+        for line in self._document:
+            # Cheap upper bounds first, most lines are rejected here
+            matcher.set_seq1(line.key)
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = line, ratio
+        return best
+
+    def _insert(self, position, text, key):
+        line = _Line(text, key)
+        self._document.insert(position, line)
+        self._seen[key] = line
+        return line
+
+    def _position(self, line):
+        for i, other in enumerate(self._document):
+            if other is line:
+                return i
+        return len(self._document)
+
+    def update(self, lines):
+        """Merge one OCR pass (list of lines); returns the lines not read before"""
+        return [text for text in self.merge(lines) if text]
+
+    def merge(self, lines):
+        """Like update(), but returns for each of `lines` its unread part, or None"""
+        now = time.monotonic()
+        if now - self._last_update > self.idle_reset:
+            self.reset()
+
+        candidates = []
+        for index, text in enumerate(lines):
+            key = normalize_line(text)
+            if len(key) < self.min_length:
+                continue
+            match, spans = self._seen.get(key) or self._containing(key), []
+            if match is None:
+                # A line that grew, or that OCR merged with its neighbours, before a garbled one
+                spans = self._covering(key)
+                match = None if spans else self._similar(key)
+            candidates.append((index, text, key, match, spans))
+        matches = [match or spans[0][2] for _, _, _, match, spans in candidates if match or spans]
+
+        if not matches and self._document and len(candidates) >= self.new_page_lines:
+            # Nothing in common with the page being read, the user moved on
+            self.reset()
+            candidates = [(index, text, key, None, []) for index, text, key, _, _ in candidates]
+            matches = []
+
+        # Unseen lines before the first known one go in front of it
+        anchor = None
+        insert_at = self._position(matches[0]) if matches else len(self._document)
+        new_lines = [None] * len(lines)
+        for index, text, key, match, spans in candidates:
+            if spans:
+                # The known lines become one line with the fuller reading; only
+                # the words around them are new
+                known = [line for _, _, line in spans]
+                line = min(known, key=self._position)
+                for other in known:
+                    if other is not line and other in self._document:
+                        self._document.remove(other)
+                    # Later readings of a part still find the merged line
+                    self._seen[other.key] = line
+                line.text, line.key = text, key
+                self._seen[key] = line
+                new_lines[index] = added_text(text, key, [(start, end) for start, end, _ in spans]) or None
+                anchor = line
+                continue
+            if match is not None:
+                # Prefer the more complete reading of a line that OCR garbled
+                if key not in self._seen and len(key) > len(match.key):
+                    self._seen.pop(match.key, None)
+                    match.text, match.key = text, key
+                    self._seen[key] = match
+                anchor = match
+                continue
+            if key in self._seen:  # Repeated within this pass
+                continue
+            position = self._position(anchor) + 1 if anchor is not None else insert_at
+            anchor = self._insert(position, text, key)
+            new_lines[index] = text
+
+        if candidates:
+            self._last_update = now
+        return new_lines
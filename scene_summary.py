@@ -0,0 +1,212 @@
+import time
+import threading
+from collections import deque
+from functools import lru_cache
+
+from hazard import direction_of
+
+# Phrase templates, rendered once per (kind, label, count, direction) and cached
+TEMPLATES = {
+    'appeared': "{count} {label}{where}",
+    'count': "{count} {label} now",
+    'moved': "{label} now{where}",
+    'approaching': "{label} getting closer{where}",
+    'receding': "{label} moving away",
+    'gone': "no more {label}",
+}
+
+_NUMBERS = ['no', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten']
+_IRREGULAR = {'person': 'people', 'mouse': 'mice', 'knife': 'knives', 'sheep': 'sheep', 'skis': 'skis',
+              'scissors': 'scissors'}
+_WHERE = {'left': ' on your left', 'right': ' on your right', 'ahead': ' ahead', None: ''}
+
+@lru_cache(maxsize=256)
+def plural(label):
+    if label in _IRREGULAR:
+        return _IRREGULAR[label]
+    if label.endswith(('s', 'sh', 'ch', 'x')):
+        return label + 'es'
+    return label + 's'
+
+
+@lru_cache(maxsize=1024)
+def render(kind, label, count=1, direction=None):
+    """The phrase for one change, e.g. render('appeared', 'chair', 2, 'left') -> 'two chairs on your left'"""
+    if count == 1:
+        number = 'an' if kind == 'appeared' and label[0] in 'aeiou' else 'a' if kind == 'appeared' else 'one'
+        noun = label
+    else:
+        number = _NUMBERS[count] if count < len(_NUMBERS) else str(count)
+        noun = plural(label)
+    if kind in ('moved', 'approaching', 'receding', 'gone'):
+        noun = plural(label) if kind == 'gone' or count > 1 else f"the {label}"
+    return TEMPLATES[kind].format(count=number, label=noun, where=_WHERE[direction])
+
+
+def list_phrase(labels):
+    """'I found a cup, a banana and a phone' for labels seen in a session"""
+    items = [render('appeared', label) for label in labels]
+    if not items:
+        return "I found nothing"
+    if len(items) == 1:
+        return f"I found {items[0]}"
+    return f"I found {', '.join(items[:-1])} and {items[-1]}"
+
+
+class _ClassState:
+    __slots__ = ('counts', 'directions', 'area', 'latest_area')
+
+    def __init__(self, window):
+        self.counts = deque(maxlen=window)
+        self.directions = deque(maxlen=window)
+        self.area = None
+        self.latest_area = None
+
+
+class SceneSummarizer:
+    def __init__(self, min_confidence=0.5, stable_frames=3, growth=1.3, min_interval=2.0,
+                 max_phrases=3, area_smoothing=0.5):
+        """
+        Incremental per-class scene state that is only spoken when it changes
+
+        Every detection frame updates each class's count, position (left,
+        ahead, right, from the largest box) and smoothed box area. A change
+        counts once it has held for `stable_frames` detection frames, which
+        keeps a flickering detection from being announced again and again.
+        update() compares the stable state with what was last spoken and
+        returns short template phrases for the differences only.
+
+        Args:
+            min_confidence (float): Detections below this are ignored
+            stable_frames (int): Detection frames a change must hold before it is spoken
+            growth (float): Box area ratio since last spoken that counts as closer (or 1/growth as away)
+            min_interval (float): Seconds between two utterances; changes wait meanwhile
+            max_phrases (int): Phrases per utterance, the most important first
+            area_smoothing (float): Weight of the newest area in its moving average
+        """
+        self.min_confidence = min_confidence
+        self.stable_frames = stable_frames
+        self.growth = growth
+        self.min_interval = min_interval
+        self.max_phrases = max_phrases
+        self.area_smoothing = area_smoothing
+
+        self.seen = []
+        self.utterances = 0
+        self.words = 0
+        self._states = {}
+        self._spoken = {}
+        self._last_spoken = 0.0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _observe(self, detections, frame_shape):
+        height, width = frame_shape[:2]
+        frame_area = float(width * height)
+        by_class = {}
+        for detection in detections:
+            if detection.confidence >= self.min_confidence:
+                by_class.setdefault(detection.name, []).append(detection.box)
+
+        for label in set(by_class) | set(self._states):
+            state = self._states.get(label)
+            if state is None:
+                state = self._states[label] = _ClassState(self.stable_frames)
+                self.seen.append(label)
+            boxes = by_class.get(label, ())
+            state.counts.append(len(boxes))
+            if boxes:
+                directions = {direction_of(box, width) for box in boxes}
+                largest = max(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]))
+                state.directions.append(directions.pop() if len(directions) == 1 else None)
+                area = (largest[2] - largest[0]) * (largest[3] - largest[1]) / frame_area
+                state.latest_area = area
+                state.area = area if state.area is None else (
+                    self.area_smoothing * area + (1 - self.area_smoothing) * state.area)
+            else:
+                state.directions.append(None)
+
+    def _stable(self, state):
+        """(count, direction) held over the whole window, or None while it is still changing"""
+        if len(state.counts) < self.stable_frames or len(set(state.counts)) > 1:
+            return None
+        direction = state.directions[-1] if len(set(state.directions)) == 1 else None
+        return state.counts[-1], direction
+
+    def _changes(self):
+        """[(priority, phrase, label, spoken state)] for stable differences from what was spoken"""
+        changes = []
+        for label, state in self._states.items():
+            stable = self._stable(state)
+            if stable is None:
+                continue
+            count, direction = stable
+            spoken = self._spoken.get(label)
+            if spoken is None:
+                if count:
+                    changes.append((0, render('appeared', label, count, direction), label,
+                                    (count, direction, state.latest_area)))
+                continue
+            # spoken_area is the unsmoothed area when last spoken, so the lagging
+            # average cannot announce the same approach twice
+            spoken_count, spoken_direction, spoken_area = spoken
+            if count == 0:
+                changes.append((3, render('gone', label), label, None))
+            elif count != spoken_count:
+                changes.append((1, render('count', label, count), label, (count, direction, state.latest_area)))
+            elif spoken_area and state.area and state.area / spoken_area >= self.growth:
+                changes.append((0, render('approaching', label, count, direction), label,
+                                (count, direction, state.latest_area)))
+            elif spoken_area and state.area and state.area / spoken_area <= 1 / self.growth:
+                changes.append((2, render('receding', label, count), label, (count, direction, state.latest_area)))
+            elif direction is not None and direction != spoken_direction:
+                changes.append((2, render('moved', label, count, direction), label,
+                                (count, direction, state.latest_area)))
+        changes.sort(key=lambda change: change[0])
+        return changes
+
+    def update(self, detections, frame_shape, now=None):
+        """
+        Feed one detection frame; returns the text to speak, '' when nothing
+        changed enough (or min_interval has not passed yet)
+
+        Only call this for frames that were actually run through the
+        detector, an empty list means nothing is in view.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._observe(detections, frame_shape)
+            if now - self._last_spoken < self.min_interval:
+                return ''
+            changes = self._changes()[:self.max_phrases]
+            if not changes:
+                return ''
+            for _, _, label, spoken in changes:
+                if spoken is None:
+                    self._spoken.pop(label, None)
+                    self._states.pop(label, None)
+                else:
+                    self._spoken[label] = spoken
+            self._last_spoken = now
+            text = '. '.join(phrase[0].upper() + phrase[1:] for _, phrase, _, _ in changes)
+            self.utterances += 1
+            self.words += len(text.split())
+            return text
+
+    def describe(self):
+        """Everything currently in view, for an explicit 'what do you see'"""
+        with self._lock:
+            phrases = []
+            for label, state in self._states.items():
+                if state.counts and state.counts[-1]:
+                    direction = state.directions[-1]
+                    phrases.append(render('appeared', label, state.counts[-1], direction))
+        return f"I see {', '.join(phrases)}" if phrases else "I see nothing"
+
+    def words_per_minute(self):
+        minutes = (time.monotonic() - self._started) / 60.0
+        return self.words / minutes if minutes > 0 else 0.0
+
+    def summary(self):
+        return (f"scene announcements: {self.utterances}, {self.words} words, "
+                f"{self.words_per_minute():.1f} words per minute")
@@ -0,0 +1,452 @@
+import os
+import re
+import csv
+import sys
+import time
+import logging
+import argparse
+import importlib
+import threading
+import tracemalloc
+import multiprocessing
+from configparser import ConfigParser
+
+import cv2
+import numpy as np
+
+from frame_context import FrameContext
+from frame_scheduler import FrameGraph
+from frame_ring import FrameRing
+from inference_server import SHM_PREFIX
+
+SHM_DIR = '/dev/shm'
+
+# Allowed growth per hour of replayed video, overridden by [Soak] in config.ini
+DEFAULT_SLOPES = {
+    'rss_mb': 20.0,
+    'traced_mb': 10.0,
+    'children': 0.5,
+    'fds': 1.0,
+    'shm_segments': 0.5,
+    'threads': 0.5,
+}
+
+_DURATION = re.compile(r'^\s*([\d.]+)\s*([smh]?)\s*$')
+
+
+def parse_duration(text):
+    """'90', '90s', '15m' or '2h' to seconds"""
+    match = _DURATION.match(text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration {text!r}")
+    value, unit = match.groups()
+    return float(value) * {'': 1, 's': 1, 'm': 60, 'h': 3600}[unit]
+
+
+def rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024.0 * 1024.0)
+    except ImportError:
+        return float('nan')
+
+
+def _parent_pids():
+    """{pid: parent pid} of every process in /proc"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, fields after it are fixed
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        parents[int(entry)] = int(fields[1])
+    return parents
+
+
+def child_count():
+    """Live child processes, including ones not started through multiprocessing"""
+    if not os.path.isdir('/proc'):
+        return len(multiprocessing.active_children())
+    pid = os.getpid()
+    return sum(1 for parent in _parent_pids().values() if parent == pid)
+
+
+def process_tree():
+    """This process and its live descendants"""
+    tree = {os.getpid()}
+    if not os.path.isdir('/proc'):
+        return tree | {child.pid for child in multiprocessing.active_children()}
+    children = {}
+    for pid, parent in _parent_pids().items():
+        children.setdefault(parent, []).append(pid)
+    pending = [os.getpid()]
+    while pending:
+        for child in children.get(pending.pop(), ()):
+            if child not in tree:
+                tree.add(child)
+                pending.append(child)
+    return tree
+
+
+def fd_count():
+    for path in ('/proc/self/fd', '/dev/fd'):
+        if os.path.isdir(path):
+            return len(os.listdir(path))
+    return float('nan')
+
+
+def shm_segments(pids):
+    """Shared memory segments created by `pids` (see inference_server.segment_name), and their total MB"""
+    if not os.path.isdir(SHM_DIR):
+        return float('nan'), float('nan')
+    count, size = 0, 0
+    for entry in os.scandir(SHM_DIR):
+        if not entry.name.startswith(SHM_PREFIX):
+            continue
+        try:
+            if int(entry.name[len(SHM_PREFIX):].split('-', 1)[0]) not in pids:
+                continue
+            size += entry.stat().st_size
+            count += 1
+        except (OSError, ValueError):
+            continue
+    return count, size / (1024.0 * 1024.0)
+
+
+class Sample:
+    __slots__ = ('elapsed', 'video_hours', 'frames', 'values')
+
+    def __init__(self, elapsed, video_hours, frames, values):
+        self.elapsed = elapsed
+        self.video_hours = video_hours
+        self.frames = frames
+        self.values = values
+
+
+class ResourceMonitor:
+    def __init__(self, trace_frames=1, top=10):
+        """
+        Samples process resources that should stay flat in a long session
+
+        Args:
+            trace_frames (int): Stack depth tracemalloc records, 0 disables it
+            top (int): Allocation sites listed in the report
+        """
+        self.trace_frames = trace_frames
+        self.top = top
+        self.samples = []
+        # Every process of the tree seen so far: segments left by exited children still count
+        self._pids = set()
+        self._baseline = None
+        self._started = time.perf_counter()
+        if trace_frames:
+            tracemalloc.start(trace_frames)
+
+    def sample(self, frames, video_hours):
+        self._pids |= process_tree()
+        shm_count, shm_mb = shm_segments(self._pids)
+        values = {
+            'rss_mb': rss_mb(),
+            'traced_mb': tracemalloc.get_traced_memory()[0] / (1024.0 * 1024.0) if self.trace_frames else float('nan'),
+            'children': child_count(),
+            'fds': fd_count(),
+            'shm_segments': shm_count,
+            'shm_mb': shm_mb,
+            'threads': threading.active_count(),
+        }
+        sample = Sample(time.perf_counter() - self._started, video_hours, frames, values)
+        self.samples.append(sample)
+        return sample
+
+    def mark_baseline(self):
+        """Allocation sites are compared against the heap at this point"""
+        if self.trace_frames:
+            self._baseline = tracemalloc.take_snapshot()
+
+    def top_growth(self):
+        """Allocation sites that grew the most since mark_baseline()"""
+        if not self.trace_frames or self._baseline is None:
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            # The monitor's own samples
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        stats = snapshot.compare_to(self._baseline, 'lineno')
+        return [stat for stat in stats if stat.size_diff > 0][:self.top]
+
+    def slopes(self, since_hours=0.0):
+        """Least squares growth per hour of replayed video, per metric"""
+        samples = [s for s in self.samples if s.video_hours >= since_hours]
+        if len(samples) < 3:
+            return {}
+        hours = np.array([s.video_hours for s in samples])
+        if np.ptp(hours) == 0:
+            return {}
+        slopes = {}
+        for name in samples[0].values:
+            values = np.array([s.values[name] for s in samples], dtype=float)
+            if np.isnan(values).any():
+                continue
+            slopes[name] = float(np.polyfit(hours, values, 1)[0])
+        return slopes
+
+    def write_csv(self, path):
+        names = list(self.samples[0].values) if self.samples else []
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['elapsed_s', 'video_hours', 'frames'] + names)
+            for s in self.samples:
+                writer.writerow([f"{s.elapsed:.1f}", f"{s.video_hours:.4f}", s.frames] +
+                                [f"{s.values[n]:.3f}" for n in names])
+
+    def close(self):
+        if self.trace_frames:
+            tracemalloc.stop()
+
+
+class VideoReplay:
+    def __init__(self, path, speed=0.0):
+        """
+        Loops a recorded video forever
+
+        Args:
+            path (str): Video file
+            speed (float): Playback speed relative to the recording, 0 is as fast as possible
+        """
+        self.path = path
+        self.speed = speed
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Cannot open {path}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frames = 0
+        self.loops = 0
+        self._next = time.perf_counter()
+
+    @property
+    def video_hours(self):
+        """Hours of device time replayed so far"""
+        return self.frames / self.fps / 3600.0
+
+    def read(self):
+        ok, frame = self.capture.read()
+        if not ok:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.loops += 1
+            ok, frame = self.capture.read()
+            if not ok:
+                raise IOError(f"Cannot read frames from {self.path}")
+        self.frames += 1
+        if self.speed > 0:
+            self._next += 1.0 / (self.fps * self.speed)
+            delay = self._next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind, do not burst to catch up
+                self._next = time.perf_counter()
+        return frame
+
+    def release(self):
+        self.capture.release()
+
+
+class FramesPipeline:
+    """Derived images and the pre-roll ring, as every camera loop uses them"""
+
+    def __init__(self):
+        self.ring = FrameRing(seconds=3.0, max_fps=10.0, scale=0.5)
+
+    def process(self, frame):
+        with FrameContext(frame) as context:
+            context.gray
+            context.resized((320, 240))
+            context.blob((300, 300))
+        self.ring.push(frame)
+
+    def close(self):
+        self.ring.close()
+
+
+class GraphPipeline:
+    """Parallel per-frame analyses through FrameGraph, as in import os.py"""
+
+    def __init__(self):
+        self.graph = FrameGraph(max_workers=2)
+        self.graph.add('gray', lambda context, inputs: context.gray)
+        self.graph.add('edges', lambda context, inputs: cv2.Canny(inputs['gray'], 50, 150), after=['gray'])
+        self.graph.add('small', lambda context, inputs: context.resized((224, 224), 'rgb'))
+
+    def process(self, frame):
+        with FrameContext(frame) as context:
+            self.graph.run(context)
+
+    def close(self):
+        self.graph.executor.shutdown()
+
+
+class DetectorPipeline:
+    """YOLO through the inference daemon, or a local model when it is not running"""
+
+    def __init__(self, imgsz=320):
+        from inference_server import open_detector
+        self.detector = open_detector()
+        self.imgsz = imgsz
+
+    def process(self, frame):
+        self.detector.detect(frame, imgsz=self.imgsz)
+
+    def close(self):
+        self.detector.close()
+
+
+PIPELINES = {
+    'frames': FramesPipeline,
+    'graph': GraphPipeline,
+    'detector': DetectorPipeline,
+}
+
+
+def load_pipeline(name):
+    """
+    A PIPELINES name, or module:factory for a callable returning any object
+    with process(frame), called per frame, and optionally close()
+    """
+    if name in PIPELINES:
+        return PIPELINES[name]()
+    if ':' not in name:
+        raise ValueError(f"Unknown pipeline {name}, expected one of {sorted(PIPELINES)} or module:factory")
+    module, factory = name.split(':', 1)
+    return getattr(importlib.import_module(module), factory)()
+
+
+def load_slopes(path='config.ini'):
+    """DEFAULT_SLOPES updated from the [Soak] section of config.ini"""
+    slopes = dict(DEFAULT_SLOPES)
+    config = ConfigParser()
+    config.read(path)
+    if config.has_section('Soak'):
+        for name in slopes:
+            slopes[name] = config.getfloat('Soak', f'max_{name}_per_hour', fallback=slopes[name])
+    return slopes
+
+
+def report(monitor, slopes, limits, pipeline_name, replay, warmup_hours):
+    """Human readable summary; returns (text, names of metrics over their limit)"""
+    first = next((s for s in monitor.samples if s.video_hours >= warmup_hours), monitor.samples[0])
+    last = monitor.samples[-1]
+    lines = [f"Soak test of '{pipeline_name}': {replay.frames} frames, {last.video_hours:.2f} h of video "
+             f"in {last.elapsed / 3600:.2f} h ({replay.loops} loops of {os.path.basename(replay.path)})",
+             f"{'metric':<14}{'start':>10}{'end':>10}{'per hour':>12}{'limit':>10}"]
+    failed = []
+    for name, value in last.values.items():
+        slope = slopes.get(name)
+        limit = limits.get(name)
+        over = slope is not None and limit is not None and slope > limit
+        if over:
+            failed.append(name)
+        lines.append(f"{name:<14}{first.values[name]:>10.2f}{value:>10.2f}"
+                     f"{'-' if slope is None else f'{slope:+.2f}':>12}{'-' if limit is None else f'{limit:.2f}':>10}"
+                     f"{'  LEAK' if over else ''}")
+
+    growth = monitor.top_growth()
+    if growth:
+        lines.append("Top allocation growth since warm-up:")
+        for stat in growth:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+7d} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+    if len(monitor.samples) < 3 or not slopes:
+        lines.append("Too few samples after warm-up to fit slopes; run longer or sample more often")
+    return '\n'.join(lines), failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a video through a pipeline and watch for resource leaks")
+    parser.add_argument('video', nargs='?', default='VIDEO-2025-01-13-09-06-47.mp4', help="Video replayed in a loop")
+    parser.add_argument('--pipeline', default='frames',
+                        help=f"One of {', '.join(PIPELINES)} or module:factory")
+    parser.add_argument('--duration', type=parse_duration, default=parse_duration('10m'),
+                        help="Wall-clock run time, e.g. 600, 30m or 2h")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="Replay speed relative to the recording, 0 is as fast as possible")
+    parser.add_argument('--interval', type=parse_duration, default=5.0, help="Seconds between samples")
+    parser.add_argument('--warmup', type=float, default=0.05,
+                        help="Hours of video ignored while caches and pools fill")
+    parser.add_argument('--max-slope', action='append', default=[], metavar='METRIC=PER_HOUR',
+                        help=f"Override a limit, metrics: {', '.join(DEFAULT_SLOPES)}")
+    parser.add_argument('--trace-frames', type=int, default=1,
+                        help="tracemalloc stack depth, 0 turns allocation tracing off")
+    parser.add_argument('--samples', metavar='CSV', help="Write every sample here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+    limits = load_slopes()
+    for item in args.max_slope:
+        name, _, value = item.partition('=')
+        if name not in limits:
+            parser.error(f"unknown metric {name}")
+        limits[name] = float(value)
+
+    replay = VideoReplay(args.video, args.speed)
+    pipeline = load_pipeline(args.pipeline)
+    monitor = ResourceMonitor(trace_frames=args.trace_frames)
+
+    started = time.perf_counter()
+    next_sample = started
+    warmed_up = False
+    try:
+        while time.perf_counter() - started < args.duration:
+            pipeline.process(replay.read())
+            if not warmed_up and replay.video_hours >= args.warmup:
+                monitor.mark_baseline()
+                warmed_up = True
+            now = time.perf_counter()
+            if now >= next_sample:
+                sample = monitor.sample(replay.frames, replay.video_hours)
+                next_sample = now + args.interval
+                logging.info(f"{replay.frames} frames, {sample.video_hours:.3f} h: "
+                             f"rss {sample.values['rss_mb']:.1f} MB, children {sample.values['children']}, "
+                             f"fds {sample.values['fds']}, shm {sample.values['shm_segments']}, "
+                             f"threads {sample.values['threads']}")
+    except KeyboardInterrupt:
+        print("Interrupted, reporting what was sampled so far")
+    finally:
+        # Last sample while the pipeline is still up, closing it frees everything anyway
+        monitor.sample(replay.frames, replay.video_hours)
+        close = getattr(pipeline, 'close', None)
+        if close is not None:
+            close()
+        replay.release()
+
+    if not warmed_up:
+        monitor.mark_baseline()
+    text, failed = report(monitor, monitor.slopes(args.warmup), limits, args.pipeline, replay, args.warmup)
+    print(text)
+    if args.samples:
+        monitor.write_csv(args.samples)
+    monitor.close()
+
+    if failed:
+        print(f"FAIL: {', '.join(failed)} grew faster than allowed")
+        return 1
+    print("PASS")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,352 @@
+import io
+import os
+import re
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+|\n+')
+_CLAUSE_END = re.compile(r'(?<=[,)])\s+|\s+(?=(?:and|but|or|which|because|so)\s)')
+
+# Command line players that block until the file has played, first found wins
+PLAYERS = [
+    ['mpg123', '-q'],
+    ['ffplay', '-nodisp', '-autoexit', '-loglevel', 'quiet'],
+    ['mpv', '--really-quiet', '--no-video'],
+    ['afplay'],
+]
+
+
+def _split_long(piece, pattern, max_chars):
+    """Split `piece` at `pattern` matches into parts of at most max_chars where possible"""
+    parts, current = [], ''
+    for part in pattern.split(piece):
+        part = part.strip()
+        if not part:
+            continue
+        if current and len(current) + len(part) + 1 > max_chars:
+            parts.append(current)
+            current = part
+        else:
+            current = f"{current} {part}" if current else part
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_chunks(text, first_chunk_chars=60, max_chunk_chars=200):
+    """
+    Sentences, split further at clauses and then words when too long
+
+    The first chunk is kept short because its synthesis time is the time
+    to first audio; later chunks render while earlier ones play.
+    """
+    chunks = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = ' '.join(sentence.split())
+        if not sentence:
+            continue
+        limit = first_chunk_chars if not chunks else max_chunk_chars
+        if len(sentence) <= limit:
+            chunks.append(sentence)
+            continue
+        for clause in _split_long(sentence, _CLAUSE_END, limit):
+            limit = first_chunk_chars if not chunks else max_chunk_chars
+            if len(clause) <= limit:
+                chunks.append(clause)
+            else:
+                chunks.extend(_split_long(clause, re.compile(r'\s+'), limit))
+    return chunks
+
+
+class Passage:
+    def __init__(self, text, chunks):
+        """One speak() call; `first_audio` is seconds from speak() to audio start"""
+        self.text = text
+        self.chunks = chunks
+        self.created = time.perf_counter()
+        self.first_audio = None
+        self.spoken = 0
+        self.stopped = False
+        self.done = threading.Event()
+
+
+class StreamingSpeaker:
+    def __init__(self, synthesize, play, stop_playback=None, release=None, lookahead=2,
+                 first_chunk_chars=60, max_chunk_chars=200, profiler=None):
+        """
+        Pipelined text to speech: while chunk N plays, chunks N+1..N+lookahead
+        are synthesized
+
+        Args:
+            synthesize (callable): chunk text -> audio handed to `play`
+            play (callable): Plays one chunk's audio, blocking until done
+            stop_playback (callable): Interrupts `play`; without it skip and
+                stop take effect at the next chunk boundary
+            release (callable): Frees audio that was rendered but never played
+            lookahead (int): Chunks rendered ahead of playback
+            first_chunk_chars (int): Length limit of the first chunk
+            max_chunk_chars (int): Length limit of later chunks
+            profiler (Profiler): Optional, records 'tts_first_audio'
+        """
+        self.synthesize = synthesize
+        self.play = play
+        self.stop_playback = stop_playback
+        self.release = release
+        self.lookahead = max(1, lookahead)
+        self.first_chunk_chars = first_chunk_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.profiler = profiler
+
+        self._passages = queue.Queue()
+        self._renderer = ThreadPoolExecutor(max_workers=1)
+        self._current = None
+        self._skip = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        return self._current is not None or not self._passages.empty()
+
+    def speak(self, text):
+        """Queue `text` for speaking; returns its Passage"""
+        passage = Passage(text, split_chunks(text, self.first_chunk_chars, self.max_chunk_chars))
+        self._passages.put(passage)
+        return passage
+
+    def skip(self):
+        """Cut the current chunk short and continue with the next one"""
+        with self._lock:
+            self._skip = True
+        self._interrupt()
+
+    def stop(self):
+        """Drop the rest of the passage being spoken"""
+        with self._lock:
+            if self._current is not None:
+                self._current.stopped = True
+        self._interrupt()
+
+    def cancel(self):
+        """Stop the current passage and drop every queued one"""
+        while True:
+            try:
+                passage = self._passages.get_nowait()
+            except queue.Empty:
+                break
+            if passage is not None:
+                passage.stopped = True
+                passage.done.set()
+        self.stop()
+
+    def _interrupt(self):
+        if self.stop_playback is not None:
+            try:
+                self.stop_playback()
+            except Exception as e:
+                logging.warning(f"Could not interrupt playback: {e}")
+
+    def _render(self, chunk):
+        try:
+            return self.synthesize(chunk)
+        except Exception as e:
+            logging.error(f"Speech synthesis failed for {chunk!r}: {e}")
+            return None
+
+    def _run(self):
+        while True:
+            passage = self._passages.get()
+            if passage is None:
+                return
+            if passage.stopped:
+                continue
+            with self._lock:
+                self._current = passage
+                self._skip = False
+            try:
+                self._speak_passage(passage)
+            finally:
+                with self._lock:
+                    self._current = None
+                passage.done.set()
+
+    def _speak_passage(self, passage):
+        chunks = passage.chunks
+        futures = [self._renderer.submit(self._render, chunk) for chunk in chunks[:self.lookahead]]
+        handled = 0
+        while handled < len(chunks) and not passage.stopped:
+            audio = futures[handled].result()
+            if handled + self.lookahead < len(chunks):
+                futures.append(self._renderer.submit(self._render, chunks[handled + self.lookahead]))
+            if passage.stopped:
+                break
+            handled += 1
+            if audio is None:
+                continue
+            with self._lock:
+                skip, self._skip = self._skip, False
+            if skip:
+                self._release(audio)
+                continue
+            if passage.first_audio is None:
+                passage.first_audio = time.perf_counter() - passage.created
+                if self.profiler is not None:
+                    self.profiler.record('tts_first_audio', passage.first_audio)
+            try:
+                self.play(audio)
+            except Exception as e:
+                logging.error(f"Speech playback failed: {e}")
+            passage.spoken += 1
+            if self.stop_playback is not None:
+                # The skip already cut this chunk short; without an interrupt
+                # it applies to the next chunk instead
+                with self._lock:
+                    self._skip = False
+
+        # Chunks rendered ahead of a stop are never played
+        for future in futures[handled:]:
+            if not future.cancel():
+                self._release(future.result())
+
+    def _release(self, audio):
+        if audio is not None and self.release is not None:
+            self.release(audio)
+
+    def wait(self, timeout=None):
+        """Block until every queued passage has been spoken or dropped"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.busy:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, wait=False):
+        if wait:
+            self.wait()
+        else:
+            self.cancel()
+        self._passages.put(None)
+        self._thread.join(timeout=5)
+        self._renderer.shutdown(wait=False)
+
+
+class Pyttsx3Backend:
+    def __init__(self, rate=None):
+        """
+        pyttsx3 speaks chunk by chunk; the engine is created lazily on the
+        playback thread because pyttsx3 engines are bound to their thread.
+        stop() only sets a flag, the engine stops itself at the next word.
+        """
+        self.rate = rate
+        self.engine = None
+        self._stop = threading.Event()
+        self._interrupted = None
+
+    def synthesize(self, chunk):
+        return chunk
+
+    def _on_word(self, name, location, length):
+        # Runs on the playback thread, inside runAndWait()
+        if self._stop.is_set() or (self._interrupted is not None and self._interrupted()):
+            self.engine.stop()
+
+    def play(self, chunk, interrupted=None):
+        """Speak `chunk`; cut short at the next word after stop() or once interrupted() is true"""
+        if self.engine is None:
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            if self.rate:
+                self.engine.setProperty('rate', self.rate)
+            self.engine.connect('started-word', self._on_word)
+        self._stop.clear()
+        self._interrupted = interrupted
+        try:
+            self.engine.say(chunk)
+            self.engine.runAndWait()
+        finally:
+            self._interrupted = None
+
+    def stop(self):
+        self._stop.set()
+
+
+class GTTSBackend:
+    def __init__(self, lang='en', player=None):
+        """
+        gTTS renders each chunk to an mp3 that a command line player plays
+
+        Without a player on PATH (the usual case on Windows) chunks are played
+        with playsound, which also blocks until the chunk is done, so speech
+        still starts after the first chunk; it cannot be cut short, so skip
+        and stop take effect at the next chunk boundary (`interruptible` is
+        False).
+
+        Args:
+            lang (str): gTTS language code
+            player (list): Player command; default is the first of PLAYERS found
+        """
+        self.lang = lang
+        self.player = player or next((p for p in PLAYERS if shutil.which(p[0])), None)
+        self._process = None
+        self._playsound = None
+        if self.player is None:
+            try:
+                from playsound import playsound
+            except ImportError:
+                raise RuntimeError(f"No mp3 player found, install one of: "
+                                   f"{', '.join(p[0] for p in PLAYERS)} or pip install playsound")
+            self._playsound = playsound
+            logging.warning("No command line mp3 player found, using playsound; "
+                            "chunks will not be interruptible")
+
+    @property
+    def interruptible(self):
+        return self.player is not None
+
+    def synthesize(self, chunk):
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=chunk, lang=self.lang).write_to_fp(buffer)
+        fd, path = tempfile.mkstemp(suffix='.mp3', prefix='ikshana-tts-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buffer.getvalue())
+        return path
+
+    def play(self, path):
+        try:
+            if self.player is None:
+                self._playsound(path, True)
+            else:
+                self._process = subprocess.Popen(self.player + [path], stdout=subprocess.DEVNULL,
+                                                 stderr=subprocess.DEVNULL)
+                self._process.wait()
+        finally:
+            self._process = None
+            os.remove(path)
+
+    def release(self, path):
+        os.remove(path)
+
+    def stop(self):
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+
+def pyttsx3_speaker(**kwargs):
+    backend = Pyttsx3Backend()
+    return StreamingSpeaker(backend.synthesize, backend.play, backend.stop, **kwargs)
+
+
+def gtts_speaker(lang='en', **kwargs):
+    backend = GTTSBackend(lang)
+    stop_playback = backend.stop if backend.interruptible else None
+    return StreamingSpeaker(backend.synthesize, backend.play, stop_playback, backend.release, **kwargs)
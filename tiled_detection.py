@@ -0,0 +1,179 @@
+import logging
+from configparser import ConfigParser
+
+import numpy as np
+
+# Central region the wearer is looking at: centre x, centre y, width, height as frame fractions
+DEFAULT_GAZE = (0.5, 0.5, 0.4, 0.4)
+
+
+def _iou_matrix(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    union = area + areas - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def merge_detections(detections, iou=0.5):
+    """
+    Cross-tile non-maximum suppression: per class, keep the most confident
+    of every group of boxes overlapping by more than `iou`
+    """
+    by_class = {}
+    for detection in detections:
+        by_class.setdefault(detection.class_id, []).append(detection)
+
+    merged = []
+    for group in by_class.values():
+        group.sort(key=lambda d: d.confidence, reverse=True)
+        boxes = np.array([d.box for d in group], dtype=np.float32)
+        suppressed = np.zeros(len(group), dtype=bool)
+        for i, detection in enumerate(group):
+            if suppressed[i]:
+                continue
+            merged.append(detection)
+            if i + 1 < len(group):
+                suppressed[i + 1:] |= _iou_matrix(boxes[i], boxes[i + 1:]) > iou
+    merged.sort(key=lambda d: d.confidence, reverse=True)
+    return merged
+
+
+class TiledDetector:
+    def __init__(self, detector, gaze=DEFAULT_GAZE, tile_size=None, max_rois=2, roi_margin=0.5,
+                 min_roi=0.15, small_object=0.05, nms_iou=0.5, edge_margin=4):
+        """
+        Low-resolution pass over the whole frame plus higher-resolution passes
+        over the gaze region and around small objects seen in the previous frame
+
+        A crop sent at the same input size as the full frame gets several
+        times the pixels per object, so distant signs and small objects
+        survive, at the cost of a few crops instead of a full-resolution pass.
+        Tile detections cut by a crop edge are dropped (the full pass sees
+        those objects whole) and the rest are merged with cross-tile NMS.
+
+        Args:
+            detector: Anything with detect(frame, imgsz, conf) and
+                detect_batch(frames, imgsz, conf), e.g. inference_server.open_detector()
+            gaze (tuple): Centre x, centre y, width, height of the gaze
+                region as frame fractions, None for no gaze tile
+            tile_size (int): Input size for the crops, None uses the full-frame size
+            max_rois (int): Crops around previous detections per frame
+            roi_margin (float): Context added around a previous box, relative to its size
+            min_roi (float): Smallest crop side as a fraction of the frame side
+            small_object (float): Boxes below this fraction of the frame area get a crop
+            nms_iou (float): Overlap above which two boxes of a class are one object
+            edge_margin (int): Pixels from a crop edge that count as cut off
+        """
+        self.detector = detector
+        self.names = getattr(detector, 'names', None)
+        self.gaze = gaze
+        self.tile_size = tile_size
+        self.max_rois = max_rois
+        self.roi_margin = roi_margin
+        self.min_roi = min_roi
+        self.small_object = small_object
+        self.nms_iou = nms_iou
+        self.edge_margin = edge_margin
+
+        self.last_regions = []
+        self._previous = []
+
+    @classmethod
+    def from_config(cls, detector, path='config.ini'):
+        """Tiling settings from the [Tiling] section of config.ini"""
+        config = ConfigParser()
+        config.read(path)
+        if not config.has_section('Tiling'):
+            return cls(detector)
+        section = config['Tiling']
+        gaze = section.get('gaze', fallback=None)
+        return cls(detector,
+                   gaze=tuple(float(v) for v in gaze.split(',')) if gaze else None,
+                   tile_size=section.getint('tile_size', fallback=0) or None,
+                   max_rois=section.getint('max_rois', fallback=2),
+                   nms_iou=section.getfloat('nms_iou', fallback=0.5))
+
+    def _gaze_region(self, width, height):
+        cx, cy, w, h = self.gaze
+        x1, y1 = int((cx - w / 2) * width), int((cy - h / 2) * height)
+        x2, y2 = int((cx + w / 2) * width), int((cy + h / 2) * height)
+        return max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+
+    def _roi_regions(self, width, height, taken):
+        """Crops around small objects from the previous frame not already covered"""
+        frame_area = float(width * height)
+        regions = []
+        for detection in self._previous:
+            if len(regions) >= self.max_rois:
+                break
+            x1, y1, x2, y2 = detection.box
+            if (x2 - x1) * (y2 - y1) / frame_area > self.small_object:
+                continue
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+            side_x = max((x2 - x1) * (1 + 2 * self.roi_margin), self.min_roi * width)
+            side_y = max((y2 - y1) * (1 + 2 * self.roi_margin), self.min_roi * height)
+            region = (max(0, int(cx - side_x / 2)), max(0, int(cy - side_y / 2)),
+                      min(width, int(cx + side_x / 2)), min(height, int(cy + side_y / 2)))
+            # The box is already inside a crop that will run anyway
+            if any(r[0] <= x1 and r[1] <= y1 and r[2] >= x2 and r[3] >= y2 for r in taken + regions):
+                continue
+            regions.append(region)
+        return regions
+
+    def _from_tile(self, detections, region, width, height):
+        """Tile detections in frame coordinates, without the ones cut by the crop edge"""
+        rx1, ry1, rx2, ry2 = region
+        m = self.edge_margin
+        kept = []
+        for d in detections:
+            x1, y1, x2, y2 = d.box
+            cut = ((x1 <= m and rx1 > 0) or (y1 <= m and ry1 > 0) or
+                   (x2 >= rx2 - rx1 - m and rx2 < width) or (y2 >= ry2 - ry1 - m and ry2 < height))
+            if not cut:
+                kept.append(d._replace(box=(x1 + rx1, y1 + ry1, x2 + rx1, y2 + ry1)))
+        return kept
+
+    def detect(self, frame, imgsz=640, conf=0.25):
+        """Merged detections for one BGR frame, boxes in frame coordinates"""
+        height, width = frame.shape[:2]
+        detections = list(self.detector.detect(frame, imgsz=imgsz, conf=conf))
+
+        regions = [self._gaze_region(width, height)] if self.gaze else []
+        regions += self._roi_regions(width, height, regions)
+        regions = [r for r in regions if r[2] - r[0] > 1 and r[3] - r[1] > 1]
+        self.last_regions = regions
+
+        if regions:
+            crops = [np.ascontiguousarray(frame[y1:y2, x1:x2]) for x1, y1, x2, y2 in regions]
+            try:
+                tiles = self.detector.detect_batch(crops, imgsz=self.tile_size or imgsz, conf=conf)
+            except Exception as e:
+                logging.error(f"Tiled inference failed, using the full-frame pass only: {e}")
+                tiles = []
+            for region, tile in zip(regions, tiles):
+                detections.extend(self._from_tile(tile, region, width, height))
+
+        merged = merge_detections(detections, self.nms_iou)
+        self._previous = merged
+        return merged
+
+    def detect_batch(self, frames, imgsz=640, conf=0.25):
+        """Consecutive frames; each one's crops follow the objects of the one before"""
+        return [self.detect(frame, imgsz=imgsz, conf=conf) for frame in frames]
+
+    def close(self):
+        self.detector.close()
+
+
+def tiled_detector(detector, config_path='config.ini'):
+    """`detector` wrapped in a TiledDetector when [Tiling] is enabled in config.ini"""
+    config = ConfigParser()
+    config.read(config_path)
+    if not config.getboolean('Tiling', 'enabled', fallback=False):
+        return detector
+    return TiledDetector.from_config(detector, config_path)
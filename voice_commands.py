@@ -0,0 +1,260 @@
+import json
+import queue
+import logging
+import threading
+
+import numpy as np
+
+try:
+    import vosk
+except ImportError:  # Optional, only needed for offline recognition
+    vosk = None
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+# Spoken phrases accepted for each command understood by SmartGlasses.process_command
+COMMAND_PHRASES = {
+    'stop': ['stop', 'stop glasses'],
+    'take picture': ['take picture', 'take a picture', 'picture'],
+    'read text': ['read text', 'read', 'read this'],
+    'detect objects': ['detect objects', 'objects', 'what is around'],
+}
+
+
+def match_command(text):
+    """Map recognized text to a canonical command, longest phrase first"""
+    text = text.lower().strip()
+    if not text:
+        return None
+    candidates = [(phrase, command) for command, phrases in COMMAND_PHRASES.items()
+                  for phrase in phrases]
+    for phrase, command in sorted(candidates, key=lambda c: -len(c[0])):
+        if phrase in text:
+            return command
+    return None
+
+
+class AudioRingBuffer:
+    def __init__(self, seconds=3.0, sample_rate=SAMPLE_RATE):
+        """Fixed-size int16 ring holding the last `seconds` of audio"""
+        self.size = int(seconds * sample_rate)
+        self._buffer = np.zeros(self.size, dtype=np.int16)
+        self._written = 0
+
+    def write(self, samples):
+        samples = samples[-self.size:]
+        start = self._written % self.size
+        end = start + len(samples)
+        if end <= self.size:
+            self._buffer[start:end] = samples
+        else:
+            split = self.size - start
+            self._buffer[start:] = samples[:split]
+            self._buffer[:end - self.size] = samples[split:]
+        self._written += len(samples)
+
+    def last(self, count):
+        """Return a copy of the most recent `count` samples in order"""
+        count = min(count, self.size, self._written)
+        end = self._written % self.size
+        start = end - count
+        if start >= 0:
+            return self._buffer[start:end].copy()
+        return np.concatenate((self._buffer[start:], self._buffer[:end]))
+
+
+class EnergyVAD:
+    def __init__(self, start_ratio=3.0, stop_ratio=1.8, start_frames=3,
+                 hangover_ms=300, min_floor=50.0, floor_adapt=0.05):
+        """
+        Energy voice-activity detector with a continuously adapted noise floor
+
+        Replaces adjust_for_ambient_noise: the floor is tracked on every
+        non-speech frame instead of being re-measured before each command.
+
+        Args:
+            start_ratio (float): RMS / floor ratio that counts as speech
+            stop_ratio (float): Ratio below which a frame counts as silence
+            start_frames (int): Consecutive loud frames needed to open a segment
+            hangover_ms (int): Silence needed to close a segment
+            min_floor (float): Lower bound on the noise floor RMS
+            floor_adapt (float): EMA weight for noise floor updates
+        """
+        self.start_ratio = start_ratio
+        self.stop_ratio = stop_ratio
+        self.start_frames = start_frames
+        self.hangover_frames = max(1, hangover_ms // FRAME_MS)
+        self.min_floor = min_floor
+        self.floor_adapt = floor_adapt
+
+        self.noise_floor = min_floor
+        self.in_speech = False
+        self._loud = 0
+        self._quiet = 0
+
+    def process(self, frame):
+        """
+        Feed one FRAME_MS frame; returns 'start', 'speech', 'end' or None
+        """
+        rms = float(np.sqrt(np.mean(frame.astype(np.float32) ** 2))) if len(frame) else 0.0
+
+        if not self.in_speech:
+            if rms > self.noise_floor * self.start_ratio:
+                self._loud += 1
+                if self._loud >= self.start_frames:
+                    self.in_speech = True
+                    self._quiet = 0
+                    return 'start'
+            else:
+                self._loud = 0
+                self.noise_floor = max(self.min_floor,
+                                       (1 - self.floor_adapt) * self.noise_floor + self.floor_adapt * rms)
+            return None
+
+        if rms < self.noise_floor * self.stop_ratio:
+            self._quiet += 1
+            if self._quiet >= self.hangover_frames:
+                self.in_speech = False
+                self._loud = 0
+                return 'end'
+        else:
+            self._quiet = 0
+        return 'speech'
+
+    def cut(self):
+        """End the current segment early, e.g. at an utterance length limit"""
+        self.in_speech = False
+        self._loud = 0
+        self._quiet = 0
+
+
+class GrammarRecognizer:
+    def __init__(self, model_path, phrases=None, sample_rate=SAMPLE_RATE):
+        """
+        Offline small-vocabulary recognizer (Vosk restricted to command phrases)
+
+        Audio is fed while the user is still speaking, so the result is ready
+        as soon as the VAD closes the utterance.
+        """
+        if vosk is None:
+            raise RuntimeError("vosk is not installed (pip install vosk)")
+        vosk.SetLogLevel(-1)
+        if phrases is None:
+            phrases = sorted({p for ps in COMMAND_PHRASES.values() for p in ps})
+        self._model = vosk.Model(model_path)
+        self._grammar = json.dumps(phrases + ['[unk]'])
+        self._sample_rate = sample_rate
+        self.reset()
+
+    def reset(self):
+        self._recognizer = vosk.KaldiRecognizer(self._model, self._sample_rate, self._grammar)
+
+    def accept(self, samples):
+        self._recognizer.AcceptWaveform(samples.tobytes())
+
+    def finish(self):
+        text = json.loads(self._recognizer.FinalResult()).get('text', '')
+        self.reset()
+        return text.replace('[unk]', '').strip()
+
+
+class CommandListener:
+    def __init__(self, recognizer, pre_roll_ms=200, max_utterance_s=3.0, device_index=None):
+        """
+        Continuous microphone capture -> VAD -> offline command recognition
+
+        Args:
+            recognizer (GrammarRecognizer): Streaming recognizer
+            pre_roll_ms (int): Audio before the VAD trigger fed to the recognizer
+            max_utterance_s (float): Utterances are cut off after this long
+            device_index (int): PyAudio input device, None for the default
+        """
+        self.recognizer = recognizer
+        self.vad = EnergyVAD()
+        self.ring = AudioRingBuffer()
+        self.pre_roll = SAMPLE_RATE * pre_roll_ms // 1000
+        self.max_utterance_frames = int(max_utterance_s * 1000 / FRAME_MS)
+        self.device_index = device_index
+
+        self.commands = queue.Queue()
+        self._frames = queue.Queue(maxsize=500)
+        self._utterance_frames = 0
+        self._running = False
+        self._threads = []
+        self._audio = None
+        self._stream = None
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        import pyaudio
+        try:
+            self._frames.put_nowait(np.frombuffer(in_data, dtype=np.int16))
+        except queue.Full:
+            logging.warning("Voice frames dropped, recognizer is falling behind")
+        return (None, pyaudio.paContinue)
+
+    def start(self):
+        import pyaudio
+
+        self._running = True
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE,
+                                        input=True, frames_per_buffer=FRAME_SAMPLES,
+                                        input_device_index=self.device_index,
+                                        stream_callback=self._on_audio)
+        self._stream.start_stream()
+        worker = threading.Thread(target=self._process_frames, daemon=True)
+        worker.start()
+        self._threads.append(worker)
+
+    def feed(self, samples):
+        """Push raw int16 audio, e.g. from a file, instead of the microphone"""
+        for start in range(0, len(samples) - FRAME_SAMPLES + 1, FRAME_SAMPLES):
+            self._handle_frame(samples[start:start + FRAME_SAMPLES])
+
+    def _process_frames(self):
+        while self._running:
+            try:
+                frame = self._frames.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self._handle_frame(frame)
+
+    def _handle_frame(self, frame):
+        self.ring.write(frame)
+        state = self.vad.process(frame)
+
+        if state == 'start':
+            # Include the onset that happened before the VAD was sure
+            self.recognizer.accept(self.ring.last(self.pre_roll + len(frame) * self.vad.start_frames))
+            self._utterance_frames = 0
+        elif state == 'speech':
+            self.recognizer.accept(frame)
+            self._utterance_frames += 1
+            if self._utterance_frames >= self.max_utterance_frames:
+                self.vad.cut()
+                state = 'end'
+        if state == 'end':
+            text = self.recognizer.finish()
+            command = match_command(text)
+            if command:
+                logging.info(f"Voice command: {command} ({text!r})")
+                self.commands.put(command)
+
+    def get(self, timeout=None):
+        """Next recognized command, or None on timeout"""
+        try:
+            return self.commands.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=1)
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+        if self._audio is not None:
+            self._audio.terminate()